@@ -0,0 +1,4 @@
+"""
+GPU 资源管理包
+Qwen3-TTS、Whisper 与 LatentSync 共用同一个模型驻留管理器，统一协调显存占用
+"""
@@ -0,0 +1,489 @@
+"""
+模型驻留管理模块
+跟踪已加载模型的占用与最近使用时间，空闲超时后移至 CPU 或直接释放，并在显存不足时腾出显存重试；
+各功能通过共享/独占租约使用 GPU，加载新模型前按显存预算淘汰最久未使用的空闲模型
+"""
+
+import functools
+import gc
+import threading
+import time
+from contextlib import contextmanager
+
+
+# 空闲处理策略
+POLICY_FREE = "free"      # 释放模型，下次使用时重新加载
+POLICY_CPU = "cpu"        # 移至 CPU 内存，下次使用时移回原设备
+
+
+def find_torch_module(obj):
+    """
+    在模型包装对象中查找实际的 torch.nn.Module
+    支持直接的 Module、带 .model 属性的包装类（如 Qwen3TTSModel、transformers pipeline）
+    """
+    try:
+        import torch
+    except ImportError:
+        return None
+
+    if isinstance(obj, torch.nn.Module):
+        return obj
+    inner = getattr(obj, "model", None)
+    if isinstance(inner, torch.nn.Module):
+        return inner
+    return None
+
+
+def module_memory_bytes(module):
+    """
+    统计模块参数与缓冲区占用的字节数，按设备分组
+    """
+    usage = {}
+    if module is None:
+        return usage
+    for tensor in list(module.parameters()) + list(module.buffers()):
+        device = str(tensor.device)
+        usage[device] = usage.get(device, 0) + tensor.numel() * tensor.element_size()
+    return usage
+
+
+def is_oom_error(error):
+    """
+    判断异常是否为 CUDA 显存不足
+    """
+    try:
+        import torch
+        if isinstance(error, torch.cuda.OutOfMemoryError):
+            return True
+    except (ImportError, AttributeError):
+        pass
+    return "out of memory" in str(error).lower()
+
+
+def empty_cuda_cache():
+    """
+    回收 Python 对象并清空 CUDA 缓存
+    """
+    gc.collect()
+    try:
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except ImportError:
+        pass
+
+
+def cuda_total_memory():
+    """
+    返回当前 CUDA 设备的总显存（字节），无 CUDA 时返回 0
+    """
+    try:
+        import torch
+        if torch.cuda.is_available():
+            return torch.cuda.get_device_properties(torch.cuda.current_device()).total_memory
+    except Exception:
+        pass
+    return 0
+
+
+def cuda_free_memory():
+    """
+    返回当前 CUDA 设备的可用显存（字节，含其他进程占用的影响），无 CUDA 时返回 None
+    """
+    try:
+        import torch
+        if torch.cuda.is_available():
+            return torch.cuda.mem_get_info()[0]
+    except Exception:
+        pass
+    return None
+
+
+def _format_bytes(num_bytes):
+    if num_bytes >= 1024 ** 3:
+        return f"{num_bytes / 1024 ** 3:.2f} GB"
+    return f"{num_bytes / 1024 ** 2:.1f} MB"
+
+
+class _ManagedModel:
+    def __init__(self, name, label, module_getter, release_fn, memory_fn=None):
+        self.name = name
+        self.label = label
+        self.module_getter = module_getter
+        self.release_fn = release_fn
+        self.memory_fn = memory_fn
+        self.last_used = time.time()
+        self.offloaded_from = None  # 已移至 CPU 时记录原设备
+
+
+class ModelManager:
+    """
+    模型驻留管理器
+    idle_timeout 为空闲超时（秒），0 表示不自动卸载
+    budget_bytes 为登记模型可占用的显存预算，0 表示按设备总显存
+    """
+
+    def __init__(self, idle_timeout=600, policy=POLICY_FREE, check_interval=30, budget_bytes=0):
+        self.idle_timeout = idle_timeout
+        self.policy = policy
+        self.check_interval = check_interval
+        self.budget_bytes = budget_bytes
+        self._models = {}
+        # 租约：模型名 -> {线程 ID: 次数}；独占租约：模型名 -> 持有次数
+        self._in_use = {}
+        self._exclusive = {}
+        self._lock = threading.RLock()
+        self._released = threading.Condition(self._lock)
+        self._thread = None
+
+    def configure(self, idle_timeout=None, policy=None, budget_bytes=None):
+        """
+        更新空闲超时、空闲处理策略和显存预算
+        """
+        with self._lock:
+            if idle_timeout is not None:
+                self.idle_timeout = max(0, idle_timeout)
+            if policy in (POLICY_FREE, POLICY_CPU):
+                self.policy = policy
+            if budget_bytes is not None:
+                self.budget_bytes = max(0, int(budget_bytes))
+
+    def register(self, name, label, module_getter, release_fn, memory_fn=None):
+        """
+        登记一个已加载的模型
+        module_getter: 返回模型包装对象（用于统计显存和移动设备）
+        release_fn: 释放模型的回调，通常是将全局变量置为 None
+        memory_fn: 可选，返回 {设备: 字节数}，用于无法直接统计参数的模型（如在工作进程中运行）
+        """
+        with self._lock:
+            self._models[name] = _ManagedModel(name, label, module_getter, release_fn, memory_fn)
+        self._ensure_watcher()
+
+    def unregister(self, name):
+        with self._lock:
+            self._models.pop(name, None)
+
+    def touch(self, name):
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is not None:
+                entry.last_used = time.time()
+
+    def _blocked(self, name, exclusive):
+        """
+        判断当前线程能否获得租约：独占租约需要其他模型都没有被别的线程使用，
+        共享租约只需没有其他模型持有独占租约；当前线程自己持有的租约不计入，避免嵌套调用死锁
+        """
+        thread_id = threading.get_ident()
+        for other in self._exclusive:
+            if other != name and any(tid != thread_id for tid in self._in_use.get(other, {})):
+                return True
+        if exclusive:
+            for other, holders in self._in_use.items():
+                if other != name and any(tid != thread_id for tid in holders):
+                    return True
+        return False
+
+    @contextmanager
+    def lease(self, name, exclusive=False):
+        """
+        获取模型的 GPU 租约，期间模型不会被卸载；如模型已移至 CPU 则先移回原设备
+        共享租约可与其他模型同时持有；独占租约等待其他模型使用结束，持有期间其他模型的新租约会等待。
+        获得租约不会卸载其他模型，需要腾出显存时由调用方按所需大小调用 reserve()
+        """
+        thread_id = threading.get_ident()
+        with self._lock:
+            if self._blocked(name, exclusive):
+                print(f"⏳ 等待 GPU 租约：{name}（{'独占' if exclusive else '共享'}）")
+                while self._blocked(name, exclusive):
+                    self._released.wait()
+            holders = self._in_use.setdefault(name, {})
+            holders[thread_id] = holders.get(thread_id, 0) + 1
+            if exclusive:
+                self._exclusive[name] = self._exclusive.get(name, 0) + 1
+            entry = self._models.get(name)
+            if entry is not None:
+                self._restore(entry)
+                entry.last_used = time.time()
+        try:
+            yield
+        finally:
+            with self._lock:
+                holders = self._in_use[name]
+                holders[thread_id] -= 1
+                if holders[thread_id] <= 0:
+                    del holders[thread_id]
+                if not holders:
+                    del self._in_use[name]
+                if exclusive:
+                    # 同一模型可能有多个独占租约（嵌套或多个线程），全部释放后才解除独占
+                    self._exclusive[name] -= 1
+                    if self._exclusive[name] <= 0:
+                        del self._exclusive[name]
+                entry = self._models.get(name)
+                if entry is not None:
+                    entry.last_used = time.time()
+                self._released.notify_all()
+
+    def wait_until_unused(self, name):
+        """
+        等待其他线程持有的该模型租约全部释放（当前线程自己的租约不计入），用于替换或卸载正在被使用的模型；
+        调用方需保证等待期间不会有新的租约加入（例如在模型加载锁内获取租约）
+        """
+        thread_id = threading.get_ident()
+        with self._lock:
+            if any(tid != thread_id for tid in self._in_use.get(name, {})):
+                print(f"⏳ 等待其他请求用完 {name} 后再切换模型")
+                while any(tid != thread_id for tid in self._in_use.get(name, {})):
+                    self._released.wait()
+
+    def use(self, name):
+        """
+        共享租约（见 lease）
+        """
+        return self.lease(name)
+
+    def using(self, name, exclusive=False):
+        """
+        装饰器形式的 lease()，被装饰函数执行期间模型不会被卸载
+        """
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.lease(name, exclusive=exclusive):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def _entry_usage(entry):
+        # memory_fn 可能是对工作进程的阻塞请求，调用方需在锁外调用
+        try:
+            if entry.memory_fn is not None:
+                return entry.memory_fn()
+            return module_memory_bytes(find_torch_module(entry.module_getter()))
+        except Exception:
+            return {}
+
+    def _entry_cuda_bytes(self, entry):
+        if entry.offloaded_from is not None:
+            return 0
+        usage = self._entry_usage(entry)
+        return sum(size for device, size in usage.items() if device.startswith("cuda"))
+
+    def resident_bytes(self):
+        """
+        已登记模型当前占用的显存总量（字节）
+        """
+        with self._lock:
+            entries = list(self._models.values())
+        return sum(self._entry_cuda_bytes(entry) for entry in entries)
+
+    def effective_budget(self):
+        return self.budget_bytes or cuda_total_memory()
+
+    def reserve(self, name, required_bytes):
+        """
+        加载模型前预留显存：登记模型的占用加上 required_bytes 超过预算，或设备可用显存不足时，
+        按最近最少使用顺序卸载空闲模型，直到满足要求或没有可卸载的模型；返回是否满足
+        """
+        budget = self.effective_budget()
+        if not budget:
+            return True
+
+        # 在锁内取快照、锁外统计占用，避免工作进程的阻塞请求长时间占住管理器锁
+        with self._lock:
+            entries = [entry for entry in self._models.values() if entry.name != name]
+        sizes = {entry.name: self._entry_cuda_bytes(entry) for entry in entries}
+        candidates = sorted(entries, key=lambda entry: entry.last_used)
+
+        while True:
+            resident = sum(sizes.values())
+            free = cuda_free_memory()
+            fits = resident + required_bytes <= budget and (free is None or free >= required_bytes)
+            if fits or not candidates:
+                break
+            entry = candidates.pop(0)
+            with self._lock:
+                # 快照之后可能已被使用、卸载或替换，重新检查
+                if (self._models.get(entry.name) is not entry or entry.name in self._in_use
+                        or entry.offloaded_from is not None):
+                    continue
+                print(f"显存预算不足（预算 {_format_bytes(budget)}，已占用 {_format_bytes(resident)}，"
+                      f"需要 {_format_bytes(required_bytes)}），卸载最久未使用的 {entry.label}")
+                evicted = self._offload_or_free(entry, self.policy)
+            if evicted:
+                sizes[entry.name] = 0
+                empty_cuda_cache()
+        if not fits:
+            print(f"⚠️ 卸载空闲模型后显存仍可能不足：{name} 需要 {_format_bytes(required_bytes)}")
+        return fits
+
+    def _restore(self, entry):
+        if entry.offloaded_from is None:
+            return
+        module = find_torch_module(entry.module_getter())
+        if module is not None:
+            print(f"正在将 {entry.label} 移回 {entry.offloaded_from}...")
+            module.to(entry.offloaded_from)
+        entry.offloaded_from = None
+
+    def _offload_or_free(self, entry, policy):
+        module = find_torch_module(entry.module_getter())
+        if policy == POLICY_CPU and module is not None:
+            if entry.offloaded_from is not None:
+                return False
+            try:
+                device = next(module.parameters()).device
+            except StopIteration:
+                device = None
+            if device is not None and device.type != "cpu":
+                module.to("cpu")
+                entry.offloaded_from = device
+                print(f"✓ 已将 {entry.label} 移至 CPU（原设备：{device}）")
+                return True
+            return False
+
+        entry.release_fn()
+        self._models.pop(entry.name, None)
+        print(f"✓ 已释放 {entry.label}")
+        return True
+
+    def evict(self, name, policy=None):
+        """
+        卸载指定模型，持有租约的模型不会被卸载
+        """
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is None or name in self._in_use:
+                return False
+            evicted = self._offload_or_free(entry, policy or self.policy)
+        if evicted:
+            empty_cuda_cache()
+        return evicted
+
+    def evict_all(self, keep=None, policy=None):
+        """
+        卸载除 keep 之外的所有空闲模型，返回被卸载的模型数量
+        """
+        count = 0
+        with self._lock:
+            for entry in list(self._models.values()):
+                if entry.name == keep or entry.name in self._in_use:
+                    continue
+                if self._offload_or_free(entry, policy or self.policy):
+                    count += 1
+        if count:
+            empty_cuda_cache()
+        return count
+
+    def evict_idle(self):
+        """
+        卸载空闲超时的模型
+        """
+        if not self.idle_timeout:
+            return 0
+        now = time.time()
+        count = 0
+        with self._lock:
+            for entry in list(self._models.values()):
+                if entry.name in self._in_use or entry.offloaded_from is not None:
+                    continue
+                if now - entry.last_used >= self.idle_timeout:
+                    print(f"{entry.label} 已空闲 {(now - entry.last_used) / 60:.1f} 分钟，自动卸载")
+                    if self._offload_or_free(entry, self.policy):
+                        count += 1
+        if count:
+            empty_cuda_cache()
+        return count
+
+    def _ensure_watcher(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._watch, name="gpu-model-manager", daemon=True)
+        self._thread.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.check_interval)
+            try:
+                self.evict_idle()
+            except Exception as e:
+                print(f"⚠️ 空闲模型卸载失败：{e}")
+
+    def run_with_oom_retry(self, fn, keep=None):
+        """
+        执行 fn，遇到显存不足时卸载其他空闲模型、清空缓存后重试一次
+        """
+        try:
+            return fn()
+        except Exception as e:
+            if not is_oom_error(e):
+                raise
+            print(f"⚠️ 显存不足，正在卸载其他模型后重试：{e}")
+            self.evict_all(keep=keep, policy=POLICY_FREE)
+            empty_cuda_cache()
+            return fn()
+
+    def memory_report(self):
+        """
+        生成各模型驻留内存的文本报告
+        """
+        lines = []
+        now = time.time()
+        with self._lock:
+            entries = list(self._models.values())
+            exclusive = set(self._exclusive)
+            in_use = set(self._in_use)
+        # 内存统计在锁外进行（工作进程中的模型需要一次进程间请求）
+        for entry in entries:
+            usage = self._entry_usage(entry)
+            usage_text = "，".join(f"{device}: {_format_bytes(size)}" for device, size in usage.items()) or "未知"
+            if entry.name in exclusive:
+                state = "独占使用中"
+            elif entry.name in in_use:
+                state = "使用中"
+            else:
+                state = f"空闲 {(now - entry.last_used) / 60:.1f} 分钟"
+            lines.append(f"{entry.label}：{usage_text}（{state}）")
+        if not lines:
+            lines.append("当前没有驻留的模型")
+        for name in sorted(exclusive - {entry.name for entry in entries}):
+            lines.append(f"{name}：独占使用中")
+
+        budget = self.effective_budget()
+        if budget:
+            source = "手动设置" if self.budget_bytes else "设备总显存"
+            lines.append(f"显存预算：{_format_bytes(budget)}（{source}），已登记模型占用 {_format_bytes(self.resident_bytes())}")
+
+        try:
+            import torch
+            if torch.cuda.is_available():
+                lines.append(
+                    f"CUDA 已分配：{_format_bytes(torch.cuda.memory_allocated())}，"
+                    f"已保留：{_format_bytes(torch.cuda.memory_reserved())}"
+                )
+        except ImportError:
+            pass
+
+        if self.idle_timeout:
+            policy_text = "移至 CPU" if self.policy == POLICY_CPU else "释放"
+            lines.append(f"空闲 {self.idle_timeout / 60:.0f} 分钟后自动{policy_text}")
+        else:
+            lines.append("空闲自动卸载已关闭")
+        return "\n".join(lines)
+
+
+_shared_manager = None
+_shared_manager_lock = threading.Lock()
+
+
+def get_model_manager():
+    """
+    返回进程内共享的模型驻留管理器（TTS、Whisper 与 LatentSync 共用）
+    """
+    global _shared_manager
+    with _shared_manager_lock:
+        if _shared_manager is None:
+            _shared_manager = ModelManager(idle_timeout=10 * 60, policy=POLICY_FREE)
+        return _shared_manager
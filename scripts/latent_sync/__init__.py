@@ -0,0 +1,4 @@
+"""
+LatentSync 辅助模块包
+包含推理管线缓存等与 latent_sync_ui 配套的功能
+"""
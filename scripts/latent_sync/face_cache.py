@@ -0,0 +1,243 @@
+"""
+人脸对齐缓存模块
+同一段数字人视频配不同音频时，每次推理都会对全部帧重复人脸检测、关键点对齐和仿射裁剪；
+本模块以视频内容哈希 + 对齐参数为键，将 affine_transform_video 的结果（对齐后的人脸、人脸框、
+仿射矩阵等）保存到缓存目录，数组以 .npy 保存并按内存映射方式读取，之后的任务直接进入音频特征与扩散阶段
+"""
+
+import os
+import json
+import time
+import pickle
+import shutil
+import hashlib
+import threading
+
+
+# 缓存格式版本号，保存方式或对齐逻辑变化时递增，使旧缓存失效
+FACE_CACHE_VERSION = 1
+
+# 缓存目录的默认容量上限（字节），超出时删除最久未使用的条目
+DEFAULT_MAX_BYTES = 20 * 1024 ** 3
+
+MANIFEST_NAME = "manifest.json"
+OBJECTS_NAME = "objects.pkl"
+
+
+def _hash_file(path, chunk_size=1024 * 1024):
+    # 按块读取计算 SHA-256，避免将整个视频读入内存
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_video_input(video):
+    """
+    计算视频输入的内容哈希：文件路径按文件内容计算，已解码的帧数组按像素数据计算
+    """
+    if isinstance(video, (str, os.PathLike)):
+        return _hash_file(os.fspath(video))
+
+    import numpy as np
+
+    array = np.ascontiguousarray(video)
+    digest = hashlib.sha256()
+    digest.update(f"{array.shape}|{array.dtype}".encode("utf-8"))
+    digest.update(memoryview(array).cast("B"))
+    return digest.hexdigest()
+
+
+def _is_tensor(value):
+    torch = _torch()
+    return torch is not None and isinstance(value, torch.Tensor)
+
+
+def _torch():
+    try:
+        import torch
+        return torch
+    except ImportError:
+        return None
+
+
+def _uniform_arrays(values, kind):
+    # 形状与类型一致的数组列表可以堆叠为一个 .npy 文件
+    if not values:
+        return False
+    check = _is_tensor if kind == "tensor" else (lambda v: type(v).__module__ == "numpy" and hasattr(v, "shape"))
+    if not all(check(v) for v in values):
+        return False
+    first = values[0]
+    return all(v.shape == first.shape and v.dtype == first.dtype for v in values)
+
+
+def _save_result(result, entry_dir):
+    """
+    将 affine_transform_video 的返回值逐项保存，返回清单
+    """
+    import numpy as np
+
+    single = not isinstance(result, tuple)
+    items = (result,) if single else result
+    manifest = {"version": FACE_CACHE_VERSION, "single": single, "items": []}
+    objects = {}
+    for index, value in enumerate(items):
+        file_name = f"item_{index}.npy"
+        if _is_tensor(value):
+            np.save(os.path.join(entry_dir, file_name), value.detach().cpu().numpy())
+            manifest["items"].append({"kind": "tensor", "file": file_name})
+        elif type(value).__module__ == "numpy" and hasattr(value, "shape"):
+            np.save(os.path.join(entry_dir, file_name), value)
+            manifest["items"].append({"kind": "array", "file": file_name})
+        elif isinstance(value, list) and _uniform_arrays(value, "tensor"):
+            np.save(os.path.join(entry_dir, file_name), np.stack([v.detach().cpu().numpy() for v in value]))
+            manifest["items"].append({"kind": "tensor_list", "file": file_name})
+        elif isinstance(value, list) and _uniform_arrays(value, "array"):
+            np.save(os.path.join(entry_dir, file_name), np.stack(value))
+            manifest["items"].append({"kind": "array_list", "file": file_name})
+        else:
+            objects[index] = value
+            manifest["items"].append({"kind": "object"})
+    with open(os.path.join(entry_dir, OBJECTS_NAME), 'wb') as f:
+        pickle.dump(objects, f)
+    with open(os.path.join(entry_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+
+
+def _load_result(entry_dir):
+    """
+    读取缓存结果；数组以写时复制的内存映射方式打开，不会整块读入内存
+    """
+    import numpy as np
+
+    with open(os.path.join(entry_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get("version") != FACE_CACHE_VERSION:
+        return None
+    with open(os.path.join(entry_dir, OBJECTS_NAME), 'rb') as f:
+        objects = pickle.load(f)
+
+    items = []
+    for index, item in enumerate(manifest["items"]):
+        kind = item["kind"]
+        if kind == "object":
+            items.append(objects[index])
+            continue
+        array = np.load(os.path.join(entry_dir, item["file"]), mmap_mode="c")
+        if kind == "tensor":
+            items.append(_torch().from_numpy(array))
+        elif kind == "tensor_list":
+            items.append(list(_torch().from_numpy(array)))
+        elif kind == "array_list":
+            items.append(list(array))
+        else:
+            items.append(array)
+    return items[0] if manifest["single"] else tuple(items)
+
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+class FaceAlignmentCache:
+    """
+    人脸对齐结果缓存，每个条目是缓存目录下以键命名的子目录
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def make_key(self, video, **params):
+        """
+        缓存键：视频内容哈希 + 对齐参数（分辨率、遮罩等）
+        """
+        extra = json.dumps(params, sort_keys=True, ensure_ascii=False)
+        params_hash = hashlib.sha256(extra.encode("utf-8")).hexdigest()[:12]
+        return f"{hash_video_input(video)}_{params_hash}_v{FACE_CACHE_VERSION}"
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key):
+        """
+        读取缓存结果，未命中或缓存损坏时返回 None
+        """
+        entry_dir = self._entry_dir(key)
+        if not os.path.isfile(os.path.join(entry_dir, MANIFEST_NAME)):
+            return None
+        try:
+            result = _load_result(entry_dir)
+        except Exception as e:
+            print(f"⚠️ 读取人脸对齐缓存失败，将重新检测：{e}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return None
+        os.utime(entry_dir)
+        return result
+
+    def put(self, key, result):
+        """
+        保存结果：先写入临时目录再整体改名，中途失败不会留下不完整的条目
+        """
+        entry_dir = self._entry_dir(key)
+        tmp_dir = f"{entry_dir}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(tmp_dir, exist_ok=True)
+            _save_result(result, tmp_dir)
+            with self._lock:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                os.replace(tmp_dir, entry_dir)
+                self._prune()
+        except Exception as e:
+            print(f"⚠️ 保存人脸对齐缓存失败：{e}")
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _entries(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        return [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                if not name.endswith(".tmp") and os.path.isdir(os.path.join(self.cache_dir, name))]
+
+    def _prune(self):
+        entries = sorted(self._entries(), key=os.path.getmtime)
+        sizes = {path: _dir_size(path) for path in entries}
+        total = sum(sizes.values())
+        # 至少保留最近的一个条目
+        for path in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= sizes[path]
+
+    def wrap(self, original, **params):
+        """
+        包装 affine_transform_video：第一个参数（视频路径或帧数组）与 params 组成缓存键
+        """
+        def wrapper(video, *args, **kwargs):
+            start_time = time.time()
+            key = self.make_key(video, **params)
+            cached = self.get(key)
+            if cached is not None:
+                print(f"✓ 命中人脸对齐缓存，跳过人脸检测（{time.time() - start_time:.1f} 秒）")
+                return cached
+            result = original(video, *args, **kwargs)
+            self.put(key, result)
+            return result
+        return wrapper
+
+    def stats(self):
+        entries = self._entries()
+        total = sum(_dir_size(path) for path in entries)
+        return f"人脸对齐缓存：{len(entries)} 个视频，共 {total / 1024 ** 3:.2f} GB（上限 {self.max_bytes / 1024 ** 3:.0f} GB）"
+
+    def clear(self):
+        with self._lock:
+            for path in self._entries():
+                shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,372 @@
+"""
+唇形同步后台任务队列模块
+任务提交后写入 SQLite 队列，由单个后台线程依次执行，浏览器请求无需等待推理结束；
+执行中按阶段（人脸检测、音频特征、扩散去噪、视频合成）报告进度并估算剩余时间，
+任务可随时取消（在下一个去噪步之间停止），刷新页面或重启 WebUI 后仍可按任务 ID 查询结果；
+执行中途 WebUI 退出的任务（可能是显存耗尽或驱动崩溃导致进程被结束）标记为失败，不会在启动时自动重跑
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+
+
+# 任务状态
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+
+STATUS_LABELS = {
+    STATUS_QUEUED: "排队中",
+    STATUS_RUNNING: "进行中",
+    STATUS_DONE: "已完成",
+    STATUS_FAILED: "失败",
+    STATUS_CANCELLED: "已取消",
+}
+
+# 执行阶段及其在总进度中的权重（按常见短视频的耗时比例估算）
+STAGE_LABELS = {
+    "load": "加载模型",
+    "face": "人脸检测",
+    "audio": "音频特征",
+    "diffusion": "扩散去噪",
+    "mux": "视频合成",
+}
+STAGE_WEIGHTS = {
+    "load": 0.05,
+    "face": 0.2,
+    "audio": 0.05,
+    "diffusion": 0.65,
+    "mux": 0.05,
+}
+
+
+# 执行中途 WebUI 退出的任务的错误说明
+INTERRUPTED_MESSAGE = "WebUI 在任务执行期间退出（可能是显存耗尽或驱动崩溃），任务未完成，请检查后重新提交"
+
+
+class JobCancelled(Exception):
+    """
+    任务被用户取消
+    """
+
+
+class JobReporter:
+    """
+    单个任务的进度报告：按阶段权重换算总进度，并根据已用时间估算剩余时间
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.cancel_event = threading.Event()
+        self.started_at = time.time()
+        self.stage_name = None
+        self.stage_fraction = 0.0
+        self.detail = ""
+        self.item_index = 0
+        self.item_count = 1
+        # 批量任务中单条失败的说明（任务整体仍可完成）
+        self.errors = []
+
+    def item(self, index, count):
+        """
+        批量任务进入第 index 条（从 0 开始），各阶段进度换算到该条所占的区间
+        """
+        self.item_index = index
+        self.item_count = max(1, count)
+        self.stage_name = None
+        self.stage_fraction = 0.0
+        self.detail = ""
+
+    def stage(self, name, fraction=0.0, detail=""):
+        self.stage_name = name
+        self.stage_fraction = max(0.0, min(1.0, fraction))
+        self.detail = detail
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled(f"任务 {self.job_id} 已取消")
+
+    @property
+    def item_fraction(self):
+        if self.stage_name not in STAGE_WEIGHTS:
+            return 0.0
+        done = 0.0
+        for name, weight in STAGE_WEIGHTS.items():
+            if name == self.stage_name:
+                return done + weight * self.stage_fraction
+            done += weight
+        return done
+
+    @property
+    def fraction(self):
+        return (self.item_index + self.item_fraction) / self.item_count
+
+    @property
+    def eta(self):
+        """
+        剩余时间估算（秒），进度过小时无法估算返回 None
+        """
+        fraction = self.fraction
+        if fraction < 0.02:
+            return None
+        elapsed = time.time() - self.started_at
+        return elapsed / fraction * (1 - fraction)
+
+
+def new_job_id():
+    """
+    按提交时间排序的任务 ID
+    """
+    return f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "估算中"
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}小时{seconds % 3600 // 60}分"
+    if seconds >= 60:
+        return f"{seconds // 60}分{seconds % 60}秒"
+    return f"{seconds}秒"
+
+
+class LipSyncJobQueue:
+    """
+    基于 SQLite 的唇形同步任务队列
+    runner(params, reporter) 执行任务并返回输出文件路径（批量任务返回路径列表），失败时抛出异常（异常信息作为错误提示）
+    """
+
+    def __init__(self, db_path, runner):
+        self.db_path = db_path
+        self.runner = runner
+        self._lock = threading.Lock()
+        self._conn = None
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._reporters = {}
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, "
+                "status TEXT NOT NULL, "
+                "params TEXT NOT NULL, "
+                "output_path TEXT, "
+                "error TEXT, "
+                "created_at REAL NOT NULL, "
+                "started_at REAL, "
+                "finished_at REAL)"
+            )
+            # 上次退出时正在执行的任务标记为失败：若是该任务导致进程崩溃，重跑会让每次启动都再次崩溃
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE status = ?",
+                (STATUS_FAILED, INTERRUPTED_MESSAGE, time.time(), STATUS_RUNNING)
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _update(self, job_id, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(f"UPDATE jobs SET {columns} WHERE job_id = ?", (*fields.values(), job_id))
+            conn.commit()
+
+    def _row_to_job(self, row):
+        job_id, status, params, output_path, error, created_at, started_at, finished_at = row
+        job = {
+            "job_id": job_id,
+            "status": status,
+            "params": json.loads(params),
+            "output_path": output_path,
+            "error": error,
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+        }
+        reporter = self._reporters.get(job_id)
+        if reporter is not None and status == STATUS_RUNNING:
+            job.update(stage=reporter.stage_name, progress=reporter.fraction,
+                       eta=reporter.eta, detail=reporter.detail,
+                       item=(reporter.item_index + 1, reporter.item_count))
+        job["output_paths"] = output_path.splitlines() if output_path else []
+        return job
+
+    def start(self):
+        """
+        启动后台执行线程（重复调用无副作用）
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._work, name="latent-sync-jobs", daemon=True)
+            self._thread.start()
+
+    def resume(self):
+        """
+        WebUI 启动完成后调用：存在上次遗留的排队任务时启动后台线程按提交顺序执行，返回遗留任务数
+        （上次执行中的任务已在连接数据库时标记为失败，不会重跑）
+        """
+        with self._lock:
+            row = self._connect().execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (STATUS_QUEUED,)).fetchone()
+        if row[0]:
+            print(f"▶️ 继续执行上次遗留的 {row[0]} 个唇形同步任务")
+            self.start()
+            self._wakeup.set()
+        return row[0]
+
+    def submit(self, params):
+        """
+        提交任务并返回任务 ID
+        """
+        job_id = new_job_id()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO jobs (job_id, status, params, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, STATUS_QUEUED, json.dumps(params, ensure_ascii=False), time.time())
+            )
+            conn.commit()
+        self.start()
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        """
+        查询任务，不存在时返回 None
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT job_id, status, params, output_path, error, created_at, started_at, finished_at "
+                "FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list(self, limit=20):
+        """
+        最近提交的任务（新的在前）
+        """
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT job_id, status, params, output_path, error, created_at, started_at, finished_at "
+                "FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def queue_position(self, job_id):
+        """
+        排队任务前面还有几个任务（含正在执行的任务）
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?) AND created_at < "
+                "(SELECT created_at FROM jobs WHERE job_id = ?)",
+                (STATUS_QUEUED, STATUS_RUNNING, job_id)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def cancel(self, job_id):
+        """
+        取消任务：排队中的任务直接标记取消，执行中的任务在下一个检查点停止
+        返回取消前的状态：STATUS_QUEUED（已取消，不会再执行）、STATUS_RUNNING（已请求停止），
+        任务不存在或已结束时返回 None
+        """
+        with self._lock:
+            reporter = self._reporters.get(job_id)
+            if reporter is not None:
+                reporter.cancel_event.set()
+                return STATUS_RUNNING
+            conn = self._connect()
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE job_id = ? AND status = ?",
+                (STATUS_CANCELLED, time.time(), job_id, STATUS_QUEUED)
+            )
+            conn.commit()
+        return STATUS_QUEUED if cursor.rowcount > 0 else None
+
+    def _claim_next(self):
+        """
+        取出最早的排队任务并标记为执行中；在同一把锁内完成查询、状态更新和进度登记，
+        与 cancel() 互斥，已取消的任务不会被执行
+        """
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT job_id, params FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                (STATUS_QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None, None, None
+            job_id = row[0]
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ? WHERE job_id = ? AND status = ?",
+                (STATUS_RUNNING, time.time(), job_id, STATUS_QUEUED)
+            )
+            conn.commit()
+            if cursor.rowcount == 0:
+                return None, None, None
+            reporter = self._reporters[job_id] = JobReporter(job_id)
+        return job_id, json.loads(row[1]), reporter
+
+    def _work(self):
+        while True:
+            job_id, params, reporter = self._claim_next()
+            if job_id is None:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            print(f"▶️ 开始唇形同步任务 {job_id}")
+            try:
+                output_path = self.runner(params, reporter)
+                if isinstance(output_path, (list, tuple)):
+                    output_path = "\n".join(output_path)
+                self._update(job_id, status=STATUS_DONE, output_path=output_path,
+                             error="\n".join(reporter.errors) or None, finished_at=time.time())
+                print(f"✓ 唇形同步任务 {job_id} 完成：{output_path}")
+            except JobCancelled:
+                self._update(job_id, status=STATUS_CANCELLED, finished_at=time.time())
+                print(f"⏹️ 唇形同步任务 {job_id} 已取消")
+            except Exception as e:
+                self._update(job_id, status=STATUS_FAILED, error=str(e), finished_at=time.time())
+                print(f"❌ 唇形同步任务 {job_id} 失败：{e}")
+            finally:
+                with self._lock:
+                    self._reporters.pop(job_id, None)
+
+    def describe(self, job_id):
+        """
+        任务状态的文字说明（供界面显示）
+        """
+        job = self.get(job_id)
+        if job is None:
+            return f"未找到任务 {job_id}"
+        status = job["status"]
+        text = f"任务 {job_id}：{STATUS_LABELS.get(status, status)}"
+        if status == STATUS_QUEUED:
+            ahead = self.queue_position(job_id)
+            if ahead:
+                text += f"，前面还有 {ahead} 个任务"
+        elif status == STATUS_RUNNING and job.get("stage"):
+            index, count = job["item"]
+            if count > 1:
+                text += f" - 第 {index}/{count} 条"
+            text += (f" - {STAGE_LABELS.get(job['stage'], job['stage'])}"
+                     f"{'（' + job['detail'] + '）' if job['detail'] else ''}，"
+                     f"总进度 {job['progress'] * 100:.0f}%，预计剩余 {format_duration(job['eta'])}")
+        elif status == STATUS_DONE:
+            text += f"，耗时 {format_duration(job['finished_at'] - job['started_at'])}\n输出：" + "\n".join(job["output_paths"])
+        if job["error"]:
+            text += f"\n{job['error']}"
+        return text
+
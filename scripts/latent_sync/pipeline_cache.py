@@ -0,0 +1,294 @@
+"""
+LatentSync 推理管线缓存模块
+LatentSync.scripts.inference.main 每次调用都会从磁盘重建 UNet、VAE 和音频编码器；
+本模块按 (配置文件, 模型文件) 构建一次管线并常驻，后续任务只执行推理；
+管线每次调用时新建的 ImageProcessor（含人脸检测模型）也按 (分辨率, 遮罩) 缓存复用。
+管线登记到共用的模型驻留管理器，空闲超时或显存预算不足时与其他模型一样被卸载
+"""
+
+import os
+import math
+import threading
+import contextlib
+
+
+# 模型驻留管理器中的占用名（与 latent_sync_ui.LATENT_SYNC_SLOT 一致）
+PIPELINE_SLOT = "latent_sync"
+
+# VAE 权重默认位置（未设置 VAE_MODEL_PATH 时从 HuggingFace 加载）
+DEFAULT_VAE_MODEL = "stabilityai/sd-vae-ft-mse"
+
+# 按 UNet 交叉注意力维度选择 Whisper 音频编码器
+WHISPER_CHECKPOINTS = {
+    768: "small.pt",
+    384: "tiny.pt",
+}
+
+_pipeline_lock = threading.Lock()
+_cached = {
+    "key": None,
+    "pipeline": None,
+    "dtype": None,
+    "label": "",
+    # (分辨率, 遮罩文件) -> ImageProcessor
+    "image_processors": {},
+}
+
+
+def _cache_key(config_path, checkpoint_path):
+    # 文件修改时间参与键值，替换模型文件后自动重建
+    return (
+        os.path.abspath(config_path), os.path.getmtime(config_path),
+        os.path.abspath(checkpoint_path), os.path.getmtime(checkpoint_path),
+    )
+
+
+def _release_pipeline():
+    _cached.update(key=None, pipeline=None, dtype=None, label="", image_processors={})
+
+
+def _pipeline_memory():
+    """
+    统计缓存管线中各子模型的参数占用（按设备分组）
+    """
+    from scripts.gpu_resources.model_manager import module_memory_bytes
+
+    usage = {}
+    pipeline = _cached["pipeline"]
+    if pipeline is None:
+        return usage
+    audio_encoder = getattr(pipeline, "audio_encoder", None)
+    for module in (getattr(pipeline, "denoising_unet", None), getattr(pipeline, "vae", None),
+                   getattr(audio_encoder, "model", None)):
+        for device, size in module_memory_bytes(module).items():
+            usage[device] = usage.get(device, 0) + size
+    return usage
+
+
+def inference_dtype():
+    """
+    与官方推理脚本一致：计算能力 8.0 以上的显卡使用 float16，否则使用 float32
+    """
+    import torch
+
+    if torch.cuda.is_available() and torch.cuda.get_device_capability()[0] > 7:
+        return torch.float16
+    return torch.float32
+
+
+def build_pipeline(config, checkpoint_path, latentsync_root):
+    """
+    按官方推理脚本的步骤构建 LipsyncPipeline（不执行推理）
+    """
+    from omegaconf import OmegaConf
+    from diffusers import AutoencoderKL, DDIMScheduler
+    from latentsync.models.unet import UNet3DConditionModel
+    from latentsync.pipelines.lipsync_pipeline import LipsyncPipeline
+    from latentsync.whisper.audio2feature import Audio2Feature
+
+    dtype = inference_dtype()
+    scheduler = DDIMScheduler.from_pretrained(os.path.join(latentsync_root, "configs"))
+
+    cross_attention_dim = config.model.cross_attention_dim
+    if cross_attention_dim not in WHISPER_CHECKPOINTS:
+        raise ValueError(f"不支持的 cross_attention_dim：{cross_attention_dim}")
+    whisper_model_path = os.path.join(os.path.dirname(checkpoint_path), "whisper", WHISPER_CHECKPOINTS[cross_attention_dim])
+    audio_encoder = Audio2Feature(
+        model_path=whisper_model_path,
+        device="cuda",
+        num_frames=config.data.num_frames,
+        audio_feat_length=config.data.audio_feat_length,
+    )
+
+    vae = AutoencoderKL.from_pretrained(os.environ.get("VAE_MODEL_PATH") or DEFAULT_VAE_MODEL, torch_dtype=dtype)
+    vae.config.scaling_factor = 0.18215
+    vae.config.shift_factor = 0
+
+    denoising_unet, _ = UNet3DConditionModel.from_pretrained(
+        OmegaConf.to_container(config.model),
+        checkpoint_path,
+        device="cpu",
+    )
+    denoising_unet = denoising_unet.to(dtype=dtype)
+
+    pipeline = LipsyncPipeline(
+        vae=vae,
+        audio_encoder=audio_encoder,
+        denoising_unet=denoising_unet,
+        scheduler=scheduler,
+    ).to("cuda")
+    return pipeline, dtype
+
+
+def get_pipeline(config, config_path, checkpoint_path, latentsync_root, label="LatentSync", reserve_bytes=0):
+    """
+    返回 (管线, 推理精度)，同一 (配置文件, 模型文件) 只构建一次
+    切换到其他模型时先释放旧管线，避免两套权重同时占用显存；
+    reserve_bytes 为构建前向模型驻留管理器预留的显存，管线已常驻时不再预留（可用显存已扣除其占用）
+    """
+    from scripts.gpu_resources.model_manager import get_model_manager, empty_cuda_cache
+
+    model_manager = get_model_manager()
+    key = _cache_key(config_path, checkpoint_path)
+    with _pipeline_lock:
+        if _cached["pipeline"] is not None and _cached["key"] == key:
+            model_manager.touch(PIPELINE_SLOT)
+            return _cached["pipeline"], _cached["dtype"]
+
+        if _cached["pipeline"] is not None:
+            print(f"正在卸载 {_cached['label']} 推理管线...")
+            model_manager.unregister(PIPELINE_SLOT)
+            _release_pipeline()
+            empty_cuda_cache()
+
+        if reserve_bytes:
+            model_manager.reserve(PIPELINE_SLOT, reserve_bytes)
+        print(f"正在构建 {label} 推理管线（之后的任务将直接复用）...")
+        pipeline, dtype = build_pipeline(config, checkpoint_path, latentsync_root)
+        _cached.update(key=key, pipeline=pipeline, dtype=dtype, label=label)
+        model_manager.register(
+            PIPELINE_SLOT,
+            f"{label} 推理管线",
+            module_getter=lambda: _cached["pipeline"],
+            release_fn=_release_pipeline,
+            memory_fn=_pipeline_memory,
+        )
+        print(f"✓ {label} 推理管线构建完成")
+        return pipeline, dtype
+
+
+@contextlib.contextmanager
+def _patched(obj, name, make_wrapper):
+    # 在实例上临时替换方法，退出时恢复；对象没有该方法时不做处理
+    original = getattr(obj, name, None)
+    if obj is None or original is None:
+        yield
+        return
+    own_attribute = name in vars(obj)
+    setattr(obj, name, make_wrapper(original))
+    try:
+        yield
+    finally:
+        if own_attribute:
+            setattr(obj, name, original)
+        else:
+            delattr(obj, name)
+
+
+def _cached_image_processor(key):
+    """
+    替换 lipsync_pipeline 模块中的 ImageProcessor 类：同一 (分辨率, 遮罩) 只创建一次，
+    避免每次推理都重新加载人脸检测模型
+    """
+    def wrap(image_processor_class):
+        def factory(*args, **kwargs):
+            processors = _cached["image_processors"]
+            if key not in processors:
+                processors[key] = image_processor_class(*args, **kwargs)
+            return processors[key]
+        return factory
+    return wrap
+
+
+@contextlib.contextmanager
+def instrument_pipeline(pipeline, reporter, num_frames, num_inference_steps):
+    """
+    在管线的各阶段入口挂接进度报告：人脸检测（affine_transform_video）、音频特征（audio2feat）、
+    扩散去噪（scheduler.step，每步检查取消），最后一步去噪结束后进入视频合成阶段
+    reporter 需提供 stage(name, fraction, detail) 和 check_cancelled()
+    """
+    state = {"steps": 0, "total": 0}
+
+    def wrap_face(original):
+        def wrapper(*args, **kwargs):
+            reporter.check_cancelled()
+            reporter.stage("face")
+            return original(*args, **kwargs)
+        return wrapper
+
+    def wrap_audio(original):
+        def wrapper(*args, **kwargs):
+            reporter.check_cancelled()
+            reporter.stage("audio")
+            return original(*args, **kwargs)
+        return wrapper
+
+    def wrap_chunks(original):
+        def wrapper(*args, **kwargs):
+            chunks = original(*args, **kwargs)
+            # 每 num_frames 帧一段，每段执行 num_inference_steps 步去噪
+            state["total"] = max(1, math.ceil(len(chunks) / num_frames)) * num_inference_steps
+            reporter.stage("diffusion", 0.0, f"0/{state['total']} 步")
+            return chunks
+        return wrapper
+
+    def wrap_step(original):
+        def wrapper(*args, **kwargs):
+            reporter.check_cancelled()
+            result = original(*args, **kwargs)
+            state["steps"] += 1
+            total = max(state["total"], state["steps"])
+            if state["steps"] >= total and state["total"]:
+                reporter.stage("mux")
+            else:
+                reporter.stage("diffusion", state["steps"] / total, f"{state['steps']}/{total} 步")
+            return result
+        return wrapper
+
+    audio_encoder = getattr(pipeline, "audio_encoder", None)
+    with _patched(pipeline, "affine_transform_video", wrap_face), \
+            _patched(audio_encoder, "audio2feat", wrap_audio), \
+            _patched(audio_encoder, "feature2chunks", wrap_chunks), \
+            _patched(pipeline.scheduler, "step", wrap_step):
+        yield
+
+
+def run_inference(config, args, config_path, latentsync_root, label="LatentSync", reporter=None, face_cache=None,
+                  reserve_bytes=0):
+    """
+    使用缓存的管线执行一次唇形同步推理，参数与官方推理脚本的 args 相同；reserve_bytes 见 get_pipeline
+    reporter 不为空时按阶段报告进度，并在去噪步之间响应取消；
+    face_cache（FaceAlignmentCache）不为空时复用相同视频的人脸检测与仿射对齐结果
+    """
+    import torch
+    from latentsync.pipelines import lipsync_pipeline
+
+    if not os.path.exists(args.video_path):
+        raise RuntimeError(f"Video path '{args.video_path}' not found")
+    if not os.path.exists(args.audio_path):
+        raise RuntimeError(f"Audio path '{args.audio_path}' not found")
+
+    if reporter is not None:
+        reporter.stage("load")
+    pipeline, dtype = get_pipeline(config, config_path, args.inference_ckpt_path, latentsync_root, label, reserve_bytes)
+
+    if args.seed != -1:
+        from accelerate.utils import set_seed
+        set_seed(args.seed)
+    else:
+        torch.seed()
+    print(f"Initial seed: {torch.initial_seed()}")
+
+    with contextlib.ExitStack() as hooks:
+        image_processor_key = (config.data.resolution, os.path.abspath(config.data.mask_image_path))
+        hooks.enter_context(_patched(lipsync_pipeline, "ImageProcessor", _cached_image_processor(image_processor_key)))
+        # 缓存包装在内层，进度报告在外层：命中缓存时人脸检测阶段立即结束
+        if face_cache is not None:
+            hooks.enter_context(_patched(pipeline, "affine_transform_video", lambda original: face_cache.wrap(
+                original, resolution=config.data.resolution, mask_image_path=config.data.mask_image_path
+            )))
+        if reporter is not None:
+            hooks.enter_context(instrument_pipeline(pipeline, reporter, config.data.num_frames, args.inference_steps))
+        pipeline(
+            video_path=args.video_path,
+            audio_path=args.audio_path,
+            video_out_path=args.video_out_path,
+            num_frames=config.data.num_frames,
+            num_inference_steps=args.inference_steps,
+            guidance_scale=args.guidance_scale,
+            weight_dtype=dtype,
+            width=config.data.resolution,
+            height=config.data.resolution,
+            mask_image_path=config.data.mask_image_path,
+            temp_dir=args.temp_dir,
+        )
@@ -1,358 +1,644 @@
-import os
-import sys
-import gradio as gr
-from pathlib import Path
-from datetime import datetime
-import time
-import subprocess
-
-# 设置初始化完成标记
-LATENT_SYNC_UI_INITIALIZED = True
-
-# 添加LatentSync到Python路径
-current_dir = Path(__file__).parent.parent
-latentsync_path = current_dir / "LatentSync"
-latentsync_module_path = latentsync_path / "latentsync"
-checkpoints_path = latentsync_path / "checkpoints"
-auxiliary_path = checkpoints_path / "auxiliary"
-# 设置InsightFace模型路径
-def setup_insightface_path():
-    """设置InsightFace模型路径以确保人脸检测功能正常工作"""
-    # 设置INSIGHTFACE_ROOT环境变量
-    if auxiliary_path.exists():
-        os.environ["INSIGHTFACE_ROOT"] = str(auxiliary_path.resolve())
-    sys.path.insert(0, str(auxiliary_path / "facedetector"))
-
-# 在初始化时设置InsightFace路径（在任何导入之前）
-setup_insightface_path()
-
-# FFmpeg路径设置
-def setup_ffmpeg_path():
-    """设置FFmpeg路径以确保Gradio和系统可以找到ffmpeg和ffprobe"""
-    # 检查ffmpeg是否已经在PATH中
-    try:
-        result = subprocess.run(["ffmpeg", "-version"], 
-                              capture_output=True, text=True, check=True)
-        if result.returncode == 0:
-            return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        pass
-    
-    # 常见的FFmpeg安装路径 - 仅使用标准路径，移除特定环境路径
-    common_ffmpeg_paths = [
-        "C:\\ffmpeg\\bin",
-        "C:\\Program Files\\ffmpeg\\bin",
-        "C:\\Program Files (x86)\\ffmpeg\\bin",
-    ]
-    
-    # 尝试添加常见路径
-    system_path = os.environ.get("PATH", "")
-    for ffmpeg_path in common_ffmpeg_paths:
-        if os.path.exists(ffmpeg_path):
-            ffmpeg_exe = os.path.join(ffmpeg_path, "ffmpeg.exe")
-            ffprobe_exe = os.path.join(ffmpeg_path, "ffprobe.exe")
-            if os.path.exists(ffmpeg_exe) and os.path.exists(ffprobe_exe):
-                # 将路径添加到系统PATH
-                if system_path:
-                    os.environ["PATH"] = ffmpeg_path + os.pathsep + system_path
-                else:
-                    os.environ["PATH"] = ffmpeg_path
-                return True
-    
-    return False
-
-# 在初始化时设置FFmpeg路径
-setup_ffmpeg_path()
-
-# 将LatentSync和其子模块添加到Python路径开头以确保优先级
-sys.path.insert(0, str(latentsync_path))
-sys.path.insert(0, str(latentsync_module_path))
-
-# 导入LatentSync的推理函数
-try:
-    from LatentSync.scripts.inference import main as inference_main
-    main_func = inference_main
-except ImportError as e:
-    main_func = None
-
-# 模型配置
-MODEL_CONFIGS = {
-    "LatentSync": {
-        "config_path": latentsync_path / "configs/unet/stage2.yaml",
-        "checkpoint_path": Path(os.path.join(os.path.dirname(__file__), "..", "..", "..", "models", "LatentSync", "checkpoints", "latentsync_unet.pt"))
-    }
-}
-
-TEMP_DIR = latentsync_path / "temp"
-
-def create_args(
-    video_path: str, audio_path: str, output_path: str, inference_steps: int, guidance_scale: float, seed: int, model_name: str
-):
-    """创建参数对象"""
-    model_config = MODEL_CONFIGS[model_name]
-    checkpoint_path = model_config["checkpoint_path"]
-    config_path = model_config["config_path"]
-    
-    # 检查模型文件是否存在
-    if not checkpoint_path.exists():
-        raise FileNotFoundError(f"模型文件不存在: {checkpoint_path.absolute().as_posix()}")
-    
-    if not config_path.exists():
-        raise FileNotFoundError(f"配置文件不存在: {config_path.absolute().as_posix()}")
-    
-    import argparse
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--inference_ckpt_path", type=str, required=True)
-    parser.add_argument("--video_path", type=str, required=True)
-    parser.add_argument("--audio_path", type=str, required=True)
-    parser.add_argument("--video_out_path", type=str, required=True)
-    parser.add_argument("--inference_steps", type=int, default=20)
-    parser.add_argument("--guidance_scale", type=float, default=1.5)
-    parser.add_argument("--temp_dir", type=str, default="temp")
-    parser.add_argument("--seed", type=int, default=1247)
-    parser.add_argument("--enable_deepcache", action="store_true")
-    parser.add_argument("--unet_config_path", type=str, default="configs/unet/stage2_512.yaml")
-
-    return parser.parse_args(
-        [
-            "--inference_ckpt_path",
-            checkpoint_path.absolute().as_posix(),
-            "--video_path",
-            video_path,
-            "--audio_path",
-            audio_path,
-            "--video_out_path",
-            output_path,
-            "--inference_steps",
-            str(inference_steps),
-            "--guidance_scale",
-            str(guidance_scale),
-            "--seed",
-            str(seed),
-            "--temp_dir",
-            str(TEMP_DIR),
-            "--unet_config_path",
-            config_path.absolute().as_posix(),
-        ]
-    )
-
-
-def process_video(
-    video_path,
-    audio_path,
-    guidance_scale,
-    inference_steps,
-    seed,
-    model_name,
-):
-    """处理视频和音频生成数字人视频"""
-    try:
-        # 检查输入文件是否存在
-        if not video_path or not os.path.exists(video_path):
-            raise FileNotFoundError("视频文件不存在，请选择有效的视频文件")
-        
-        if not audio_path or not os.path.exists(audio_path):
-            raise FileNotFoundError("音频文件不存在，请选择有效的音频文件")
-        
-        # 检查模型文件是否存在
-        model_config = MODEL_CONFIGS[model_name]
-        checkpoint_path = model_config["checkpoint_path"]
-        config_path = model_config["config_path"]
-        
-        if not checkpoint_path.exists():
-            raise FileNotFoundError(f"模型文件不存在: {checkpoint_path.absolute().as_posix()}\n请确保已下载模型文件到正确位置")
-        
-        if not config_path.exists():
-            raise FileNotFoundError(f"配置文件不存在: {config_path.absolute().as_posix()}")
-        
-        # 创建输出目录 - 使用WebUI的outputs目录
-        from modules import shared
-        output_dir = os.path.join(shared.data_path, "outputs", "latent-sync")
-        try:
-            os.makedirs(output_dir, exist_ok=True)
-        except Exception as e:
-            raise Exception(f"无法创建输出目录: {str(e)}。请检查磁盘空间和写入权限") from e
-
-        # 转换路径为绝对路径
-        video_file_path = Path(video_path)
-        video_path = video_file_path.absolute().as_posix()
-        audio_path = Path(audio_path).absolute().as_posix()
-
-        # 设置输出路径
-        current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_filename = f"latentsync_output_{current_time}.mp4"
-        output_path = os.path.join(output_dir, output_filename)
-        
-        # 设置环境变量确保模型从正确路径加载
-        project_root = os.path.join(os.path.dirname(__file__), "..", "..", "..")
-        vae_model_path = os.path.join(project_root, "models", "LatentSync", "checkpoints", "sd-vae-ft-mse")
-        os.environ["VAE_MODEL_PATH"] = vae_model_path
-        
-        # 创建参数对象而不是直接构建命令行参数
-        args = create_args(
-            video_path=video_path,
-            audio_path=audio_path,
-            output_path=output_path,
-            inference_steps=inference_steps,
-            guidance_scale=guidance_scale,
-            seed=seed,
-            model_name=model_name
-        )
-        
-        # 导入推理函数并执行
-        try:
-            from LatentSync.scripts.inference import main as inference_main
-            from omegaconf import OmegaConf
-        except ImportError as e:
-            raise ImportError("无法导入必要的模块，请确保LatentSync正确安装") from e
-        
-        # 确保使用正确的配置路径
-        args.unet_config_path = (latentsync_path / args.unet_config_path).absolute().as_posix()
-        
-        try:
-            config = OmegaConf.load(args.unet_config_path)
-            inference_main(config, args)
-        except Exception as e:
-            error_msg = str(e)
-            # 提供更具体的错误信息
-            if "Face not detected" in error_msg:
-                error_msg = ("处理视频时出错: 未检测到人脸。\n"
-                            "请确保视频中包含清晰可见的正面人脸。")
-            elif "CUDA out of memory" in error_msg:
-                error_msg = ("显存不足：\n"
-                            "1. 尝试降低视频分辨率\n"
-                            "2. 减少推理步数\n"
-                            "3. 使用更小的模型版本")
-            elif "FFmpeg" in error_msg or "ffmpeg" in error_msg:
-                error_msg = ("FFmpeg错误：\n"
-                            "1. 确保正确安装了FFmpeg并配置环境变量\n"
-                            "2. 检查视频文件格式是否支持\n"
-                            "3. 确保视频文件未损坏")
-            elif "Invalid audio format" in error_msg:
-                error_msg = ("音频格式错误：\n"
-                            "1. 请使用标准音频格式（如WAV、MP3）\n"
-                            "2. 确保音频文件未损坏")
-            elif "Video and audio duration mismatch" in error_msg:
-                error_msg = ("视频和音频时长不匹配：\n"
-                            "1. 确保视频和音频文件的时长相近\n"
-                            "2. 截取或裁剪较长的文件以匹配时长")
-            else:
-                error_msg = f"处理失败: {error_msg}"
-            
-            raise Exception(error_msg) from e
-        
-        # 检查输出文件是否存在
-        if not os.path.exists(output_path):
-            raise Exception("处理完成但未生成输出文件。\n"
-                          "请检查磁盘空间和写入权限。")
-            
-        return output_path
-    except Exception as e:
-        error_msg = f"处理视频时出错: {str(e)}"
-        # 如果是显存不足错误，添加额外提示
-        if "CUDA out of memory" in str(e):
-            error_msg += "\n提示：尝试降低视频分辨率或使用更小的模型版本"
-        raise gr.Error(error_msg)
-
-
-def create_latent_sync_ui():
-    """创建LatentSync用户界面"""
-    with gr.Group():
-        gr.Markdown("## 数字人视频生成")
-        
-        with gr.Row():
-            with gr.Column():
-                video_input = gr.Video(label="输入视频")
-                audio_input = gr.Audio(label="输入音频", type="filepath")
-                
-                # 添加模型选择下拉框
-                model_choice = gr.Dropdown(
-                    choices=list(MODEL_CONFIGS.keys()),
-                    value=list(MODEL_CONFIGS.keys())[0],  # 默认选择第一个模型
-                    label="选择模型",
-                    info="8GB显存选择LatentSync 1.5，18GB显存选择LatentSync 1.6"
-                )
-
-                with gr.Row():
-                    guidance_scale = gr.Slider(
-                        minimum=1.0,
-                        maximum=3.0,
-                        value=1.5,
-                        step=0.1,
-                        label="引导尺度",
-                    )
-                    inference_steps = gr.Slider(
-                        minimum=10, 
-                        maximum=50, 
-                        value=20, 
-                        step=1, 
-                        label="推理步数"
-                    )
-
-                with gr.Row():
-                    seed = gr.Number(value=1247, label="随机种子", precision=0)
-
-            with gr.Column():
-                video_output = gr.Video(label="输出视频")
-                
-                with gr.Row():
-                    process_btn = gr.Button("生成数字人视频", variant="primary")
-                    # 添加打开输出目录按钮
-                    open_output_dir_btn = gr.Button("打开输出目录")
-                    
-                    def open_latent_sync_output_dir():
-                        """打开数字人视频输出目录"""
-                        from modules import shared
-                        output_dir = os.path.join(shared.data_path, "outputs", "latent-sync")
-                        os.makedirs(output_dir, exist_ok=True)
-                        import subprocess
-                        import platform
-                        try:
-                            if platform.system() == "Windows":
-                                subprocess.run(["explorer", output_dir])
-                            elif platform.system() == "Darwin":  # macOS
-                                subprocess.run(["open", output_dir])
-                            else:  # Linux
-                                subprocess.run(["xdg-open", output_dir])
-                        except Exception as e:
-                            print(f"打开目录失败: {e}")
-                    
-                    open_output_dir_btn.click(fn=open_latent_sync_output_dir, inputs=[], outputs=[])
-
-                # 示例
-                gr.Examples(
-                    examples=[
-                        [str(latentsync_path / "assets" / "demo1_video.mp4"), 
-                         str(latentsync_path / "assets" / "demo1_audio.wav"),
-                         list(MODEL_CONFIGS.keys())[0]],
-                        [str(latentsync_path / "assets" / "demo2_video.mp4"), 
-                         str(latentsync_path / "assets" / "demo2_audio.wav"),
-                         list(MODEL_CONFIGS.keys())[0]],
-                    ],
-                    inputs=[video_input, audio_input, model_choice],
-                )
-
-        # 绑定事件
-        process_btn.click(
-            fn=process_video,
-            inputs=[
-                video_input,
-                audio_input,
-                guidance_scale,
-                inference_steps,
-                seed,
-                model_choice,
-            ],
-            outputs=video_output,
-        )
-        
-        return {
-            "video_input": video_input,
-            "audio_input": audio_input,
-            "model_choice": model_choice,
-            "guidance_scale": guidance_scale,
-            "inference_steps": inference_steps,
-            "seed": seed,
-            "process_btn": process_btn,
-            "video_output": video_output
+import os
+import sys
+import gradio as gr
+from pathlib import Path
+from datetime import datetime
+import time
+import shutil
+import subprocess
+
+from scripts.latent_sync.face_cache import FaceAlignmentCache
+from scripts.latent_sync.job_queue import (
+    LipSyncJobQueue, JobCancelled, STATUS_QUEUED, STATUS_RUNNING, STATUS_DONE, STATUS_LABELS
+)
+
+# 设置初始化完成标记
+LATENT_SYNC_UI_INITIALIZED = True
+
+# 添加LatentSync到Python路径
+current_dir = Path(__file__).parent.parent
+latentsync_path = current_dir / "LatentSync"
+latentsync_module_path = latentsync_path / "latentsync"
+checkpoints_path = latentsync_path / "checkpoints"
+auxiliary_path = checkpoints_path / "auxiliary"
+# 设置InsightFace模型路径
+def setup_insightface_path():
+    """设置InsightFace模型路径以确保人脸检测功能正常工作"""
+    # 设置INSIGHTFACE_ROOT环境变量
+    if auxiliary_path.exists():
+        os.environ["INSIGHTFACE_ROOT"] = str(auxiliary_path.resolve())
+    sys.path.insert(0, str(auxiliary_path / "facedetector"))
+
+# 在初始化时设置InsightFace路径（在任何导入之前）
+setup_insightface_path()
+
+# FFmpeg路径设置
+def setup_ffmpeg_path():
+    """设置FFmpeg路径以确保Gradio和系统可以找到ffmpeg和ffprobe"""
+    # 检查ffmpeg是否已经在PATH中
+    try:
+        result = subprocess.run(["ffmpeg", "-version"], 
+                              capture_output=True, text=True, check=True)
+        if result.returncode == 0:
+            return True
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        pass
+    
+    # 常见的FFmpeg安装路径 - 仅使用标准路径，移除特定环境路径
+    common_ffmpeg_paths = [
+        "C:\\ffmpeg\\bin",
+        "C:\\Program Files\\ffmpeg\\bin",
+        "C:\\Program Files (x86)\\ffmpeg\\bin",
+    ]
+    
+    # 尝试添加常见路径
+    system_path = os.environ.get("PATH", "")
+    for ffmpeg_path in common_ffmpeg_paths:
+        if os.path.exists(ffmpeg_path):
+            ffmpeg_exe = os.path.join(ffmpeg_path, "ffmpeg.exe")
+            ffprobe_exe = os.path.join(ffmpeg_path, "ffprobe.exe")
+            if os.path.exists(ffmpeg_exe) and os.path.exists(ffprobe_exe):
+                # 将路径添加到系统PATH
+                if system_path:
+                    os.environ["PATH"] = ffmpeg_path + os.pathsep + system_path
+                else:
+                    os.environ["PATH"] = ffmpeg_path
+                return True
+    
+    return False
+
+# 在初始化时设置FFmpeg路径
+setup_ffmpeg_path()
+
+# 将LatentSync和其子模块添加到Python路径开头以确保优先级
+sys.path.insert(0, str(latentsync_path))
+sys.path.insert(0, str(latentsync_module_path))
+
+# 导入LatentSync的推理函数
+try:
+    from LatentSync.scripts.inference import main as inference_main
+    main_func = inference_main
+except ImportError as e:
+    main_func = None
+
+# 模型配置（vram_gb 为推理时的显存估算，用于加载前按显存预算卸载其他模型）
+MODEL_CONFIGS = {
+    "LatentSync": {
+        "config_path": latentsync_path / "configs/unet/stage2.yaml",
+        "checkpoint_path": Path(os.path.join(os.path.dirname(__file__), "..", "..", "..", "models", "LatentSync", "checkpoints", "latentsync_unet.pt")),
+        "vram_gb": 8
+    }
+}
+
+# 与 Qwen3-TTS、Whisper 共用的模型驻留管理器中的占用名；推理期间独占 GPU，其他模型的新请求等待
+LATENT_SYNC_SLOT = "latent_sync"
+
+TEMP_DIR = latentsync_path / "temp"
+
+# 后台任务的输入文件副本（Gradio 临时文件可能在任务执行前被清理）
+JOB_INPUT_DIR = TEMP_DIR / "job_inputs"
+
+# 人脸对齐缓存（同一视频配不同音频时跳过人脸检测与仿射对齐）
+face_cache = FaceAlignmentCache(str(TEMP_DIR / "face_cache"))
+
+def create_args(
+    video_path: str, audio_path: str, output_path: str, inference_steps: int, guidance_scale: float, seed: int, model_name: str
+):
+    """创建参数对象"""
+    model_config = MODEL_CONFIGS[model_name]
+    checkpoint_path = model_config["checkpoint_path"]
+    config_path = model_config["config_path"]
+    
+    # 检查模型文件是否存在
+    if not checkpoint_path.exists():
+        raise FileNotFoundError(f"模型文件不存在: {checkpoint_path.absolute().as_posix()}")
+    
+    if not config_path.exists():
+        raise FileNotFoundError(f"配置文件不存在: {config_path.absolute().as_posix()}")
+    
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--inference_ckpt_path", type=str, required=True)
+    parser.add_argument("--video_path", type=str, required=True)
+    parser.add_argument("--audio_path", type=str, required=True)
+    parser.add_argument("--video_out_path", type=str, required=True)
+    parser.add_argument("--inference_steps", type=int, default=20)
+    parser.add_argument("--guidance_scale", type=float, default=1.5)
+    parser.add_argument("--temp_dir", type=str, default="temp")
+    parser.add_argument("--seed", type=int, default=1247)
+    parser.add_argument("--enable_deepcache", action="store_true")
+    parser.add_argument("--unet_config_path", type=str, default="configs/unet/stage2_512.yaml")
+
+    return parser.parse_args(
+        [
+            "--inference_ckpt_path",
+            checkpoint_path.absolute().as_posix(),
+            "--video_path",
+            video_path,
+            "--audio_path",
+            audio_path,
+            "--video_out_path",
+            output_path,
+            "--inference_steps",
+            str(inference_steps),
+            "--guidance_scale",
+            str(guidance_scale),
+            "--seed",
+            str(seed),
+            "--temp_dir",
+            str(TEMP_DIR),
+            "--unet_config_path",
+            config_path.absolute().as_posix(),
+        ]
+    )
+
+
+def run_lip_sync(
+    video_path,
+    audio_path,
+    guidance_scale,
+    inference_steps,
+    seed,
+    model_name,
+    reporter=None,
+    output_name=None,
+):
+    """
+    生成数字人视频并返回输出文件路径，出错时抛出带有处理建议的异常
+    reporter 不为空时按阶段报告进度并响应取消（后台任务队列使用）
+    output_name 为输出文件名中的标识（批量模式使用音频文件名），默认为 output
+    """
+    # 检查输入文件是否存在
+    if not video_path or not os.path.exists(video_path):
+        raise FileNotFoundError("视频文件不存在，请选择有效的视频文件")
+    
+    if not audio_path or not os.path.exists(audio_path):
+        raise FileNotFoundError("音频文件不存在，请选择有效的音频文件")
+    
+    # 检查模型文件是否存在
+    model_config = MODEL_CONFIGS[model_name]
+    checkpoint_path = model_config["checkpoint_path"]
+    config_path = model_config["config_path"]
+    
+    if not checkpoint_path.exists():
+        raise FileNotFoundError(f"模型文件不存在: {checkpoint_path.absolute().as_posix()}\n请确保已下载模型文件到正确位置")
+    
+    if not config_path.exists():
+        raise FileNotFoundError(f"配置文件不存在: {config_path.absolute().as_posix()}")
+    
+    # 创建输出目录 - 使用WebUI的outputs目录
+    from modules import shared
+    output_dir = os.path.join(shared.data_path, "outputs", "latent-sync")
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+    except Exception as e:
+        raise Exception(f"无法创建输出目录: {str(e)}。请检查磁盘空间和写入权限") from e
+
+    # 转换路径为绝对路径
+    video_file_path = Path(video_path)
+    video_path = video_file_path.absolute().as_posix()
+    audio_path = Path(audio_path).absolute().as_posix()
+
+    # 设置输出路径
+    current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_filename = f"latentsync_{output_name or 'output'}_{current_time}.mp4"
+    output_path = os.path.join(output_dir, output_filename)
+    
+    # 设置环境变量确保模型从正确路径加载
+    project_root = os.path.join(os.path.dirname(__file__), "..", "..", "..")
+    vae_model_path = os.path.join(project_root, "models", "LatentSync", "checkpoints", "sd-vae-ft-mse")
+    os.environ["VAE_MODEL_PATH"] = vae_model_path
+    
+    # 创建参数对象而不是直接构建命令行参数
+    args = create_args(
+        video_path=video_path,
+        audio_path=audio_path,
+        output_path=output_path,
+        inference_steps=inference_steps,
+        guidance_scale=guidance_scale,
+        seed=seed,
+        model_name=model_name
+    )
+    
+    # 导入推理管线缓存并执行（管线按配置与模型文件构建一次，之后的任务直接复用）
+    try:
+        from omegaconf import OmegaConf
+        from scripts.latent_sync.pipeline_cache import run_inference
+    except ImportError as e:
+        raise ImportError("无法导入必要的模块，请确保LatentSync正确安装") from e
+    
+    # 确保使用正确的配置路径
+    args.unet_config_path = (latentsync_path / args.unet_config_path).absolute().as_posix()
+    
+    from scripts.gpu_resources.model_manager import get_model_manager
+    model_manager = get_model_manager()
+    
+    try:
+        config = OmegaConf.load(args.unet_config_path)
+        # 独占租约：等待语音合成等任务结束；构建推理管线前按显存预算预留所需显存（只在不足时卸载最久未使用的模型）
+        with model_manager.lease(LATENT_SYNC_SLOT, exclusive=True):
+            run_inference(config, args, args.unet_config_path, latentsync_path.as_posix(),
+                          label=model_name, reporter=reporter, face_cache=face_cache,
+                          reserve_bytes=int(model_config.get("vram_gb", 0) * 1024 ** 3))
+    except JobCancelled:
+        raise
+    except Exception as e:
+        error_msg = str(e)
+        # 提供更具体的错误信息
+        if "Face not detected" in error_msg:
+            error_msg = ("处理视频时出错: 未检测到人脸。\n"
+                        "请确保视频中包含清晰可见的正面人脸。")
+        elif "CUDA out of memory" in error_msg:
+            error_msg = ("显存不足：\n"
+                        "1. 尝试降低视频分辨率\n"
+                        "2. 减少推理步数\n"
+                        "3. 使用更小的模型版本")
+        elif "FFmpeg" in error_msg or "ffmpeg" in error_msg:
+            error_msg = ("FFmpeg错误：\n"
+                        "1. 确保正确安装了FFmpeg并配置环境变量\n"
+                        "2. 检查视频文件格式是否支持\n"
+                        "3. 确保视频文件未损坏")
+        elif "Invalid audio format" in error_msg:
+            error_msg = ("音频格式错误：\n"
+                        "1. 请使用标准音频格式（如WAV、MP3）\n"
+                        "2. 确保音频文件未损坏")
+        elif "Video and audio duration mismatch" in error_msg:
+            error_msg = ("视频和音频时长不匹配：\n"
+                        "1. 确保视频和音频文件的时长相近\n"
+                        "2. 截取或裁剪较长的文件以匹配时长")
+        else:
+            error_msg = f"处理失败: {error_msg}"
+        
+        raise Exception(error_msg) from e
+    
+    # 检查输出文件是否存在
+    if not os.path.exists(output_path):
+        raise Exception("处理完成但未生成输出文件。\n"
+                      "请检查磁盘空间和写入权限。")
+        
+    return output_path
+
+
+def process_video(
+    video_path,
+    audio_path,
+    guidance_scale,
+    inference_steps,
+    seed,
+    model_name,
+):
+    """处理视频和音频生成数字人视频"""
+    try:
+        return run_lip_sync(video_path, audio_path, guidance_scale, inference_steps, seed, model_name)
+    except Exception as e:
+        error_msg = f"处理视频时出错: {str(e)}"
+        # 如果是显存不足错误，添加额外提示
+        if "CUDA out of memory" in str(e):
+            error_msg += "\n提示：尝试降低视频分辨率或使用更小的模型版本"
+        raise gr.Error(error_msg)
+
+
+def run_lip_sync_batch(
+    video_path,
+    audio_paths,
+    guidance_scale,
+    inference_steps,
+    seed,
+    model_name,
+    reporter=None,
+):
+    """
+    一个视频依次配多段音频，返回输出文件路径列表
+    整批持有 GPU 独占租约，推理管线只构建一次；第一条完成人脸检测后，其余各条直接复用人脸对齐缓存。
+    单条失败不影响其他音频，全部失败时抛出异常
+    """
+    from scripts.gpu_resources.model_manager import get_model_manager
+
+    outputs = []
+    errors = []
+    with get_model_manager().lease(LATENT_SYNC_SLOT, exclusive=True):
+        for index, audio_path in enumerate(audio_paths):
+            if reporter is not None:
+                reporter.check_cancelled()
+                reporter.item(index, len(audio_paths))
+            audio_name = Path(audio_path).stem
+            print(f"批量唇形同步 {index + 1}/{len(audio_paths)}：{audio_name}")
+            try:
+                outputs.append(run_lip_sync(
+                    video_path, audio_path, guidance_scale, inference_steps, seed, model_name,
+                    reporter=reporter, output_name=audio_name
+                ))
+            except JobCancelled:
+                raise
+            except Exception as e:
+                errors.append(f"{Path(audio_path).name}：{e}")
+                print(f"❌ {Path(audio_path).name} 处理失败：{e}")
+
+    if not outputs:
+        raise Exception("全部音频处理失败：\n" + "\n".join(errors))
+    if errors and reporter is not None:
+        reporter.errors.extend(errors)
+    return outputs
+
+
+def _run_queued_job(params, reporter):
+    """
+    后台任务队列的执行函数（含 audio_paths 的为批量任务），完成后删除任务的输入文件副本
+    """
+    params = dict(params)
+    input_dir = params.pop("input_dir", None)
+    try:
+        if "audio_paths" in params:
+            return run_lip_sync_batch(reporter=reporter, **params)
+        return run_lip_sync(reporter=reporter, **params)
+    finally:
+        if input_dir:
+            shutil.rmtree(input_dir, ignore_errors=True)
+
+
+# 唇形同步任务队列（SQLite 持久化）；导入时不启动后台线程，WebUI 启动完成后由 resume_lip_sync_jobs 继续遗留的排队任务
+job_queue = LipSyncJobQueue(str(current_dir / "config" / "latent_sync_jobs.sqlite3"), _run_queued_job)
+
+
+def resume_lip_sync_jobs():
+    """
+    继续执行上次 WebUI 退出时仍在排队的任务（在 app_started 回调中调用）
+    """
+    return job_queue.resume()
+
+
+def submit_lip_sync_job(video_path, audio_path, guidance_scale, inference_steps, seed, model_name):
+    """
+    复制输入文件并提交后台任务，返回任务 ID
+    """
+    if not video_path or not os.path.exists(video_path):
+        raise gr.Error("视频文件不存在，请选择有效的视频文件")
+    if not audio_path or not os.path.exists(audio_path):
+        raise gr.Error("音频文件不存在，请选择有效的音频文件")
+
+    input_dir = JOB_INPUT_DIR / datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    os.makedirs(input_dir, exist_ok=True)
+    video_copy = shutil.copy(video_path, input_dir / Path(video_path).name)
+    audio_copy = shutil.copy(audio_path, input_dir / Path(audio_path).name)
+    return job_queue.submit({
+        "video_path": str(video_copy),
+        "audio_path": str(audio_copy),
+        "guidance_scale": float(guidance_scale),
+        "inference_steps": int(inference_steps),
+        "seed": int(seed),
+        "model_name": model_name,
+        "input_dir": str(input_dir),
+    })
+
+
+def submit_lip_sync_batch(video_path, audio_files, guidance_scale, inference_steps, seed, model_name):
+    """
+    复制视频与全部音频并提交一个批量任务，返回任务 ID
+    """
+    if not video_path or not os.path.exists(video_path):
+        raise gr.Error("视频文件不存在，请选择有效的视频文件")
+    # Gradio 3 上传的是临时文件对象，Gradio 4 为文件路径
+    audio_paths = [getattr(f, "name", f) for f in (audio_files or [])]
+    audio_paths = [path for path in audio_paths if path and os.path.exists(path)]
+    if not audio_paths:
+        raise gr.Error("请上传至少一个音频文件")
+
+    input_dir = JOB_INPUT_DIR / datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    os.makedirs(input_dir / "audio", exist_ok=True)
+    video_copy = shutil.copy(video_path, input_dir / Path(video_path).name)
+    audio_copies = []
+    for index, path in enumerate(audio_paths):
+        # 加序号前缀，避免同名音频互相覆盖
+        audio_copies.append(str(shutil.copy(path, input_dir / "audio" / f"{index + 1:03d}_{Path(path).name}")))
+    return job_queue.submit({
+        "video_path": str(video_copy),
+        "audio_paths": audio_copies,
+        "guidance_scale": float(guidance_scale),
+        "inference_steps": int(inference_steps),
+        "seed": int(seed),
+        "model_name": model_name,
+        "input_dir": str(input_dir),
+    })
+
+
+def watch_lip_sync_job(job_id):
+    """
+    持续输出任务状态，任务结束后输出结果视频（批量任务同时输出全部文件）；关闭页面不影响任务执行
+    """
+    job_id = (job_id or "").strip()
+    if not job_id:
+        yield "请输入任务 ID", gr.update(), gr.update()
+        return
+    while True:
+        job = job_queue.get(job_id)
+        if job is None or job["status"] not in (STATUS_QUEUED, STATUS_RUNNING):
+            break
+        yield job_queue.describe(job_id), gr.update(), gr.update()
+        time.sleep(1)
+    outputs = job["output_paths"] if job and job["status"] == STATUS_DONE else []
+    outputs = [path for path in outputs if os.path.exists(path)]
+    if not outputs:
+        yield job_queue.describe(job_id), gr.update(), gr.update()
+        return
+    yield job_queue.describe(job_id), outputs[-1], outputs
+
+
+def list_lip_sync_jobs():
+    """
+    最近任务列表（供界面显示）
+    """
+    jobs = job_queue.list()
+    if not jobs:
+        return "暂无任务"
+    lines = []
+    for job in jobs:
+        created = datetime.fromtimestamp(job["created_at"]).strftime("%m-%d %H:%M")
+        params = job["params"]
+        if "audio_paths" in params:
+            audio_text = f"{len(params['audio_paths'])} 段音频（批量）"
+        else:
+            audio_text = Path(params["audio_path"]).name
+        lines.append(f"{job['job_id']}  {STATUS_LABELS.get(job['status'], job['status'])}  {created}  "
+                     f"{Path(params['video_path']).name} + {audio_text}")
+    return "\n".join(lines)
+
+
+def create_latent_sync_ui():
+    """创建LatentSync用户界面"""
+    with gr.Group():
+        gr.Markdown("## 数字人视频生成")
+        
+        with gr.Row():
+            with gr.Column():
+                video_input = gr.Video(label="输入视频")
+                audio_input = gr.Audio(label="输入音频", type="filepath")
+                
+                # 添加模型选择下拉框
+                model_choice = gr.Dropdown(
+                    choices=list(MODEL_CONFIGS.keys()),
+                    value=list(MODEL_CONFIGS.keys())[0],  # 默认选择第一个模型
+                    label="选择模型",
+                    info="8GB显存选择LatentSync 1.5，18GB显存选择LatentSync 1.6"
+                )
+
+                with gr.Row():
+                    guidance_scale = gr.Slider(
+                        minimum=1.0,
+                        maximum=3.0,
+                        value=1.5,
+                        step=0.1,
+                        label="引导尺度",
+                    )
+                    inference_steps = gr.Slider(
+                        minimum=10, 
+                        maximum=50, 
+                        value=20, 
+                        step=1, 
+                        label="推理步数"
+                    )
+
+                with gr.Row():
+                    seed = gr.Number(value=1247, label="随机种子", precision=0)
+                
+                # 批量模式：同一视频配多段音频，模型加载与人脸检测只做一次
+                with gr.Accordion("🎞️ 批量配音（一个视频配多段音频）", open=False):
+                    batch_audio_input = gr.File(
+                        label="批量音频",
+                        file_count="multiple",
+                        file_types=["audio"]
+                    )
+                    batch_process_btn = gr.Button("批量生成数字人视频", variant="primary")
+                    batch_output = gr.File(label="批量输出", file_count="multiple", interactive=False)
+
+            with gr.Column():
+                video_output = gr.Video(label="输出视频")
+                
+                with gr.Row():
+                    job_id_box = gr.Textbox(label="任务 ID", placeholder="提交后自动填入，也可输入之前的任务 ID 查看结果", scale=3)
+                    job_refresh_btn = gr.Button("🔄 查看任务", scale=1)
+                    job_cancel_btn = gr.Button("⏹️ 取消任务", scale=1)
+                job_status = gr.Textbox(label="任务状态", lines=2, interactive=False)
+                
+                with gr.Row():
+                    process_btn = gr.Button("生成数字人视频", variant="primary")
+                    # 添加打开输出目录按钮
+                    open_output_dir_btn = gr.Button("打开输出目录")
+                    
+                    def open_latent_sync_output_dir():
+                        """打开数字人视频输出目录"""
+                        from modules import shared
+                        output_dir = os.path.join(shared.data_path, "outputs", "latent-sync")
+                        os.makedirs(output_dir, exist_ok=True)
+                        import subprocess
+                        import platform
+                        try:
+                            if platform.system() == "Windows":
+                                subprocess.run(["explorer", output_dir])
+                            elif platform.system() == "Darwin":  # macOS
+                                subprocess.run(["open", output_dir])
+                            else:  # Linux
+                                subprocess.run(["xdg-open", output_dir])
+                        except Exception as e:
+                            print(f"打开目录失败: {e}")
+                    
+                    open_output_dir_btn.click(fn=open_latent_sync_output_dir, inputs=[], outputs=[])
+
+                # 示例
+                gr.Examples(
+                    examples=[
+                        [str(latentsync_path / "assets" / "demo1_video.mp4"), 
+                         str(latentsync_path / "assets" / "demo1_audio.wav"),
+                         list(MODEL_CONFIGS.keys())[0]],
+                        [str(latentsync_path / "assets" / "demo2_video.mp4"), 
+                         str(latentsync_path / "assets" / "demo2_audio.wav"),
+                         list(MODEL_CONFIGS.keys())[0]],
+                    ],
+                    inputs=[video_input, audio_input, model_choice],
+                )
+
+                with gr.Accordion("📋 最近任务", open=False):
+                    job_list = gr.Textbox(label="任务列表", lines=6, interactive=False, show_label=False)
+                    job_list_btn = gr.Button("🔄 刷新列表", variant="secondary")
+                
+                with gr.Accordion("🗂️ 人脸对齐缓存", open=False):
+                    face_cache_info = gr.Textbox(show_label=False, interactive=False)
+                    with gr.Row():
+                        face_cache_refresh_btn = gr.Button("🔄 刷新", variant="secondary")
+                        face_cache_clear_btn = gr.Button("🗑️ 清空缓存", variant="secondary")
+
+        # 绑定事件：提交到后台任务队列，页面持续显示进度；刷新页面后可按任务 ID 重新查看
+        process_btn.click(
+            fn=submit_lip_sync_job,
+            inputs=[
+                video_input,
+                audio_input,
+                guidance_scale,
+                inference_steps,
+                seed,
+                model_choice,
+            ],
+            outputs=job_id_box,
+        ).then(
+            fn=watch_lip_sync_job,
+            inputs=[job_id_box],
+            outputs=[job_status, video_output, batch_output],
+        )
+        
+        batch_process_btn.click(
+            fn=submit_lip_sync_batch,
+            inputs=[
+                video_input,
+                batch_audio_input,
+                guidance_scale,
+                inference_steps,
+                seed,
+                model_choice,
+            ],
+            outputs=job_id_box,
+        ).then(
+            fn=watch_lip_sync_job,
+            inputs=[job_id_box],
+            outputs=[job_status, video_output, batch_output],
+        )
+        
+        job_refresh_btn.click(fn=watch_lip_sync_job, inputs=[job_id_box], outputs=[job_status, video_output, batch_output])
+        
+        def on_cancel_job(job_id):
+            job_id = (job_id or "").strip()
+            if job_queue.get(job_id) is None:
+                return f"未找到任务 {job_id}"
+            previous_status = job_queue.cancel(job_id)
+            if previous_status == STATUS_QUEUED:
+                # 只有确实从排队中取消的任务才删除输入文件，执行中的任务由 _run_queued_job 结束后清理
+                job = job_queue.get(job_id)
+                shutil.rmtree(job["params"].get("input_dir") or "", ignore_errors=True)
+                return job_queue.describe(job_id)
+            if previous_status == STATUS_RUNNING:
+                return f"已请求取消任务 {job_id}，将在当前去噪步完成后停止"
+            return job_queue.describe(job_id)
+        
+        job_cancel_btn.click(fn=on_cancel_job, inputs=[job_id_box], outputs=[job_status], queue=False)
+        job_list_btn.click(fn=list_lip_sync_jobs, outputs=[job_list])
+        
+        def on_clear_face_cache():
+            face_cache.clear()
+            return face_cache.stats()
+        
+        face_cache_refresh_btn.click(fn=face_cache.stats, outputs=[face_cache_info])
+        face_cache_clear_btn.click(fn=on_clear_face_cache, outputs=[face_cache_info])
+        
+        return {
+            "video_input": video_input,
+            "audio_input": audio_input,
+            "model_choice": model_choice,
+            "guidance_scale": guidance_scale,
+            "inference_steps": inference_steps,
+            "seed": seed,
+            "process_btn": process_btn,
+            "video_output": video_output,
+            "job_id": job_id_box,
+            "job_status": job_status,
+            "batch_audio_input": batch_audio_input,
+            "batch_process_btn": batch_process_btn,
+            "batch_output": batch_output
         }
\ No newline at end of file
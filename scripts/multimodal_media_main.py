@@ -1,5 +1,5 @@
 import gradio as gr
-from modules import script_callbacks
+from modules import script_callbacks, shared
 
 def multimodal_media_tab():
     with gr.Blocks(analytics_enabled=False) as ui:
@@ -70,5 +70,32 @@ def multimodal_media_tab():
 
     return [(ui, "多媒体处理", "multimodal_media_tab")]
 
+def on_app_started(demo, app):
+    """
+    注册 Qwen3-TTS REST 接口，与界面共用已加载的模型和缓存；继续执行上次遗留的唇形同步排队任务
+    """
+    try:
+        from scripts.latent_sync_ui import resume_lip_sync_jobs
+        resume_lip_sync_jobs()
+    except Exception as e:
+        print(f"唇形同步任务队列恢复失败：{e}")
+        import traceback
+        traceback.print_exc()
+
+    # 与 WebUI 内置接口一致，只在以 --api 启动时对外提供接口
+    if not getattr(shared.cmd_opts, "api", False):
+        print("未启用 --api，跳过 Qwen3-TTS 接口注册")
+        return
+    try:
+        from scripts.qwen3_tts.api import register_tts_api
+        register_tts_api(app)
+    except Exception as e:
+        print(f"Qwen3-TTS 接口注册失败：{e}")
+        import traceback
+        traceback.print_exc()
+
 # 注册 UI 标签页
 script_callbacks.on_ui_tabs(multimodal_media_tab)
+
+# 注册 REST 接口
+script_callbacks.on_app_started(on_app_started)
@@ -0,0 +1,4 @@
+"""
+Qwen3-TTS 辅助模块包
+包含语音识别缓存等与 qwen3_tts_ui 配套的功能
+"""
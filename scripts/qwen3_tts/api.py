@@ -0,0 +1,243 @@
+"""
+Qwen3-TTS REST 接口
+通过 script_callbacks.on_app_started 注册到 WebUI 的 FastAPI 应用，与界面共用同一进程内的模型与缓存；
+与 WebUI 内置接口一致，仅在以 --api 启动时注册，启用 --api-auth 时要求 HTTP Basic 认证
+
+POST /multimodal-media/tts          合成语音（支持批量），返回文件路径、base64 或音频字节流
+GET  /multimodal-media/tts/models   查看本地模型与当前加载状态
+GET  /multimodal-media/tts/file     下载输出目录中的音频文件
+GET  /multimodal-media/tts/profile  查看分阶段耗时统计（直方图）
+"""
+
+import os
+import io
+import time
+import uuid
+import base64
+import secrets
+import tempfile
+import threading
+import zipfile
+from typing import List, Optional
+from urllib.parse import quote
+
+
+# 接口路径前缀
+API_PREFIX = "/multimodal-media/tts"
+
+# 响应方式
+RESPONSE_FILE = "file"       # 返回服务器上的文件路径
+RESPONSE_BASE64 = "base64"   # 在 JSON 中返回 base64 编码的音频
+RESPONSE_STREAM = "stream"   # 直接返回音频字节流（多条时为 zip）
+
+# 接口输出子目录（位于 TTS 输出目录下，每个请求一个独立目录）
+API_OUTPUT_SUBDIR = "api"
+
+# 接口请求串行执行，避免多个自动化任务同时占用模型
+_generate_lock = threading.Lock()
+
+
+def _inside(root, path):
+    """
+    path 解析符号链接后是否位于 root 目录内
+    """
+    root = os.path.realpath(root)
+    try:
+        return os.path.commonpath([root, os.path.realpath(path)]) == root
+    except ValueError:
+        return False
+
+
+def _decode_ref_audio(ref_audio, temp_files, allowed_roots):
+    """
+    参考音频可以是 allowed_roots（输出目录、临时目录）中的文件路径或 base64（可带 data: 前缀），
+    base64 解码到临时文件；不允许读取服务器上其他位置的文件
+    """
+    if not ref_audio:
+        return None
+    if os.path.isfile(ref_audio):
+        if not any(_inside(root, ref_audio) for root in allowed_roots):
+            raise ValueError("ref_audio 路径只能位于 TTS 输出目录或临时目录中，其他音频请以 base64 上传")
+        return os.path.realpath(ref_audio)
+    payload = ref_audio.split(",", 1)[1] if ref_audio.startswith("data:") else ref_audio
+    try:
+        data = base64.b64decode(payload, validate=True)
+    except ValueError:
+        raise ValueError("ref_audio 既不是存在的文件路径，也不是有效的 base64 音频")
+    fd, path = tempfile.mkstemp(suffix=".wav", prefix="qwen3_tts_api_ref_")
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    temp_files.append(path)
+    return path
+
+
+def _media_type(path):
+    ext = os.path.splitext(path)[1].lower()
+    return {".flac": "audio/flac", ".opus": "audio/ogg", ".mp3": "audio/mpeg"}.get(ext, "audio/wav")
+
+
+def _iter_file(path, chunk_size=64 * 1024):
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def register_tts_api(app):
+    """
+    在 FastAPI 应用上注册 TTS 接口
+    """
+    from fastapi import Depends, HTTPException
+    from fastapi.responses import StreamingResponse
+    from fastapi.security import HTTPBasic, HTTPBasicCredentials
+    from pydantic import BaseModel, Field
+    from modules import shared
+
+    import scripts.qwen3_tts_ui as tts
+    from scripts.qwen3_tts.encoding import OUTPUT_FORMATS, encode_file
+    from scripts.qwen3_tts.profiling import snapshot
+
+    class TTSItem(BaseModel):
+        text: str
+        language: str = "Auto"
+        speaker: Optional[str] = Field(None, description="CustomVoice 说话人")
+        instruct: Optional[str] = Field(None, description="CustomVoice 语气指令 / VoiceDesign 音色描述")
+
+    class TTSRequest(BaseModel):
+        model: str = Field("CustomVoice", description="Base / CustomVoice / VoiceDesign")
+        items: List[TTSItem]
+        ref_audio: Optional[str] = Field(None, description="Base：参考音频路径或 base64")
+        ref_text: Optional[str] = Field("", description="Base：参考音频文本，留空时自动识别")
+        voice: Optional[str] = Field(None, description="Base：音色库中的音色名，优先于参考音频")
+        seed: int = -1
+        use_cache: bool = True
+        output_format: str = "WAV"
+        bitrate: int = 96
+        response: str = Field(RESPONSE_FILE, description="file / base64 / stream")
+
+    # 与 WebUI 内置接口一致：启用 --api-auth 时要求 HTTP Basic 认证
+    credentials = {}
+    api_auth = getattr(shared.cmd_opts, "api_auth", None)
+    if api_auth:
+        for entry in api_auth.strip('"').replace("\n", "").split(","):
+            if ":" in entry:
+                user, password = entry.strip().split(":", 1)
+                credentials[user] = password
+
+    def auth(creds: HTTPBasicCredentials = Depends(HTTPBasic(auto_error=bool(credentials)))):
+        if not credentials:
+            return True
+        password = credentials.get(creds.username) if creds else None
+        if password is not None and secrets.compare_digest(password.encode("utf-8"), creds.password.encode("utf-8")):
+            return True
+        raise HTTPException(status_code=401, detail="认证失败", headers={"WWW-Authenticate": "Basic"})
+
+    def run_generation(req, temp_files):
+        texts = [item.text for item in req.items]
+        languages = [item.language for item in req.items]
+        # 每个请求写入独立目录，返回的路径不会被界面生成或其他请求覆盖
+        output_dir = os.path.join(tts.default_qwen_tts_output, API_OUTPUT_SUBDIR,
+                                  f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}")
+        common = dict(output_dir=output_dir, use_batch_mode=True,
+                      seed=req.seed, use_cache=req.use_cache, return_all_files=True)
+
+        if req.model == "Base":
+            try:
+                ref_audio = _decode_ref_audio(req.ref_audio, temp_files,
+                                              (tts.default_qwen_tts_output, tempfile.gettempdir()))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            if not ref_audio and not req.voice:
+                raise HTTPException(status_code=400, detail="Base 模型需要 ref_audio 或 voice")
+            ref_text = req.ref_text or ""
+            return tts.generate_speech_base(
+                texts, languages, ref_audio, ref_text,
+                auto_transcribe=not ref_text.strip(), voice_name=req.voice, **common
+            )
+        if req.model == "CustomVoice":
+            speakers = [item.speaker or "Vivian" for item in req.items]
+            instructs = [item.instruct or "" for item in req.items]
+            return tts.generate_speech_customvoice(texts, languages, speakers, instructs, **common)
+        if req.model == "VoiceDesign":
+            instructs = [item.instruct or "" for item in req.items]
+            if not all(instruct.strip() for instruct in instructs):
+                raise HTTPException(status_code=400, detail="VoiceDesign 模型每条都需要 instruct 音色描述")
+            return tts.generate_speech_voicedesign(texts, languages, instructs, **common)
+        raise HTTPException(status_code=400, detail=f"不支持的模型类型：{req.model}")
+
+    @app.post(API_PREFIX, dependencies=[Depends(auth)])
+    def synthesize(req: TTSRequest):
+        if not req.items:
+            raise HTTPException(status_code=400, detail="items 不能为空")
+        if req.output_format not in OUTPUT_FORMATS:
+            raise HTTPException(status_code=400, detail=f"不支持的输出格式：{req.output_format}")
+
+        temp_files = []
+        try:
+            with _generate_lock:
+                output_files, message = run_generation(req, temp_files)
+        finally:
+            for path in temp_files:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        if not output_files:
+            raise HTTPException(status_code=500, detail=message)
+
+        # 接口调用方需要最终文件，压缩格式在此同步编码
+        if req.output_format != "WAV":
+            encoded = []
+            for path in output_files:
+                target = os.path.splitext(path)[0] + OUTPUT_FORMATS[req.output_format]["ext"]
+                encode_file(path, target, req.output_format, req.bitrate)
+                os.remove(path)
+                encoded.append(target)
+            output_files = encoded
+
+        if req.response == RESPONSE_STREAM:
+            if len(output_files) == 1:
+                return StreamingResponse(_iter_file(output_files[0]), media_type=_media_type(output_files[0]),
+                                         headers={"X-TTS-Message": quote(message)})
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+                for path in output_files:
+                    archive.write(path, os.path.basename(path))
+            buffer.seek(0)
+            return StreamingResponse(buffer, media_type="application/zip",
+                                     headers={"Content-Disposition": "attachment; filename=qwen3_tts.zip"})
+
+        result = {"message": message, "files": output_files}
+        if req.response == RESPONSE_BASE64:
+            result["audio"] = []
+            for path in output_files:
+                with open(path, 'rb') as f:
+                    result["audio"].append(base64.b64encode(f.read()).decode("ascii"))
+        return result
+
+    @app.get(f"{API_PREFIX}/models", dependencies=[Depends(auth)])
+    def list_models():
+        loaded = tts.qwen_tts_model
+        return {
+            "tts": tts.model_registry.tts_models(),
+            "whisper": tts.model_registry.whisper_models(),
+            "voices": tts.voice_library.names(),
+            "loaded": {key: loaded.get(key) for key in ("name", "version", "path")} if loaded else None,
+        }
+
+    @app.get(f"{API_PREFIX}/profile", dependencies=[Depends(auth)])
+    def profile_stats():
+        return snapshot()
+
+    @app.get(f"{API_PREFIX}/file", dependencies=[Depends(auth)])
+    def download_file(path: str):
+        # 只允许下载 TTS 输出目录中的文件
+        real_path = os.path.realpath(path)
+        if not _inside(tts.default_qwen_tts_output, real_path) or not os.path.isfile(real_path):
+            raise HTTPException(status_code=404, detail="文件不存在或不在输出目录中")
+        return StreamingResponse(_iter_file(real_path), media_type=_media_type(real_path),
+                                 headers={"Content-Disposition": f"attachment; filename={os.path.basename(real_path)}"})
+
+    print(f"✓ 已注册 Qwen3-TTS 接口：{API_PREFIX}")
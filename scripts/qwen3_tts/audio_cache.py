@@ -0,0 +1,211 @@
+"""
+合成语音结果缓存模块
+以请求参数的哈希为键保存生成的 WAV 文件和元数据，超过容量上限时按最近最少使用淘汰
+"""
+
+import os
+import json
+import shutil
+import sqlite3
+import hashlib
+import threading
+import time
+import uuid
+
+
+def make_cache_key(**fields):
+    """
+    根据请求参数计算缓存键，参数顺序不影响结果
+    """
+    payload = json.dumps(fields, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# Linux FICLONE ioctl（btrfs/xfs 等文件系统的写时复制克隆）
+_FICLONE = 0x40049409
+
+
+def _reflink(src, dst):
+    """
+    尝试写时复制克隆文件，不支持时抛出 OSError
+    先克隆到同目录下的临时文件再替换目标，不会以写方式打开已存在的 dst（它可能是其他文件的硬链接）
+    """
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError("当前平台不支持 reflink")
+    tmp = f"{dst}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(src, 'rb') as fsrc, open(tmp, 'xb') as ftmp:
+            fcntl.ioctl(ftmp.fileno(), _FICLONE, fsrc.fileno())
+        shutil.copystat(src, tmp)
+        os.replace(tmp, dst)
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _remove_existing(dst):
+    # 先删除已存在的目标：目标可能是其他文件的硬链接，直接写入会改动共享的数据
+    try:
+        os.remove(dst)
+    except FileNotFoundError:
+        pass
+
+
+def reflink_or_copy(src, dst):
+    """
+    生成与源文件互不影响的副本：优先 reflink（写时复制，不占额外空间），不支持时复制文件
+    """
+    _remove_existing(dst)
+    try:
+        _reflink(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+    return dst
+
+
+def link_or_copy(src, dst):
+    """
+    优先使用硬链接（同一磁盘上瞬间完成且不占额外空间），其次尝试 reflink，都失败时复制文件
+    硬链接与源文件共享数据，只用于之后不会被改写的文件
+    """
+    _remove_existing(dst)
+    try:
+        os.link(src, dst)
+        return dst
+    except OSError:
+        pass
+    return reflink_or_copy(src, dst)
+
+
+class AudioResultCache:
+    """
+    基于文件目录 + SQLite 索引的合成结果缓存
+    缓存文件与输出目录中的文件互为独立副本（reflink 或复制），改写或删除输出文件不会影响缓存
+    """
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.db_path = os.path.join(cache_dir, "index.sqlite")
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, "
+                "files TEXT NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "metadata TEXT NOT NULL, "
+                "created_at REAL NOT NULL, "
+                "last_used REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _remove_files(self, files):
+        for name in files:
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+
+    def get(self, key):
+        """
+        查询缓存，命中时返回缓存文件路径列表，未命中或文件缺失时返回 None
+        """
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute("SELECT files FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                paths = [os.path.join(self.cache_dir, name) for name in json.loads(row[0])]
+                if not all(os.path.isfile(path) for path in paths):
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    conn.commit()
+                    self._remove_files(json.loads(row[0]))
+                    return None
+                conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+                conn.commit()
+            return paths
+        except (sqlite3.Error, ValueError) as e:
+            print(f"⚠️ 读取语音缓存失败：{e}")
+            return None
+
+    def put(self, key, audio_files, metadata=None):
+        """
+        将生成的音频文件存入缓存并按容量上限淘汰旧条目
+        """
+        try:
+            with self._lock:
+                conn = self._connect()
+                names = []
+                total_size = 0
+                for i, path in enumerate(audio_files):
+                    name = f"{key}_{i}{os.path.splitext(path)[1] or '.wav'}"
+                    dst = os.path.join(self.cache_dir, name)
+                    reflink_or_copy(path, dst)
+                    names.append(name)
+                    total_size += os.path.getsize(dst)
+
+                now = time.time()
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, files, size, metadata, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, json.dumps(names), total_size, json.dumps(metadata or {}, ensure_ascii=False), now, now)
+                )
+                conn.commit()
+                self._evict(conn)
+            return True
+        except (sqlite3.Error, OSError) as e:
+            print(f"⚠️ 写入语音缓存失败：{e}")
+            return False
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute("SELECT key, files, size FROM entries ORDER BY last_used ASC").fetchall()
+        for key, files, size in rows:
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._remove_files(json.loads(files))
+            total -= size
+        conn.commit()
+
+    def stats(self):
+        """
+        返回（条目数，总字节数）
+        """
+        try:
+            with self._lock:
+                row = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            return row[0], row[1]
+        except sqlite3.Error:
+            return 0, 0
+
+    def clear(self):
+        """
+        清空全部缓存
+        """
+        try:
+            with self._lock:
+                conn = self._connect()
+                for (files,) in conn.execute("SELECT files FROM entries").fetchall():
+                    self._remove_files(json.loads(files))
+                conn.execute("DELETE FROM entries")
+                conn.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"⚠️ 清空语音缓存失败：{e}")
+            return False
@@ -0,0 +1,535 @@
+"""
+Qwen3-TTS 编排层基准测试
+用可配置延迟和内存占用的确定性桩模型替换 Qwen3TTSModel，驱动 generate_speech_* 以及批量、缓存、
+字幕配音、后台编码和 REST 接口流式返回等环节，统计延迟分位数、吞吐量、实时率和峰值常驻内存；
+无需 GPU 和模型权重，用于发现编排开销的性能回退
+
+在扩展根目录运行（需要 numpy、soundfile、torch CPU 版；api_stream 场景另需 fastapi 与 httpx，未安装时跳过）：
+    python -m scripts.qwen3_tts.benchmark --requests 20 --latency-ms 50 --json report.json
+"""
+
+import os
+import sys
+import json
+import time
+import types
+import shutil
+import zlib
+import argparse
+import tempfile
+import threading
+from urllib.parse import unquote
+
+
+# 内置语料：长短、语言混合的句子
+DEFAULT_CORPUS = [
+    "今天天气很好，我们一起去公园散步吧。",
+    "欢迎收听本期节目，今天我们来聊一聊人工智能在日常生活中的应用。",
+    "请在下一个路口右转，然后沿着河边一直走大约五百米，就能看到博物馆的正门。",
+    "据气象台预报，明天白天到夜间多云转小雨，气温十五到二十二摄氏度，请大家出门注意携带雨具。",
+    "The quick brown fox jumps over the lazy dog.",
+    "Thank you for calling. Your call is important to us, please stay on the line.",
+    "In the next chapter, we will explore how small habits compound into remarkable results over time.",
+    "好的。",
+    "这个问题我需要再想一想，明天给你答复。",
+    "各位旅客请注意，开往上海虹桥的高铁即将进站，请在黄色安全线以外排队候车。",
+]
+
+SCENARIOS = [
+    "customvoice_single",
+    "customvoice_batch",
+    "voicedesign_single",
+    "base_clone",
+    "cache_hit",
+    "postprocess",
+    "script",
+    "script_cached",
+    "encode",
+    "api_stream",
+]
+
+
+# ---------------------------------------------------------------------------
+# 桩模型
+# ---------------------------------------------------------------------------
+
+class StubQwen3TTSModel:
+    """
+    确定性的 Qwen3TTSModel 替身：按文本长度睡眠模拟推理耗时，生成期间占用指定内存，
+    输出与文本一一对应的类语音波形（首尾带静音，便于后处理环节有实际工作量）
+    """
+
+    options = {
+        "load_seconds": 0.0,
+        "latency_ms": 50.0,        # 每次调用的固定耗时
+        "per_char_ms": 2.0,        # 每个字符的耗时
+        "batch_overhead": 0.15,    # 批量时每多一条增加的耗时比例（批内并行解码）
+        "memory_mb": 0,            # 生成期间额外占用的内存
+        "chars_per_second": 5.0,   # 语速，决定输出音频时长
+        "sample_rate": 24000,
+    }
+
+    def __init__(self, model_path):
+        self.model_path = model_path
+        self.busy_seconds = 0.0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_pretrained(cls, model_path, **kwargs):
+        time.sleep(cls.options["load_seconds"])
+        return cls(model_path)
+
+    def _waveform(self, text):
+        import numpy as np
+
+        sr = self.options["sample_rate"]
+        seconds = max(0.5, len(text) / self.options["chars_per_second"])
+        t = np.arange(int(seconds * sr), dtype=np.float32) / sr
+        rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+        pitch = 120 + 100 * rng.random()
+        # 基频 + 谐波，4Hz 左右的音节包络
+        voice = np.sin(2 * np.pi * pitch * t) + 0.4 * np.sin(2 * np.pi * 2 * pitch * t)
+        envelope = np.abs(np.sin(2 * np.pi * (3.5 + rng.random()) * t)) ** 0.5
+        wav = (0.2 * voice * envelope + 0.005 * rng.standard_normal(len(t))).astype(np.float32)
+        silence = np.zeros(int(0.2 * sr), dtype=np.float32)
+        return np.concatenate([silence, wav, silence])
+
+    def _synthesize(self, text):
+        import numpy as np
+
+        texts = text if isinstance(text, list) else [text]
+        opts = self.options
+        longest = max(len(t) for t in texts)
+        latency = (opts["latency_ms"] + opts["per_char_ms"] * longest) / 1000
+        latency *= 1 + opts["batch_overhead"] * (len(texts) - 1)
+
+        start_time = time.perf_counter()
+        ballast = np.ones(int(opts["memory_mb"] * 1024 ** 2 // 8)) if opts["memory_mb"] else None
+        time.sleep(latency)
+        wavs = [self._waveform(t) for t in texts]
+        del ballast
+        with self._lock:
+            self.busy_seconds += time.perf_counter() - start_time
+            self.calls += 1
+        return wavs, opts["sample_rate"]
+
+    def generate_custom_voice(self, text, language=None, speaker=None, instruct=None, **kwargs):
+        return self._synthesize(text)
+
+    def generate_voice_design(self, text, language=None, instruct=None, **kwargs):
+        return self._synthesize(text)
+
+    def generate_voice_clone(self, text, language=None, ref_audio=None, ref_text=None, voice_clone_prompt=None, **kwargs):
+        return self._synthesize(text)
+
+    def create_voice_clone_prompt(self, ref_audio=None, ref_text=None, **kwargs):
+        import torch
+        return [{"ref_spk_embedding": torch.zeros(1024), "ref_text": ref_text, "x_vector_only_mode": False}]
+
+
+# ---------------------------------------------------------------------------
+# 运行环境
+# ---------------------------------------------------------------------------
+
+def _install_stub_modules(work_dir):
+    """
+    在 WebUI 之外运行时提供 modules.shared / modules.paths_internal，
+    并用桩模型替换 qwen_tts；gradio 未安装时只提供 Progress 占位（基准测试不创建界面）
+    """
+    models_path = os.path.join(work_dir, "models")
+    for model_type in ("Base", "CustomVoice", "VoiceDesign"):
+        model_path = os.path.join(models_path, "qwen3-tts", f"Qwen3-TTS-12Hz-1.7B-{model_type}")
+        os.makedirs(model_path, exist_ok=True)
+        with open(os.path.join(model_path, "config.json"), 'w', encoding='utf-8') as f:
+            json.dump({"tts_model_type": model_type.lower(), "tts_model_size": "1b7"}, f)
+
+    if "modules" not in sys.modules:
+        modules_pkg = types.ModuleType("modules")
+        modules_pkg.__path__ = []
+        shared = types.ModuleType("modules.shared")
+        shared.models_path = models_path
+        shared.data_path = work_dir
+        shared.cmd_opts = types.SimpleNamespace(api_auth=None)
+        paths_internal = types.ModuleType("modules.paths_internal")
+        paths_internal.default_output_dir = os.path.join(work_dir, "outputs")
+        modules_pkg.shared = shared
+        modules_pkg.paths_internal = paths_internal
+        sys.modules.update({"modules": modules_pkg, "modules.shared": shared,
+                            "modules.paths_internal": paths_internal})
+
+    qwen_tts = types.ModuleType("qwen_tts")
+    qwen_tts.Qwen3TTSModel = StubQwen3TTSModel
+    sys.modules["qwen_tts"] = qwen_tts
+
+    try:
+        import gradio  # noqa: F401
+    except ImportError:
+        gradio = types.ModuleType("gradio")
+        gradio.Progress = lambda *args, **kwargs: (lambda *a, **k: None)
+        sys.modules["gradio"] = gradio
+
+
+def _setup_tts_module(work_dir):
+    """
+    导入 qwen3_tts_ui，并将其设置、缓存和输出目录全部指向临时目录，不影响真实安装
+    """
+    import scripts.qwen3_tts_ui as tts
+    import scripts.qwen3_tts.loading as loading
+    from scripts.qwen3_tts.audio_cache import AudioResultCache
+    from scripts.qwen3_tts.transcription_cache import TranscriptionCache
+    from scripts.qwen3_tts.reference_audio import ReferenceAudioCache
+    from scripts.qwen3_tts.voice_library import VoiceLibrary
+    from scripts.qwen3_tts.preset_store import PresetStore
+    from scripts.qwen3_tts.model_registry import ModelRegistry
+    from scripts.qwen3_tts.encoding import BackgroundEncoder
+
+    config_root = os.path.join(work_dir, "config")
+    loading.LOAD_LOG_FILE = os.path.join(config_root, "qwen3_tts_load_times.jsonl")
+    tts.settings_file = os.path.join(config_root, "qwen3_tts_settings.json")
+    tts.default_qwen_tts_output = os.path.join(work_dir, "outputs", "qwen3-tts")
+    tts.model_registry = ModelRegistry(os.path.join(work_dir, "models"), os.path.join(work_dir, "models", "qwen3-tts"))
+    tts.audio_cache = AudioResultCache(os.path.join(config_root, "audio_cache"))
+    tts.transcription_cache = TranscriptionCache(os.path.join(config_root, "transcriptions.sqlite"))
+    tts.reference_cache = ReferenceAudioCache(os.path.join(config_root, "reference_cache"))
+    tts.voice_library = VoiceLibrary(os.path.join(config_root, "voices"))
+    tts.preset_store = PresetStore(os.path.join(config_root, "presets.sqlite"))
+    tts.output_encoder = BackgroundEncoder(max_workers=2, preview_dir=os.path.join(work_dir, "preview"))
+    tts.save_tts_settings(worker_mode=False, cpu_options={})
+    return tts
+
+
+# ---------------------------------------------------------------------------
+# 统计
+# ---------------------------------------------------------------------------
+
+def _current_rss():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return 0
+
+
+class RSSSampler:
+    """
+    后台线程定时采样常驻内存，记录区间内的峰值
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak = _current_rss()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _current_rss())
+            self._stop.wait(self.interval)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _current_rss())
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _audio_seconds(paths):
+    import soundfile as sf
+    return sum(sf.info(path).duration for path in paths)
+
+
+def check_outputs(tts, files):
+    """
+    校验输出与缓存文件完好：每个输出都是可读取的非空音频，缓存目录中没有被清空的条目
+    返回问题说明，完好时返回 None
+    """
+    import soundfile as sf
+
+    for path in files:
+        try:
+            if sf.info(path).frames <= 0:
+                return f"输出音频为空：{path}"
+        except Exception as e:
+            return f"输出音频无法读取：{path}（{e}）"
+    cache_dir = tts.audio_cache.cache_dir
+    if os.path.isdir(cache_dir):
+        for name in os.listdir(cache_dir):
+            if name.endswith(".wav") and os.path.getsize(os.path.join(cache_dir, name)) == 0:
+                return f"缓存文件被清空：{name}"
+    return None
+
+
+def summarize(name, latencies, audio_seconds, wall_seconds, model_seconds, peak_rss, errors):
+    count = len(latencies)
+    return {
+        "scenario": name,
+        "requests": count,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p90_ms": percentile(latencies, 90) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": (sum(latencies) / count * 1000) if count else 0.0,
+        "throughput_rps": count / wall_seconds if wall_seconds else 0.0,
+        "audio_seconds": audio_seconds,
+        "rtf": wall_seconds / audio_seconds if audio_seconds else float("inf"),
+        # 编排开销：总耗时中不属于桩模型推理的部分
+        "overhead_ms": ((wall_seconds - model_seconds) / count * 1000) if count else 0.0,
+        "peak_rss_mb": peak_rss / 1024 ** 2,
+    }
+
+
+# ---------------------------------------------------------------------------
+# 场景
+# ---------------------------------------------------------------------------
+
+def _make_reference_wav(work_dir):
+    import numpy as np
+    import soundfile as sf
+
+    # 双声道 44.1kHz 的 12 秒参考音频，覆盖重采样、混合声道和截取窗口
+    wav = StubQwen3TTSModel("reference")._waveform("参考音频" * 15)
+    resampled = np.interp(np.arange(int(len(wav) * 44100 / 24000)) * 24000 / 44100, np.arange(len(wav)), wav)
+    path = os.path.join(work_dir, "reference.wav")
+    sf.write(path, np.stack([resampled, resampled * 0.8], axis=1), 44100)
+    return path
+
+
+def build_scenarios(tts, corpus, work_dir, batch_size):
+    output_dir = tts.default_qwen_tts_output
+    ref_audio = _make_reference_wav(work_dir)
+    batches = [corpus[i:i + batch_size] for i in range(0, len(corpus), batch_size)]
+
+    def text(i):
+        return corpus[i % len(corpus)]
+
+    def customvoice_single(i):
+        return tts.generate_speech_customvoice(text(i), "Chinese", "Vivian", "", output_dir,
+                                               use_cache=False, return_all_files=True)
+
+    def customvoice_batch(i):
+        batch = batches[i % len(batches)]
+        return tts.generate_speech_customvoice(batch, ["Chinese"] * len(batch), ["Vivian"] * len(batch),
+                                               [""] * len(batch), output_dir, use_batch_mode=True,
+                                               use_cache=False, return_all_files=True)
+
+    def voicedesign_single(i):
+        return tts.generate_speech_voicedesign(text(i), "Chinese", "语气平和的成年女声", output_dir,
+                                               use_cache=False, return_all_files=True)
+
+    def base_clone(i):
+        return tts.generate_speech_base(text(i), "Chinese", ref_audio, "参考音频的文本内容", output_dir,
+                                        use_cache=False, return_all_files=True)
+
+    def verified(files, message):
+        # 缓存场景在同一秒内多次复用相同条目，校验输出与缓存没有互相覆盖
+        if files:
+            problem = check_outputs(tts, files)
+            if problem:
+                return None, problem
+        return files, message
+
+    def cache_hit(i):
+        # 固定种子，首轮之后全部命中缓存
+        return verified(*tts.generate_speech_customvoice(text(i % 3), "Chinese", "Vivian", "", output_dir,
+                                                         seed=1234, use_cache=True, return_all_files=True))
+
+    def postprocess(i):
+        options = {"normalize": True, "target_lufs": -16.0, "trim_silence": True, "silence_db": -45.0}
+        return tts.generate_speech_customvoice(text(i), "Chinese", "Vivian", "", output_dir,
+                                               use_cache=False, postprocess=options, return_all_files=True)
+
+    def run_script(i, use_cache):
+        lines = []
+        for n in range(batch_size * 2):
+            start = n * 4
+            lines.append(f"{n + 1}\n00:00:{start:02d},000 --> 00:00:{start + 3:02d},500\n{text(i + n)}\n")
+        track, message = tts.generate_speech_from_script(
+            "\n".join(lines), None, "CustomVoice", "Chinese", None, "", False, "Vivian", "", "",
+            output_dir, batch_size=batch_size, seed=1234 if use_cache else -1, use_cache=use_cache,
+            progress=lambda *a, **k: None
+        )
+        return ([track] if track else None), message
+
+    def script(i):
+        return run_script(i, use_cache=False)
+
+    def script_cached(i):
+        # 固定种子与文本，首轮之后每批都命中缓存
+        return verified(*run_script(0, use_cache=True))
+
+    def encode(i):
+        files, message = customvoice_single(i)
+        if not files:
+            return files, message
+        # 预览立即返回；等待后台编码完成，统计整个编码链路
+        measure = list(files)
+        tts.encode_outputs(files, "FLAC")
+        tts.output_encoder.wait()
+        encoded = [os.path.splitext(path)[0] + ".flac" for path in measure]
+        return [path for path in encoded if os.path.exists(path)] or None, message
+
+    api_client = {}
+
+    def api_stream(i):
+        # 经 FastAPI 接口以 response=stream 请求，逐块读取字节流，覆盖接口层的请求解析、串行锁和流式输出
+        from scripts.qwen3_tts.api import API_PREFIX, register_tts_api
+
+        if "client" not in api_client:
+            from fastapi import FastAPI
+            from fastapi.testclient import TestClient
+            app = FastAPI()
+            register_tts_api(app)
+            api_client["client"] = TestClient(app)
+        payload = {"model": "CustomVoice", "items": [{"text": text(i), "language": "Chinese", "speaker": "Vivian"}],
+                   "use_cache": False, "output_format": "WAV", "response": "stream"}
+        stream_dir = os.path.join(work_dir, "api_stream")
+        os.makedirs(stream_dir, exist_ok=True)
+        path = os.path.join(stream_dir, f"{i}.wav")
+        with api_client["client"].stream("POST", API_PREFIX, json=payload) as response:
+            if response.status_code != 200:
+                response.read()
+                return None, f"接口返回 {response.status_code}：{response.text}"
+            with open(path, 'wb') as f:
+                for chunk in response.iter_bytes():
+                    f.write(chunk)
+            message = unquote(response.headers.get("X-TTS-Message", ""))
+        return verified([path], message)
+
+    return {name: fn for name, fn in locals().items() if name in SCENARIOS}
+
+
+def _api_available():
+    try:
+        import fastapi.testclient  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def run_scenario(tts, name, fn, requests, warmup):
+    for i in range(warmup):
+        fn(i)
+
+    model = tts.qwen_tts_model["model"] if tts.qwen_tts_model else None
+    busy_before = getattr(model, "busy_seconds", 0.0)
+
+    latencies = []
+    audio_seconds = 0.0
+    errors = 0
+    with RSSSampler() as sampler:
+        wall_start = time.perf_counter()
+        for i in range(requests):
+            start_time = time.perf_counter()
+            files, message = fn(i)
+            latencies.append(time.perf_counter() - start_time)
+            if not files:
+                errors += 1
+                print(f"  ⚠️ {name} 第 {i + 1} 次请求失败：{message}")
+                continue
+            audio_seconds += _audio_seconds(files)
+        wall_seconds = time.perf_counter() - wall_start
+
+    model = tts.qwen_tts_model["model"] if tts.qwen_tts_model else model
+    model_seconds = getattr(model, "busy_seconds", 0.0) - busy_before
+    return summarize(name, latencies, audio_seconds, wall_seconds, max(0.0, model_seconds), sampler.peak, errors)
+
+
+def format_report(results):
+    header = (f"{'场景':<20}{'请求':>6}{'失败':>6}{'p50ms':>10}{'p90ms':>10}{'p99ms':>10}"
+              f"{'吞吐/s':>9}{'RTF':>8}{'开销ms':>9}{'峰值RSS MB':>12}")
+    lines = [header, "-" * len(header)]
+    for r in results:
+        lines.append(
+            f"{r['scenario']:<20}{r['requests']:>6}{r['errors']:>6}{r['p50_ms']:>10.1f}{r['p90_ms']:>10.1f}"
+            f"{r['p99_ms']:>10.1f}{r['throughput_rps']:>9.2f}{r['rtf']:>8.3f}{r['overhead_ms']:>9.1f}"
+            f"{r['peak_rss_mb']:>12.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Qwen3-TTS 编排层基准测试（桩模型）")
+    parser.add_argument("--scenarios", default="all", help=f"逗号分隔，可选：{','.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=20, help="每个场景的请求数")
+    parser.add_argument("--warmup", type=int, default=2, help="每个场景的预热请求数")
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=StubQwen3TTSModel.options["latency_ms"])
+    parser.add_argument("--per-char-ms", type=float, default=StubQwen3TTSModel.options["per_char_ms"])
+    parser.add_argument("--memory-mb", type=float, default=StubQwen3TTSModel.options["memory_mb"])
+    parser.add_argument("--load-seconds", type=float, default=StubQwen3TTSModel.options["load_seconds"])
+    parser.add_argument("--corpus", help="语料文件，每行一句")
+    parser.add_argument("--json", help="将结果写入 JSON 文件")
+    parser.add_argument("--keep", action="store_true", help="保留临时工作目录")
+    args = parser.parse_args(argv)
+
+    StubQwen3TTSModel.options.update({
+        "latency_ms": args.latency_ms,
+        "per_char_ms": args.per_char_ms,
+        "memory_mb": args.memory_mb,
+        "load_seconds": args.load_seconds,
+    })
+
+    corpus = DEFAULT_CORPUS
+    if args.corpus:
+        with open(args.corpus, 'r', encoding='utf-8') as f:
+            corpus = [line.strip() for line in f if line.strip()]
+
+    selected = SCENARIOS if args.scenarios == "all" else [s.strip() for s in args.scenarios.split(",")]
+    unknown = [s for s in selected if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知场景：{', '.join(unknown)}")
+    if "api_stream" in selected and not _api_available():
+        if args.scenarios != "all":
+            parser.error("api_stream 场景需要 fastapi 与 httpx")
+        print("未安装 fastapi 或 httpx，跳过 api_stream 场景")
+        selected = [s for s in selected if s != "api_stream"]
+
+    work_dir = tempfile.mkdtemp(prefix="qwen3_tts_bench_")
+    try:
+        _install_stub_modules(work_dir)
+        tts = _setup_tts_module(work_dir)
+        scenarios = build_scenarios(tts, corpus, work_dir, args.batch_size)
+
+        results = []
+        for name in selected:
+            print(f"\n>>> 场景：{name}")
+            results.append(run_scenario(tts, name, scenarios[name], args.requests, args.warmup))
+
+        print("\n" + format_report(results))
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump({"options": StubQwen3TTSModel.options, "corpus_size": len(corpus),
+                           "results": results}, f, ensure_ascii=False, indent=2)
+            print(f"\n结果已写入：{args.json}")
+        return results
+    finally:
+        if args.keep:
+            print(f"工作目录：{work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
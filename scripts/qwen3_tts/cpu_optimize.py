@@ -0,0 +1,150 @@
+"""
+Qwen3-TTS CPU 推理优化模块
+包括线程数调优、线性层动态 int8 量化、可选 torch.compile（持久化编译缓存以复用预热后的计算图）和实时率测量
+本模块不依赖 WebUI 的 modules 包，可在工作进程中直接导入
+"""
+
+import os
+import time
+
+
+# 默认 CPU 优化选项
+DEFAULT_CPU_OPTIONS = {
+    "quantize_int8": False,
+    "torch_compile": False,
+    "num_threads": 0,  # 0 表示按物理核心数自动设置
+}
+
+# 首次调整线程数前 torch 的默认算子内线程数（set_num_threads 对整个进程生效，测量基线时需要恢复）
+_default_num_threads = None
+
+# 测量实时率使用的固定文本
+BENCHMARK_TEXT = "今天天气很好，我们一起去公园散步，顺便聊聊最近读过的几本书。"
+
+
+def physical_cpu_count():
+    try:
+        import psutil
+        count = psutil.cpu_count(logical=False)
+        if count:
+            return count
+    except ImportError:
+        pass
+    return os.cpu_count() or 1
+
+
+def describe_cpu_options(options):
+    """
+    生成 CPU 优化选项的简短说明
+    """
+    if not options:
+        return "float32，默认线程"
+    parts = ["int8 动态量化" if options.get("quantize_int8") else "float32"]
+    if options.get("torch_compile"):
+        parts.append("torch.compile")
+    threads = options.get("num_threads") or physical_cpu_count()
+    parts.append(f"{threads} 线程")
+    return "，".join(parts)
+
+
+def configure_cpu_threads(num_threads=0):
+    """
+    按机器配置设置算子内/算子间线程数
+    算子间线程数只能在首次并行计算前设置，之后设置会失败，此时保留原值
+    """
+    import torch
+
+    global _default_num_threads
+    if _default_num_threads is None:
+        _default_num_threads = torch.get_num_threads()
+    intra = num_threads or physical_cpu_count()
+    torch.set_num_threads(intra)
+    interop = max(1, min(4, intra // 4))
+    try:
+        torch.set_num_interop_threads(interop)
+    except RuntimeError:
+        interop = torch.get_num_interop_threads()
+    print(f"CPU 线程配置：算子内 {intra}，算子间 {interop}")
+    return intra, interop
+
+
+def restore_default_threads():
+    """
+    恢复首次调整前的算子内线程数（未调整过时不做处理），返回当前线程数
+    算子间线程数一经设置无法再修改，不做恢复
+    """
+    import torch
+
+    if _default_num_threads is not None:
+        torch.set_num_threads(_default_num_threads)
+    return torch.get_num_threads()
+
+
+def enable_compile_cache(cache_dir):
+    """
+    启用 Inductor 的持久化 FX 图缓存，重启后可复用已编译的计算图
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", cache_dir)
+    os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+    try:
+        import torch._inductor.config as inductor_config
+        inductor_config.fx_graph_cache = True
+    except (ImportError, AttributeError):
+        pass
+
+
+def optimize_for_cpu(model, options, compile_cache_dir=None):
+    """
+    对加载到 CPU 的 Qwen3TTSModel 应用优化，返回同一个模型对象
+    """
+    import torch
+
+    options = dict(DEFAULT_CPU_OPTIONS, **(options or {}))
+    configure_cpu_threads(options["num_threads"])
+
+    inner = getattr(model, "model", model)
+    if not isinstance(inner, torch.nn.Module):
+        print("⚠️ 未找到可优化的 torch 模块，跳过 CPU 优化")
+        return model
+
+    if options["quantize_int8"]:
+        start_time = time.time()
+        torch.ao.quantization.quantize_dynamic(inner, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        print(f"✓ 已对线性层进行 int8 动态量化，耗时 {time.time() - start_time:.1f} 秒")
+
+    if options["torch_compile"]:
+        if compile_cache_dir:
+            enable_compile_cache(compile_cache_dir)
+        try:
+            # 只编译 forward，保留模块本身以免影响 generate 等方法的属性访问
+            inner.forward = torch.compile(inner.forward, dynamic=True)
+            print("✓ 已启用 torch.compile（首次生成时编译，之后复用计算图）")
+        except Exception as e:
+            print(f"⚠️ torch.compile 不可用，已跳过：{e}")
+
+    return model
+
+
+def measure_rtf(model, model_type, text=BENCHMARK_TEXT):
+    """
+    生成一段固定文本并测量实时率（生成耗时 / 音频时长，越小越快）
+    Base 模型需要参考音频，无法测量
+    返回 (实时率, 耗时秒, 音频秒)
+    """
+    import torch
+
+    if model_type == "CustomVoice":
+        generate = lambda: model.generate_custom_voice(text=text, language="Chinese", speaker="Vivian", instruct="")
+    elif model_type == "VoiceDesign":
+        generate = lambda: model.generate_voice_design(text=text, language="Chinese", instruct="语气平和的成年女声")
+    else:
+        raise ValueError(f"{model_type} 模型不支持测量实时率")
+
+    start_time = time.perf_counter()
+    with torch.no_grad():
+        wavs, sr = generate()
+    elapsed = time.perf_counter() - start_time
+    audio_seconds = len(wavs[0]) / sr if sr else 0
+    rtf = elapsed / audio_seconds if audio_seconds else float("inf")
+    return rtf, elapsed, audio_seconds
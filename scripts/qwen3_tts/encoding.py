@@ -0,0 +1,191 @@
+"""
+压缩输出格式编码模块
+生成结果先以 WAV 作为预览立即返回，FLAC/Opus/MP3 编码在后台线程池中异步完成
+优先使用 soundfile（libsndfile）编码，不支持的格式回退到 ffmpeg
+"""
+
+import os
+import time
+import uuid
+import shutil
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+
+# 输出格式：扩展名与 soundfile 的 (format, subtype)
+OUTPUT_FORMATS = {
+    "WAV": {"ext": ".wav", "sf": ("WAV", "PCM_16")},
+    "FLAC": {"ext": ".flac", "sf": ("FLAC", "PCM_16")},
+    "Opus": {"ext": ".opus", "sf": ("OGG", "OPUS")},
+    "MP3": {"ext": ".mp3", "sf": ("MP3", "MPEG_LAYER_III")},
+}
+
+# Opus 只支持以下采样率，其他采样率交给 ffmpeg 重采样
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+# 预览文件保留时长（秒），超过后在下次编码时清理
+PREVIEW_MAX_AGE = 24 * 3600
+
+
+def find_ffmpeg():
+    path = shutil.which("ffmpeg")
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except (ImportError, RuntimeError):
+        return None
+
+
+def _encode_with_soundfile(src, dst, fmt):
+    import soundfile as sf
+
+    sf_format, subtype = OUTPUT_FORMATS[fmt]["sf"]
+    if subtype not in sf.available_subtypes(sf_format):
+        raise RuntimeError(f"当前 libsndfile 不支持 {fmt} 编码")
+    data, sr = sf.read(src, dtype="float32")
+    if fmt == "Opus" and sr not in OPUS_SAMPLE_RATES:
+        raise RuntimeError(f"Opus 不支持 {sr} Hz 采样率")
+    sf.write(dst, data, sr, format=sf_format, subtype=subtype)
+
+
+def _encode_with_ffmpeg(src, dst, fmt, bitrate):
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        raise RuntimeError(f"无法编码 {fmt}：libsndfile 不支持且未找到 ffmpeg")
+    codec = {"FLAC": ["-c:a", "flac"],
+             "Opus": ["-c:a", "libopus", "-b:a", f"{bitrate}k", "-ar", "48000"],
+             "MP3": ["-c:a", "libmp3lame", "-b:a", f"{bitrate}k"]}[fmt]
+    # 输出为临时文件，需显式指定容器格式
+    container = {"FLAC": "flac", "Opus": "ogg", "MP3": "mp3"}[fmt]
+    result = subprocess.run(
+        [ffmpeg, "-y", "-loglevel", "error", "-i", src] + codec + ["-f", container, dst],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg 编码失败：{result.stderr.strip()}")
+
+
+def encode_file(src, dst, fmt, bitrate=96):
+    """
+    将 WAV 编码为指定格式，先写临时文件再原子替换，避免读取到不完整的文件
+    FLAC 无损，直接由 soundfile 编码；Opus/MP3 指定码率时使用 ffmpeg，否则使用 libsndfile 默认质量
+    """
+    tmp = f"{dst}.part"
+    try:
+        try:
+            if fmt != "FLAC" and find_ffmpeg():
+                _encode_with_ffmpeg(src, tmp, fmt, bitrate)
+            else:
+                _encode_with_soundfile(src, tmp, fmt)
+        except (RuntimeError, ImportError) as e:
+            if fmt == "FLAC":
+                _encode_with_ffmpeg(src, tmp, fmt, bitrate)
+            else:
+                raise e
+        os.replace(tmp, dst)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return dst
+
+
+class BackgroundEncoder:
+    """
+    后台编码器：将 WAV 移动到预览目录后立即返回预览路径，压缩文件由线程池异步写入原输出目录
+    """
+
+    def __init__(self, max_workers=2, preview_dir=None):
+        self.preview_dir = preview_dir or os.path.join(tempfile.gettempdir(), "qwen3_tts_preview")
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="qwen3-tts-encode")
+        self._lock = threading.Lock()
+        self._jobs = {}  # 目标文件 -> Future
+        self._sources = set()  # 等待编码的预览文件，清理时跳过
+
+    def _cleanup_previews(self):
+        if not os.path.isdir(self.preview_dir):
+            return
+        cutoff = time.time() - PREVIEW_MAX_AGE
+        with self._lock:
+            pending = set(self._sources)
+        for name in os.listdir(self.preview_dir):
+            path = os.path.join(self.preview_dir, name)
+            if path in pending:
+                continue
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _run(self, src, dst, fmt, bitrate, restore_on_failure):
+        start_time = time.time()
+        try:
+            encode_file(src, dst, fmt, bitrate)
+            print(f"✓ 后台编码完成（{time.time() - start_time:.1f} 秒）：{dst}")
+            return dst
+        except Exception as e:
+            print(f"⚠️ 后台编码失败：{e}")
+            if restore_on_failure and os.path.exists(src):
+                # WAV 已移入预览目录时放回输出目录，结果不丢失
+                shutil.copy2(src, os.path.splitext(dst)[0] + ".wav")
+            raise
+        finally:
+            with self._lock:
+                self._jobs.pop(dst, None)
+                self._sources.discard(src)
+
+    def submit(self, wav_path, fmt, bitrate=96, keep_wav=False):
+        """
+        提交编码任务，返回 (预览文件路径, 最终文件路径)
+        keep_wav 为 False 时 WAV 移入预览目录（供界面播放），编码完成后不再保留在输出目录
+        """
+        if fmt not in OUTPUT_FORMATS or fmt == "WAV":
+            return wav_path, wav_path
+
+        target = os.path.splitext(wav_path)[0] + OUTPUT_FORMATS[fmt]["ext"]
+        preview = wav_path
+        if not keep_wav:
+            os.makedirs(self.preview_dir, exist_ok=True)
+            self._cleanup_previews()
+            # 预览文件名加随机后缀，不同输出目录中的同名 WAV 不会互相覆盖
+            stem, ext = os.path.splitext(os.path.basename(wav_path))
+            preview = os.path.join(self.preview_dir, f"{stem}_{uuid.uuid4().hex[:8]}{ext}")
+            shutil.move(wav_path, preview)
+            # 移动保留原修改时间（如复制自较早的缓存），按移入时间计算保留期限
+            os.utime(preview)
+
+        with self._lock:
+            self._sources.add(preview)
+            self._jobs[target] = self._executor.submit(self._run, preview, target, fmt, bitrate, not keep_wav)
+        return preview, target
+
+    def submit_all(self, wav_paths, fmt, bitrate=96, keep_wav=False):
+        """
+        批量提交，返回 (预览文件列表, 最终文件列表)
+        """
+        previews, targets = [], []
+        for path in wav_paths:
+            preview, target = self.submit(path, fmt, bitrate, keep_wav)
+            previews.append(preview)
+            targets.append(target)
+        return previews, targets
+
+    def pending(self):
+        with self._lock:
+            return len(self._jobs)
+
+    def wait(self, timeout=None):
+        """
+        等待当前所有编码任务完成
+        """
+        with self._lock:
+            futures = list(self._jobs.values())
+        for future in futures:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass
@@ -0,0 +1,180 @@
+"""
+生成任务控制模块
+每次界面请求作为一个任务运行：生成函数在分块之间报告进度、检查取消标记（协作式取消，当前块完成后停止）；
+参数完全相同的请求在前一个任务进行期间再次提交时不会重复占用 GPU，而是等待并共享前一个任务的结果；
+取消按请求 ID 进行，只影响发起取消的页面，合并任务在所有参与的请求都取消后才停止
+"""
+
+import time
+import uuid
+import threading
+import contextlib
+
+
+# 等待中的重复请求刷新进度的间隔（秒）
+WAIT_POLL_INTERVAL = 0.5
+
+_local = threading.local()
+
+
+class GenerationJob:
+    """
+    单个生成任务的状态：进度、取消标记和结果
+    """
+
+    def __init__(self, key, progress=None):
+        self.key = key
+        self.job_id = uuid.uuid4().hex[:8]
+        self.progress = progress
+        self.fraction = 0.0
+        self.desc = ""
+        self.started_at = time.time()
+        self.cancel_event = threading.Event()
+        self.done = threading.Event()
+        self.result = None
+        self.waiters = 0
+        # 参与该任务（发起或等待其结果）且未取消的请求 ID
+        self.requests = set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def report(self, fraction, desc=""):
+        self.fraction = max(0.0, min(1.0, fraction))
+        self.desc = desc
+        if self.progress is not None:
+            try:
+                self.progress(self.fraction, desc=desc)
+            except Exception:
+                pass
+
+
+class JobRegistry:
+    """
+    进行中任务的登记表，按请求键去重
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = {}
+        # 请求 ID -> 其参与的任务
+        self._requests = {}
+
+    def run(self, key, fn, progress=None, request_id=None):
+        """
+        执行任务并返回 (结果, 是否复用了进行中的相同任务)
+        相同请求键的任务正在进行时，等待其完成并返回同一结果，期间在本请求的进度条上同步显示进度；
+        等待中的请求被取消时立即返回 (None, True)，不影响正在执行的任务
+        request_id 用于 cancel()，为空时该请求无法单独取消
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            owner = job is None
+            if owner:
+                job = self._jobs[key] = GenerationJob(key, progress)
+            else:
+                job.waiters += 1
+            if request_id is not None:
+                job.requests.add(request_id)
+                self._requests[request_id] = job
+
+        try:
+            if not owner:
+                print(f"♻️ 相同的生成任务 {job.job_id} 正在进行，等待其结果")
+                while not job.done.wait(WAIT_POLL_INTERVAL):
+                    if request_id is not None and request_id not in job.requests:
+                        return None, True
+                    if progress is not None:
+                        try:
+                            progress(job.fraction, desc=f"相同任务进行中 - {job.desc}")
+                        except Exception:
+                            pass
+                return job.result, True
+
+            previous = getattr(_local, "job", None)
+            _local.job = job
+            try:
+                job.result = fn()
+            finally:
+                _local.job = previous
+                with self._lock:
+                    self._jobs.pop(key, None)
+                job.done.set()
+            return job.result, False
+        finally:
+            if request_id is not None:
+                with self._lock:
+                    self._requests.pop(request_id, None)
+
+    def cancel(self, request_id):
+        """
+        取消一个请求，返回是否找到进行中的请求
+        任务只在所有参与的请求都取消后才请求停止，其他页面合并进来的相同请求不受影响
+        """
+        with self._lock:
+            job = self._requests.pop(request_id, None)
+            if job is None:
+                return False
+            job.requests.discard(request_id)
+            if not job.requests:
+                job.cancel_event.set()
+        return True
+
+    def cancel_all(self):
+        """
+        请求取消所有进行中的任务，返回被取消的任务数
+        """
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel_event.set()
+        return len(jobs)
+
+    def running(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+
+def new_request_id():
+    """
+    界面每次点击生成时分配的请求 ID（保存在页面的 gr.State 中，供取消按钮使用）
+    """
+    return uuid.uuid4().hex
+
+
+def current_job():
+    return getattr(_local, "job", None)
+
+
+def is_cancelled():
+    """
+    当前线程的任务是否已被请求取消（不在任务中运行时始终为 False）
+    """
+    job = current_job()
+    return job is not None and job.cancelled
+
+
+def report_progress(fraction, desc=""):
+    """
+    报告当前任务的进度；处于 progress_scope 中时映射到外层区间
+    """
+    job = current_job()
+    if job is None:
+        return
+    start, end = getattr(_local, "scope", (0.0, 1.0))
+    job.report(start + (end - start) * fraction, desc)
+
+
+@contextlib.contextmanager
+def progress_scope(start, end):
+    """
+    嵌套调用（如字幕配音中的分批合成）将内部 0-1 的进度映射到外层的 [start, end] 区间
+    """
+    outer_start, outer_end = getattr(_local, "scope", (0.0, 1.0))
+    span = outer_end - outer_start
+    _local.scope = (outer_start + span * start, outer_start + span * end)
+    try:
+        yield
+    finally:
+        _local.scope = (outer_start, outer_end)
@@ -0,0 +1,300 @@
+"""
+Qwen3-TTS 模型加载模块
+WebUI 进程内加载和独立工作进程加载共用同一套加载参数与流程
+本模块不依赖 WebUI 的 modules 包，可在工作进程中直接导入
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+CONFIG_ROOT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "config"
+)
+
+# torch.compile 持久化编译缓存目录
+COMPILE_CACHE_DIR = os.path.join(CONFIG_ROOT, "qwen3_tts_compile_cache")
+
+# 预转换为目标精度的权重缓存目录
+SHARD_CACHE_DIR = os.path.join(CONFIG_ROOT, "qwen3_tts_shard_cache")
+
+# 模型加载耗时记录（每行一条 JSON，便于跨版本对比冷启动时间）
+LOAD_LOG_FILE = os.path.join(CONFIG_ROOT, "qwen3_tts_load_times.jsonl")
+
+# 权重缓存格式版本，转换规则变化时递增使旧缓存失效
+SHARD_CACHE_VERSION = 1
+
+# 快速加载选项
+DEFAULT_LOAD_OPTIONS = {
+    "prefetch": True,          # 加载前并行预读权重文件到页缓存
+    "shard_cache": False,      # 保留转换为目标精度的权重副本，跳过每次加载时的精度转换
+    "cuda_dtype": "bfloat16",  # CUDA 推理精度（不支持 bf16 的显卡选择 float16）
+}
+
+# 并行预读的线程数（NVMe 上多队列并发读取更快）
+PREFETCH_WORKERS = 4
+
+
+def build_load_kwargs(load_options=None):
+    """
+    准备 from_pretrained 的加载参数 - 始终使用离线模式
+    """
+    import torch
+
+    load_options = dict(DEFAULT_LOAD_OPTIONS, **(load_options or {}))
+
+    load_kwargs = {
+        "device_map": "cuda:0" if torch.cuda.is_available() else "cpu",
+        "local_files_only": True,  # 优先使用本地文件
+        "low_cpu_mem_usage": True,
+        "use_safetensors": True,
+    }
+
+    # 仅当 CUDA 可用时设置 dtype 和 attention 实现
+    if torch.cuda.is_available():
+        load_kwargs["torch_dtype"] = getattr(torch, load_options["cuda_dtype"], torch.bfloat16)
+        # 检查是否支持 flash attention
+        try:
+            import flash_attn
+            load_kwargs["attn_implementation"] = "flash_attention_2"
+            print("启用 Flash Attention 2 加速")
+        except ImportError:
+            load_kwargs["attn_implementation"] = "sdpa"
+            print("未检测到 Flash Attention，使用 SDPA 注意力机制")
+    else:
+        load_kwargs["torch_dtype"] = torch.float32
+
+    return load_kwargs
+
+
+def find_weight_files(model_path):
+    """
+    列出模型目录（含子目录，如 speech_tokenizer）中的全部 safetensors 权重文件
+    """
+    return sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(model_path)
+        for name in names if name.endswith(".safetensors")
+    )
+
+
+def _prefetch_file(path):
+    # 提示内核预读整个文件；不支持 posix_fadvise 的平台顺序读取一遍
+    with open(path, 'rb') as f:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+        else:
+            while f.read(16 * 1024 * 1024):
+                pass
+
+
+def _try_prefetch(path):
+    try:
+        _prefetch_file(path)
+        return None
+    except OSError as e:
+        return e
+
+
+def prefetch_weights(model_path):
+    """
+    在后台线程中并行预读权重文件，与模型结构构建和其他初始化重叠
+    safetensors 以内存映射方式读取，预读后缺页直接命中页缓存
+    """
+    paths = find_weight_files(model_path)
+    if not paths:
+        return None
+
+    def run():
+        with ThreadPoolExecutor(max_workers=PREFETCH_WORKERS) as executor:
+            for path, error in zip(paths, executor.map(_try_prefetch, paths)):
+                if error:
+                    print(f"⚠️ 预读权重文件失败：{path}，{error}")
+
+    thread = threading.Thread(target=run, name="qwen3-tts-prefetch", daemon=True)
+    thread.start()
+    return thread
+
+
+def _shard_signature(model_path, dtype_name):
+    digest = hashlib.sha256()
+    digest.update(f"{os.path.realpath(model_path)}|{dtype_name}|{SHARD_CACHE_VERSION}".encode("utf-8"))
+    for path in find_weight_files(model_path):
+        stat = os.stat(path)
+        digest.update(f"|{os.path.relpath(path, model_path)}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _mirror_file(src, dst):
+    # 非权重文件和无需转换的权重优先用符号链接，不占额外空间
+    try:
+        os.symlink(os.path.abspath(src), dst)
+    except (OSError, NotImplementedError):
+        from scripts.qwen3_tts.audio_cache import link_or_copy
+        link_or_copy(src, dst)
+
+
+def _convert_shard(src, dst, dtype):
+    """
+    将单个权重文件中的 float32 张量转换为目标精度；没有 float32 张量时返回 False（直接链接原文件）
+    """
+    import torch
+    from safetensors import safe_open
+    from safetensors.torch import save_file
+
+    with safe_open(src, framework="pt", device="cpu") as f:
+        metadata = f.metadata() or {}
+        keys = list(f.keys())
+        if not any(f.get_slice(key).get_dtype() == "F32" for key in keys):
+            return False
+        tensors = {}
+        for key in keys:
+            tensor = f.get_tensor(key)
+            tensors[key] = tensor.to(dtype) if tensor.dtype == torch.float32 else tensor
+    save_file(tensors, dst, metadata=metadata)
+    return True
+
+
+def prepare_shard_cache(model_path, dtype, cache_dir=SHARD_CACHE_DIR):
+    """
+    返回权重已预转换为目标精度的模型目录（首次调用时构建），之后直接按目标精度内存映射加载
+    只转换模型根目录下的主模型权重，子目录（如 speech_tokenizer）保持原精度并以链接方式引用
+    源文件大小或修改时间变化时自动重建
+    """
+    dtype_name = str(dtype).replace("torch.", "")
+    name = os.path.basename(os.path.normpath(model_path))
+    prefix = f"{name}-{dtype_name}-"
+    cached_path = os.path.join(cache_dir, prefix + _shard_signature(model_path, dtype_name))
+    if os.path.isfile(os.path.join(cached_path, ".complete")):
+        return cached_path, False
+
+    os.makedirs(cache_dir, exist_ok=True)
+    # 清理同一模型、同一精度的旧缓存
+    for entry in os.listdir(cache_dir):
+        if entry.startswith(prefix):
+            shutil.rmtree(os.path.join(cache_dir, entry), ignore_errors=True)
+
+    start_time = time.time()
+    building = cached_path + ".tmp"
+    converted = 0
+    for root, _, names in os.walk(model_path):
+        rel_root = os.path.relpath(root, model_path)
+        target_root = os.path.normpath(os.path.join(building, rel_root))
+        os.makedirs(target_root, exist_ok=True)
+        for file_name in names:
+            src = os.path.join(root, file_name)
+            dst = os.path.join(target_root, file_name)
+            if rel_root == "." and file_name.endswith(".safetensors") and _convert_shard(src, dst, dtype):
+                converted += 1
+            else:
+                _mirror_file(src, dst)
+
+    with open(os.path.join(building, ".complete"), 'w', encoding='utf-8') as f:
+        json.dump({"source": os.path.realpath(model_path), "dtype": dtype_name, "converted": converted}, f)
+    os.replace(building, cached_path)
+    print(f"✓ 已生成 {dtype_name} 权重缓存（转换 {converted} 个文件，耗时 {time.time() - start_time:.1f} 秒）：{cached_path}")
+    return cached_path, True
+
+
+def _package_version(name):
+    try:
+        from importlib.metadata import version
+        return version(name)
+    except Exception:
+        return None
+
+
+def log_load_time(record):
+    """
+    追加一条加载耗时记录（附带 torch/transformers/qwen-tts 版本，便于跨版本对比）
+    """
+    import torch
+
+    record = dict(record)
+    record.update({
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "torch": torch.__version__,
+        "transformers": _package_version("transformers"),
+        "qwen_tts": _package_version("qwen-tts"),
+    })
+    try:
+        os.makedirs(os.path.dirname(LOAD_LOG_FILE), exist_ok=True)
+        with open(LOAD_LOG_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"⚠️ 写入加载耗时记录失败：{e}")
+
+
+def load_time_report(limit=10):
+    """
+    返回最近的加载耗时记录（文本）
+    """
+    if not os.path.exists(LOAD_LOG_FILE):
+        return "暂无加载耗时记录"
+    with open(LOAD_LOG_FILE, 'r', encoding='utf-8') as f:
+        lines = f.readlines()[-limit:]
+    rows = ["最近的 Qwen3-TTS 加载耗时："]
+    for line in reversed(lines):
+        try:
+            r = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        options = "、".join(label for key, label in (("prefetch", "预读"), ("shard_cache", "精度缓存")) if r.get(key)) or "无"
+        rows.append(
+            f"{r.get('time')}  {r.get('model')}  {r.get('seconds', 0):.1f} 秒  {r.get('device')}/{r.get('dtype')}  "
+            f"加速：{options}  torch {r.get('torch')} / transformers {r.get('transformers')} / qwen-tts {r.get('qwen_tts')}"
+        )
+    return "\n".join(rows)
+
+
+def load_qwen_tts_model(model_path, cpu_options=None, load_options=None):
+    """
+    加载 Qwen3-TTS 模型并返回 Qwen3TTSModel 实例
+    cpu_options: 无 CUDA 时应用的 CPU 优化选项（见 cpu_optimize.DEFAULT_CPU_OPTIONS），为空则不优化
+    load_options: 快速加载选项（见 DEFAULT_LOAD_OPTIONS）
+    """
+    import torch
+    from qwen_tts import Qwen3TTSModel
+
+    load_options = dict(DEFAULT_LOAD_OPTIONS, **(load_options or {}))
+    load_kwargs = build_load_kwargs(load_options)
+    dtype = load_kwargs["torch_dtype"]
+    start_time = time.time()
+    is_local = os.path.isdir(model_path)
+
+    # 权重精度缓存：仅在目标精度低于 float32 时有意义
+    load_path = model_path
+    cache_built = False
+    if is_local and load_options["shard_cache"] and dtype != torch.float32:
+        try:
+            load_path, cache_built = prepare_shard_cache(model_path, dtype)
+        except Exception as e:
+            print(f"⚠️ 生成权重精度缓存失败，直接加载原始权重：{e}")
+            load_path = model_path
+
+    if is_local and load_options["prefetch"]:
+        prefetch_weights(load_path)
+
+    model = Qwen3TTSModel.from_pretrained(load_path, **load_kwargs)
+    elapsed = time.time() - start_time
+    print(f"✓ Qwen3-TTS 权重加载耗时 {elapsed:.1f} 秒")
+    log_load_time({
+        "model": os.path.basename(os.path.normpath(model_path)),
+        "seconds": round(elapsed, 3),
+        "device": load_kwargs["device_map"],
+        "dtype": str(dtype).replace("torch.", ""),
+        "prefetch": bool(is_local and load_options["prefetch"]),
+        "shard_cache": load_path != model_path,
+        "shard_cache_built": cache_built,
+    })
+
+    if cpu_options and not torch.cuda.is_available():
+        from scripts.qwen3_tts.cpu_optimize import optimize_for_cpu
+        model = optimize_for_cpu(model, cpu_options, compile_cache_dir=COMPILE_CACHE_DIR)
+
+    return model
@@ -0,0 +1,237 @@
+"""
+本地模型登记模块
+一次性扫描 models/qwen3-tts 与 models/whisper* 目录，读取 config.json 识别模型类型和规格，
+并按目录修改时间缓存扫描结果，加载模型时无需再逐个探测候选路径
+"""
+
+import os
+import re
+import json
+import threading
+
+
+# Qwen3-TTS config.json 中 tts_model_type 的取值（去掉下划线后小写）
+TTS_TYPE_ALIASES = {
+    "base": "Base",
+    "customvoice": "CustomVoice",
+    "voicedesign": "VoiceDesign",
+}
+
+# Base 模型存在多个规格时的优先顺序
+TTS_VERSION_PREFERENCE = ["0.6B", "1.7B"]
+
+# Whisper 规格与 d_model 的对应关系（config.json 中无规格名时使用）
+WHISPER_SIZE_BY_D_MODEL = {
+    384: "tiny",
+    512: "base",
+    768: "small",
+    1024: "medium",
+    1280: "large",
+}
+
+WHISPER_SIZE_PREFERENCE = ["tiny", "base", "small", "medium", "large"]
+
+
+def _read_config(path):
+    config_file = os.path.join(path, "config.json")
+    if not os.path.isfile(config_file):
+        return None
+    try:
+        with open(config_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"⚠️ 读取模型配置失败：{config_file}，{e}")
+        return None
+
+
+def _identify_tts_model(path):
+    """
+    识别 Qwen3-TTS 模型目录的类型和规格，无法识别时返回 None
+    """
+    dir_name = os.path.basename(path)
+    config = _read_config(path) or {}
+
+    model_type = None
+    raw_type = str(config.get("tts_model_type", "")).replace("_", "").lower()
+    if raw_type in TTS_TYPE_ALIASES:
+        model_type = TTS_TYPE_ALIASES[raw_type]
+    else:
+        normalized_name = dir_name.replace("_", "").replace("-", "").lower()
+        for alias, name in TTS_TYPE_ALIASES.items():
+            if normalized_name.endswith(alias):
+                model_type = name
+                break
+    if model_type is None:
+        return None
+
+    version = None
+    raw_size = str(config.get("tts_model_size", "")).lower().replace("b", ".")
+    size_match = re.match(r"^(\d+)\.(\d+)\.?$", raw_size)
+    if size_match:
+        version = f"{size_match.group(1)}.{size_match.group(2)}B"
+    else:
+        name_match = re.search(r"(\d+\.\d+)B", dir_name, re.IGNORECASE)
+        if name_match:
+            version = f"{name_match.group(1)}B"
+
+    return {
+        "name": dir_name,
+        "path": path,
+        "type": model_type,
+        "version": version,
+        "has_config": bool(config),
+    }
+
+
+def _identify_whisper_model(path):
+    """
+    识别 Whisper 模型目录的规格，无法识别时返回 None
+    """
+    dir_name = os.path.basename(path)
+    config = _read_config(path)
+    if config is not None and config.get("model_type") not in (None, "whisper"):
+        return None
+    if config is None and not dir_name.lower().startswith("whisper"):
+        return None
+
+    size = None
+    name_match = re.search(r"whisper[-_]?(tiny|base|small|medium|large)", dir_name, re.IGNORECASE)
+    if name_match:
+        size = name_match.group(1).lower()
+    elif config is not None:
+        size = WHISPER_SIZE_BY_D_MODEL.get(config.get("d_model"))
+    if size is None:
+        return None
+
+    return {
+        "name": dir_name,
+        "path": path,
+        "type": "Whisper",
+        "version": size,
+        "model_id": f"openai/whisper-{size}",
+        "has_config": config is not None,
+    }
+
+
+def _list_subdirs(root):
+    try:
+        with os.scandir(root) as it:
+            return sorted(entry.path for entry in it if entry.is_dir())
+    except OSError:
+        return []
+
+
+class ModelRegistry:
+    """
+    本地模型登记表
+    每个扫描根目录按修改时间缓存结果，目录有新增/删除时自动重新扫描
+    """
+
+    def __init__(self, models_path, tts_dir):
+        self.models_path = models_path
+        self.tts_dir = tts_dir
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _whisper_roots(self):
+        roots = [self.models_path]
+        for sub in ("whisper", "ASR"):
+            path = os.path.join(self.models_path, sub)
+            if os.path.isdir(path):
+                roots.append(path)
+        return roots
+
+    def _scan(self, root, identify, name_filter=None):
+        try:
+            mtime = os.stat(root).st_mtime
+        except OSError:
+            return []
+        key = (root, identify.__name__)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+
+        entries = []
+        for path in _list_subdirs(root):
+            if name_filter and not name_filter(os.path.basename(path)):
+                continue
+            info = identify(path)
+            if info is not None:
+                entries.append(info)
+
+        with self._lock:
+            self._cache[key] = (mtime, entries)
+        return entries
+
+    def invalidate(self):
+        """
+        清空扫描缓存，下次查询时重新扫描
+        """
+        with self._lock:
+            self._cache.clear()
+
+    def tts_models(self):
+        return self._scan(self.tts_dir, _identify_tts_model)
+
+    def whisper_models(self):
+        entries = []
+        for root in self._whisper_roots():
+            # models 根目录下只考虑 whisper* 子目录，避免扫描无关模型
+            name_filter = (lambda name: name.lower().startswith("whisper")) if root == self.models_path else None
+            entries.extend(self._scan(root, _identify_whisper_model, name_filter))
+        return entries
+
+    def resolve_tts(self, model_type, version=None):
+        """
+        查找指定类型（和规格）的本地 Qwen3-TTS 模型，未找到返回 None
+        优先选择带 config.json 的完整目录
+        """
+        candidates = [m for m in self.tts_models() if m["type"] == model_type]
+        if version:
+            candidates = [m for m in candidates if m["version"] == version]
+        if not candidates:
+            return None
+
+        def rank(m):
+            version_rank = TTS_VERSION_PREFERENCE.index(m["version"]) if m["version"] in TTS_VERSION_PREFERENCE else len(TTS_VERSION_PREFERENCE)
+            return (not m["has_config"], version_rank, m["name"])
+
+        return min(candidates, key=rank)
+
+    def resolve_whisper(self, size=None):
+        """
+        查找本地 Whisper 模型，默认优先选择最轻量的规格，未找到返回 None
+        """
+        candidates = self.whisper_models()
+        if size:
+            candidates = [m for m in candidates if m["version"] == size]
+        if not candidates:
+            return None
+
+        def rank(m):
+            return (not m["has_config"], WHISPER_SIZE_PREFERENCE.index(m["version"]), m["path"])
+
+        return min(candidates, key=rank)
+
+    def describe(self):
+        """
+        生成已安装模型的文本说明
+        """
+        lines = []
+        tts = self.tts_models()
+        if tts:
+            for m in sorted(tts, key=lambda m: (m["type"], m["version"] or "")):
+                version = m["version"] or "未知规格"
+                note = "" if m["has_config"] else "（缺少 config.json）"
+                lines.append(f"Qwen3-TTS {m['type']} {version}：{m['name']}{note}")
+        else:
+            lines.append(f"未找到 Qwen3-TTS 模型，请放置到：{self.tts_dir}")
+
+        whisper = self.whisper_models()
+        if whisper:
+            for m in whisper:
+                lines.append(f"Whisper {m['version']}：{os.path.relpath(m['path'], self.models_path)}")
+        else:
+            lines.append("未找到本地 Whisper 模型（自动识别时将尝试远程下载）")
+        return "\n".join(lines)
@@ -0,0 +1,170 @@
+"""
+音频后处理模块
+响度归一化（EBU R128 风格的门限积分响度）、首尾静音裁剪、批量输出的交叉淡化拼接
+均为 NumPy 数组运算，尽量原地修改并写入预分配的缓冲区
+"""
+
+import math
+
+
+# 默认后处理选项
+DEFAULT_POSTPROCESS = {
+    "normalize": False,
+    "target_lufs": -16.0,
+    "trim_silence": False,
+    "silence_db": -45.0,
+    "concat": False,
+    "crossfade_ms": 30,
+}
+
+# 归一化后的峰值上限（dBFS），避免增益过大导致削波
+PEAK_LIMIT_DB = -1.0
+
+
+def _k_weighting(samples, sr):
+    """
+    ITU-R BS.1770 K 加权滤波（高架 + 高通两级二阶滤波）
+    需要 scipy；未安装时返回原始信号（退化为未加权的均方响度）
+    """
+    try:
+        from scipy.signal import lfilter
+    except ImportError:
+        return samples
+
+    # 高架滤波器（按采样率由模拟原型双线性变换得到）
+    f0, gain_db, q = 1681.974450955533, 3.999843853973347, 0.7071752369554196
+    k = math.tan(math.pi * f0 / sr)
+    vh = 10 ** (gain_db / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    b = [(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0]
+    a = [1, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+    shelved = lfilter(b, a, samples)
+
+    # 高通滤波器
+    f0, q = 38.13547087602444, 0.5003270373238773
+    k = math.tan(math.pi * f0 / sr)
+    a0 = 1 + k / q + k * k
+    b = [1, -2, 1]
+    a = [1, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+    return lfilter(b, a, shelved)
+
+
+def integrated_loudness(samples, sr):
+    """
+    计算门限积分响度（LUFS）：400ms 块、75% 重叠，绝对门限 -70 LUFS，相对门限 -10 LU
+    块能量由平方累积和一次性向量化求出
+    """
+    import numpy as np
+
+    weighted = np.asarray(_k_weighting(samples, sr), dtype=np.float64)
+    block = int(0.4 * sr)
+    hop = block // 4
+    if len(weighted) < block:
+        energy = np.mean(weighted ** 2) if len(weighted) else 0.0
+        return -0.691 + 10 * math.log10(energy) if energy > 0 else -math.inf
+
+    cumsum = np.concatenate(([0.0], np.cumsum(weighted ** 2)))
+    starts = np.arange(0, len(weighted) - block + 1, hop)
+    energies = (cumsum[starts + block] - cumsum[starts]) / block
+
+    with np.errstate(divide="ignore"):
+        loudness = -0.691 + 10 * np.log10(energies)
+    gated = energies[loudness > -70.0]
+    if len(gated) == 0:
+        return -math.inf
+    relative_gate = -0.691 + 10 * math.log10(gated.mean()) - 10.0
+    gated = energies[(loudness > -70.0) & (loudness > relative_gate)]
+    if len(gated) == 0:
+        return -math.inf
+    return -0.691 + 10 * math.log10(gated.mean())
+
+
+def normalize_loudness(samples, sr, target_lufs=-16.0):
+    """
+    原地将音频归一化到目标响度，并限制峰值不超过 PEAK_LIMIT_DB
+    """
+    import numpy as np
+
+    loudness = integrated_loudness(samples, sr)
+    if not math.isfinite(loudness):
+        return samples
+    gain = 10 ** ((target_lufs - loudness) / 20)
+    peak = float(np.max(np.abs(samples))) if len(samples) else 0.0
+    peak_limit = 10 ** (PEAK_LIMIT_DB / 20)
+    if peak * gain > peak_limit:
+        gain = peak_limit / peak
+    np.multiply(samples, gain, out=samples)
+    return samples
+
+
+def trim_silence(samples, sr, silence_db=-45.0, pad_ms=50):
+    """
+    裁剪首尾静音，返回原数组的切片视图（不复制数据）
+    以 10ms 帧的 RMS 判断静音
+    """
+    import numpy as np
+
+    frame = max(1, int(0.01 * sr))
+    num_frames = len(samples) // frame
+    if num_frames == 0:
+        return samples
+    frames = samples[:num_frames * frame].reshape(num_frames, frame)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    voiced = np.nonzero(rms > 10 ** (silence_db / 20))[0]
+    if len(voiced) == 0:
+        return samples
+    pad = int(pad_ms / 1000 * sr)
+    start = max(0, voiced[0] * frame - pad)
+    end = min(len(samples), (voiced[-1] + 1) * frame + pad)
+    return samples[start:end]
+
+
+def crossfade_concat(segments, sr, crossfade_ms=30):
+    """
+    交叉淡化拼接多个片段：预分配输出缓冲区，片段直接写入，重叠区按等功率曲线原地混合
+    """
+    import numpy as np
+
+    segments = [np.asarray(seg, dtype=np.float32).reshape(-1) for seg in segments if len(seg)]
+    if not segments:
+        return np.zeros(0, dtype=np.float32)
+
+    fade = int(crossfade_ms / 1000 * sr)
+    # 淡化长度不超过任何相邻片段的一半
+    fade = min([fade] + [len(seg) // 2 for seg in segments])
+    total = sum(len(seg) for seg in segments) - fade * (len(segments) - 1)
+    output = np.zeros(total, dtype=np.float32)
+
+    if fade > 0:
+        t = np.linspace(0.0, math.pi / 2, fade, dtype=np.float32)
+        fade_in = np.sin(t)
+        fade_out = np.cos(t)
+
+    position = 0
+    for i, seg in enumerate(segments):
+        if i == 0 or fade == 0:
+            output[position:position + len(seg)] = seg
+        else:
+            overlap = output[position:position + fade]
+            overlap *= fade_out
+            overlap += seg[:fade] * fade_in
+            output[position + fade:position + len(seg)] = seg[fade:]
+        position += len(seg) - fade
+    return output
+
+
+def process_wav(samples, sr, options):
+    """
+    按选项对单个音频执行裁剪与响度归一化
+    """
+    import numpy as np
+
+    samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+    if options.get("trim_silence"):
+        samples = trim_silence(samples, sr, options.get("silence_db", DEFAULT_POSTPROCESS["silence_db"]))
+    if options.get("normalize"):
+        if not samples.flags.writeable:
+            samples = samples.copy()
+        samples = normalize_loudness(samples, sr, options.get("target_lufs", DEFAULT_POSTPROCESS["target_lufs"]))
+    return samples
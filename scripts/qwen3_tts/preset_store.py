@@ -0,0 +1,206 @@
+"""
+音色预设存储模块
+所有预设保存在同一个 SQLite 数据库中，读取时使用内存缓存（写入后失效），
+支持按名称/音色/描述搜索和按最近使用排序；首次打开时自动迁移旧版每个预设一个 JSON 文件的数据
+"""
+
+import os
+import json
+import shutil
+import sqlite3
+import threading
+import time
+
+
+# 预设字段及默认值
+PRESET_DEFAULTS = {
+    "model": "CustomVoice",
+    "language": "Chinese",
+    "speaker": "Vivian",
+    "instruct": "",
+    "design_instruct": "",
+}
+
+# CustomVoice 预设说话人（旧版预设的 voice_style 据此判断是说话人还是音色描述）
+KNOWN_SPEAKERS = ("Vivian", "Serena", "Uncle_Fu", "Dylan", "Eric", "Ryan", "Aiden", "Ono_Anna", "Sohee")
+
+# 迁移后旧版 JSON 文件的存放目录名
+LEGACY_BACKUP_DIR = "legacy_presets"
+
+
+def convert_legacy_preset(data):
+    """
+    将旧版预设 JSON 转换为当前字段
+    旧版保存时只写入 voice_style，加载时却读取 speaker/instruct，这里按内容还原到对应字段
+    """
+    preset = dict(PRESET_DEFAULTS)
+    for field in PRESET_DEFAULTS:
+        if data.get(field):
+            preset[field] = data[field]
+    voice_style = data.get("voice_style")
+    if voice_style and not data.get("speaker") and not data.get("instruct"):
+        if voice_style in KNOWN_SPEAKERS:
+            preset["speaker"] = voice_style
+        elif preset["model"] == "VoiceDesign":
+            preset["design_instruct"] = voice_style
+        else:
+            preset["instruct"] = voice_style
+    return preset
+
+
+class PresetStore:
+    """
+    基于 SQLite 的音色预设存储，列表读取走内存缓存
+    """
+
+    def __init__(self, db_path, legacy_dir=None):
+        self.db_path = db_path
+        self.legacy_dir = legacy_dir
+        self._lock = threading.Lock()
+        self._conn = None
+        self._cache = None  # 按最近使用排序的预设列表，写入后置空
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS presets ("
+                "name TEXT PRIMARY KEY, "
+                "model TEXT NOT NULL, "
+                "language TEXT NOT NULL, "
+                "speaker TEXT NOT NULL, "
+                "instruct TEXT NOT NULL, "
+                "design_instruct TEXT NOT NULL, "
+                "created_at REAL NOT NULL, "
+                "updated_at REAL NOT NULL, "
+                "last_used REAL NOT NULL DEFAULT 0, "
+                "use_count INTEGER NOT NULL DEFAULT 0)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_presets_last_used ON presets (last_used)")
+            self._conn.commit()
+            if self.legacy_dir:
+                self._migrate_legacy(self._conn)
+        return self._conn
+
+    def _migrate_legacy(self, conn):
+        """
+        导入旧版 JSON 预设，导入后移动到备份目录，避免重复导入
+        """
+        if not os.path.isdir(self.legacy_dir):
+            return
+        files = [name for name in os.listdir(self.legacy_dir) if name.endswith(".json")]
+        if not files:
+            return
+
+        backup_dir = os.path.join(self.legacy_dir, LEGACY_BACKUP_DIR)
+        migrated = 0
+        for file_name in files:
+            path = os.path.join(self.legacy_dir, file_name)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except Exception as e:
+                print(f"⚠️ 跳过无法读取的旧版预设：{path}，{e}")
+                continue
+            if not isinstance(data, dict):
+                continue
+
+            name = data.get("name") or file_name[:-5]
+            preset = convert_legacy_preset(data)
+            created_at = os.path.getmtime(path)
+            conn.execute(
+                "INSERT OR IGNORE INTO presets "
+                "(name, model, language, speaker, instruct, design_instruct, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (name, preset["model"], preset["language"], preset["speaker"], preset["instruct"],
+                 preset["design_instruct"], created_at, created_at)
+            )
+            os.makedirs(backup_dir, exist_ok=True)
+            shutil.move(path, os.path.join(backup_dir, file_name))
+            migrated += 1
+        conn.commit()
+        if migrated:
+            print(f"✓ 已将 {migrated} 个旧版音色预设迁移到 {self.db_path}")
+
+    def _load_all(self):
+        if self._cache is None:
+            rows = self._connect().execute(
+                "SELECT * FROM presets ORDER BY last_used DESC, updated_at DESC, name"
+            ).fetchall()
+            self._cache = [dict(row) for row in rows]
+        return self._cache
+
+    def list(self, query="", limit=None):
+        """
+        返回预设列表（最近使用的在前），query 非空时按名称、说话人和描述过滤
+        """
+        try:
+            with self._lock:
+                presets = self._load_all()
+        except sqlite3.Error as e:
+            print(f"⚠️ 读取音色预设失败：{e}")
+            return []
+
+        query = (query or "").strip().lower()
+        if query:
+            presets = [
+                p for p in presets
+                if any(query in str(p[field]).lower() for field in ("name", "speaker", "instruct", "design_instruct"))
+            ]
+        return [dict(p) for p in (presets[:limit] if limit else presets)]
+
+    def names(self, query=""):
+        return [p["name"] for p in self.list(query)]
+
+    def get(self, name):
+        with self._lock:
+            for preset in self._load_all():
+                if preset["name"] == name:
+                    return dict(preset)
+        return None
+
+    def save(self, name, **fields):
+        """
+        新建或覆盖预设，保留原有的创建时间和使用记录
+        """
+        preset = dict(PRESET_DEFAULTS)
+        preset.update({key: value for key, value in fields.items() if key in PRESET_DEFAULTS and value is not None})
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO presets "
+                "(name, model, language, speaker, instruct, design_instruct, created_at, updated_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET model = excluded.model, language = excluded.language, "
+                "speaker = excluded.speaker, instruct = excluded.instruct, "
+                "design_instruct = excluded.design_instruct, updated_at = excluded.updated_at, "
+                "last_used = excluded.last_used",
+                (name, preset["model"], preset["language"], preset["speaker"], preset["instruct"],
+                 preset["design_instruct"], now, now, now)
+            )
+            conn.commit()
+            self._cache = None
+
+    def mark_used(self, name):
+        """
+        记录一次使用，用于按最近使用排序
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE presets SET last_used = ?, use_count = use_count + 1 WHERE name = ?",
+                (time.time(), name)
+            )
+            conn.commit()
+            self._cache = None
+
+    def delete(self, name):
+        with self._lock:
+            conn = self._connect()
+            deleted = conn.execute("DELETE FROM presets WHERE name = ?", (name,)).rowcount
+            conn.commit()
+            self._cache = None
+        return deleted > 0
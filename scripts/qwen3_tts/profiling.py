@@ -0,0 +1,254 @@
+"""
+分阶段性能剖析模块
+在模型查找、权重加载、Whisper 加载、语音识别、参考音频编码、生成和写文件等阶段记录耗时与 CUDA 显存变化；
+每次请求的各阶段耗时附加到状态信息末尾，所有请求按阶段汇总为耗时直方图，用于定位慢请求的瓶颈阶段。
+CUDA 峰值统计是进程全局的，多个线程的阶段重叠时这些阶段只记录显存净增量，不记录峰值
+"""
+
+import sys
+import time
+import threading
+import functools
+import contextlib
+import collections
+
+
+# 阶段名称（按请求中的先后顺序排列）
+STAGE_LABELS = {
+    "cache": "缓存复用",
+    "resolve": "模型查找",
+    "load": "权重加载",
+    "whisper_load": "Whisper 加载",
+    "transcribe": "语音识别",
+    "reference": "参考音频编码",
+    "generate": "生成",
+    "postprocess": "后处理",
+    "write": "写文件",
+    "request": "请求总计",
+}
+
+# 直方图分桶上界（毫秒），最后一个桶为超过最大上界的请求
+HISTOGRAM_BUCKETS_MS = (10, 30, 100, 300, 1000, 3000, 10000, 30000)
+
+# 每个阶段保留的最近样本数（用于计算分位数）
+RECENT_SAMPLES = 500
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+_stats = {}
+
+# 所有线程中进行中的阶段（用于判断峰值统计是否被其他线程干扰）
+_active_lock = threading.Lock()
+_active_frames = []
+
+
+def _cuda():
+    """
+    返回已初始化的 torch.cuda；未导入 torch 或 CUDA 未初始化时返回 None（不为测量而初始化 CUDA）
+    """
+    torch = sys.modules.get("torch")
+    if torch is None:
+        return None
+    try:
+        if torch.cuda.is_available() and torch.cuda.is_initialized():
+            return torch.cuda
+    except Exception:
+        pass
+    return None
+
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def _record(stage, seconds, memory_delta, memory_peak):
+    with _stats_lock:
+        stats = _stats.get(stage)
+        if stats is None:
+            stats = _stats[stage] = {
+                "count": 0,
+                "total": 0.0,
+                "max": 0.0,
+                "buckets": [0] * (len(HISTOGRAM_BUCKETS_MS) + 1),
+                "recent": collections.deque(maxlen=RECENT_SAMPLES),
+                "peak_memory": 0,
+            }
+        stats["count"] += 1
+        stats["total"] += seconds
+        stats["max"] = max(stats["max"], seconds)
+        stats["recent"].append(seconds)
+        stats["peak_memory"] = max(stats["peak_memory"], memory_peak)
+        ms = seconds * 1000
+        index = next((i for i, bound in enumerate(HISTOGRAM_BUCKETS_MS) if ms < bound), len(HISTOGRAM_BUCKETS_MS))
+        stats["buckets"][index] += 1
+
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace.append((stage, seconds, memory_delta, memory_peak))
+
+
+@contextlib.contextmanager
+def profile_span(stage):
+    """
+    记录一个阶段的耗时、显存净增量和峰值增量
+    嵌套阶段会重置 CUDA 峰值统计，子阶段的峰值向外层传递，保证外层峰值不被低估；
+    其他线程有进行中的阶段时不重置峰值统计，重叠期间进行中的阶段（包括其他线程的）都不记录峰值
+    """
+    cuda = _cuda()
+    allocated_before = cuda.memory_allocated() if cuda else 0
+    thread_id = threading.get_ident()
+    frame = {"child_peak": 0, "thread": thread_id, "shared": False}
+    with _active_lock:
+        if any(other["thread"] != thread_id for other in _active_frames):
+            for other in _active_frames:
+                other["shared"] = True
+            frame["shared"] = True
+        elif cuda:
+            cuda.reset_peak_memory_stats()
+        _active_frames.append(frame)
+    stack = _stack()
+    stack.append(frame)
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start_time
+        stack.pop()
+        with _active_lock:
+            # 按对象身份移除：嵌套阶段的 frame 内容可能相同
+            _active_frames[:] = [other for other in _active_frames if other is not frame]
+        memory_delta = memory_peak = 0
+        cuda = _cuda()
+        if cuda:
+            memory_delta = cuda.memory_allocated() - allocated_before
+            if not frame["shared"]:
+                peak = max(cuda.max_memory_allocated(), frame["child_peak"])
+                memory_peak = max(0, peak - allocated_before)
+                if stack:
+                    stack[-1]["child_peak"] = max(stack[-1]["child_peak"], peak)
+        _record(stage, elapsed, memory_delta, memory_peak)
+
+
+def traced_request(fn):
+    """
+    请求级剖析装饰器：收集本次请求内的所有阶段，并将耗时摘要追加到返回的 (结果, 状态信息) 中
+    嵌套调用（如字幕配音内部的分批合成）由最外层请求统一汇总
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if getattr(_local, "trace", None) is not None:
+            return fn(*args, **kwargs)
+
+        _local.trace = []
+        start_time = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            trace, _local.trace = _local.trace, None
+        total = time.perf_counter() - start_time
+        _record("request", total, 0, 0)
+
+        if trace and isinstance(result, tuple) and len(result) == 2 and isinstance(result[1], str):
+            result = (result[0], f"{result[1]}\n{format_trace(trace, total)}")
+        return result
+    return wrapper
+
+
+def _format_bytes(value):
+    sign = "+" if value >= 0 else "-"
+    value = abs(value)
+    if value >= 1024 ** 3:
+        return f"{sign}{value / 1024 ** 3:.2f}GB"
+    return f"{sign}{value / 1024 ** 2:.0f}MB"
+
+
+def _format_seconds(seconds):
+    return f"{seconds * 1000:.0f}ms" if seconds < 1 else f"{seconds:.2f}s"
+
+
+def format_trace(trace, total):
+    """
+    将一次请求的阶段记录格式化为一行摘要，同名阶段合并计数
+    """
+    merged = {}
+    for stage, seconds, memory_delta, memory_peak in trace:
+        entry = merged.setdefault(stage, [0, 0.0, 0, 0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] += memory_delta
+        entry[3] = max(entry[3], memory_peak)
+
+    order = list(STAGE_LABELS)
+    parts = []
+    for stage in sorted(merged, key=lambda s: order.index(s) if s in order else len(order)):
+        count, seconds, memory_delta, memory_peak = merged[stage]
+        part = f"{STAGE_LABELS.get(stage, stage)} {_format_seconds(seconds)}"
+        if count > 1:
+            part += f"×{count}"
+        if memory_peak:
+            part += f"（显存 {_format_bytes(memory_delta)}，峰值 {_format_bytes(memory_peak)}）"
+        elif memory_delta:
+            part += f"（显存 {_format_bytes(memory_delta)}）"
+        parts.append(part)
+    return f"⏱️ 耗时：{'｜'.join(parts)}｜总计 {_format_seconds(total)}"
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round((len(ordered) - 1) * q / 100)))]
+
+
+def snapshot():
+    """
+    返回各阶段的汇总统计（供接口和界面使用）
+    """
+    with _stats_lock:
+        result = {}
+        for stage, stats in _stats.items():
+            recent = list(stats["recent"])
+            result[stage] = {
+                "label": STAGE_LABELS.get(stage, stage),
+                "count": stats["count"],
+                "mean_ms": stats["total"] / stats["count"] * 1000,
+                "p50_ms": _percentile(recent, 50) * 1000,
+                "p95_ms": _percentile(recent, 95) * 1000,
+                "max_ms": stats["max"] * 1000,
+                "peak_memory": stats["peak_memory"],
+                "buckets_ms": list(HISTOGRAM_BUCKETS_MS),
+                "histogram": list(stats["buckets"]),
+            }
+        return result
+
+
+def format_histograms(bar_width=24):
+    """
+    将各阶段汇总统计格式化为文本直方图
+    """
+    stats = snapshot()
+    if not stats:
+        return "暂无性能统计，生成语音后再查看"
+
+    labels = [f"<{_format_seconds(ms / 1000)}" for ms in HISTOGRAM_BUCKETS_MS]
+    labels.append(f"≥{_format_seconds(HISTOGRAM_BUCKETS_MS[-1] / 1000)}")
+    order = list(STAGE_LABELS)
+    lines = []
+    for stage in sorted(stats, key=lambda s: order.index(s) if s in order else len(order)):
+        item = stats[stage]
+        header = (f"【{item['label']}】次数 {item['count']}，平均 {item['mean_ms']:.0f}ms，"
+                  f"p50 {item['p50_ms']:.0f}ms，p95 {item['p95_ms']:.0f}ms，最大 {item['max_ms']:.0f}ms")
+        if item["peak_memory"]:
+            header += f"，显存峰值 {_format_bytes(item['peak_memory'])}"
+        lines.append(header)
+        largest = max(item["histogram"])
+        for label, count in zip(labels, item["histogram"]):
+            if count:
+                lines.append(f"  {label:>8} {'█' * max(1, round(count / largest * bar_width))} {count}")
+        lines.append("")
+    return "\n".join(lines).rstrip()
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
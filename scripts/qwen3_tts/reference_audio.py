@@ -0,0 +1,178 @@
+"""
+参考音频预处理模块
+语音克隆前统一处理用户上传的参考音频：一次性重采样、混合为单声道、按能量检测裁剪静音，
+并截取语音最密集的 3-10 秒窗口；处理结果按原文件内容哈希缓存，相同参考音频只处理一次
+"""
+
+import os
+import threading
+
+from scripts.qwen3_tts.transcription_cache import hash_audio_file
+
+
+# 预处理后的采样率（与 Qwen3-TTS 语音编码器一致）
+REFERENCE_SAMPLE_RATE = 24000
+
+# 截取窗口的最短/最长时长（秒）
+MIN_REFERENCE_SECONDS = 3.0
+MAX_REFERENCE_SECONDS = 10.0
+
+# 能量检测参数：帧长（毫秒）与相对最大帧能量的阈值（dB）
+VAD_FRAME_MS = 20
+VAD_THRESHOLD_DB = -40.0
+
+# 裁剪时在语音前后保留的余量（秒）
+EDGE_PADDING_SECONDS = 0.1
+
+# 缓存目录中最多保留的处理结果数
+MAX_CACHED_FILES = 200
+
+# 预处理版本号，处理逻辑变化时递增，使旧缓存失效
+PREPROCESS_VERSION = 1
+
+
+def load_mono(path, target_sr=REFERENCE_SAMPLE_RATE):
+    """
+    读取音频并混合为单声道 float32，按需一次性重采样到目标采样率
+    """
+    import numpy as np
+    import soundfile as sf
+
+    data, sr = sf.read(path, dtype="float32", always_2d=True)
+    samples = data.mean(axis=1) if data.shape[1] > 1 else data[:, 0]
+    if sr == target_sr:
+        return np.ascontiguousarray(samples), sr
+
+    try:
+        import librosa
+        return librosa.resample(samples, orig_sr=sr, target_sr=target_sr).astype(np.float32), target_sr
+    except ImportError:
+        pass
+    try:
+        from math import gcd
+        from scipy.signal import resample_poly
+        g = gcd(sr, target_sr)
+        return resample_poly(samples, target_sr // g, sr // g).astype(np.float32), target_sr
+    except ImportError:
+        pass
+    # 最后回退到线性插值
+    duration = len(samples) / sr
+    target_times = np.arange(int(duration * target_sr)) / target_sr
+    return np.interp(target_times, np.arange(len(samples)) / sr, samples).astype(np.float32), target_sr
+
+
+def voiced_frames(samples, sr, frame_ms=VAD_FRAME_MS, threshold_db=VAD_THRESHOLD_DB):
+    """
+    按帧能量判断是否有语音，阈值相对于最响帧，返回 (布尔数组, 帧长采样数)
+    """
+    import numpy as np
+
+    frame = max(1, int(sr * frame_ms / 1000))
+    num_frames = len(samples) // frame
+    if num_frames == 0:
+        return np.zeros(0, dtype=bool), frame
+    frames = samples[:num_frames * frame].reshape(num_frames, frame)
+    energy = np.mean(np.square(frames, dtype=np.float64), axis=1)
+    peak = energy.max()
+    if peak <= 0:
+        return np.zeros(num_frames, dtype=bool), frame
+    return energy > peak * 10 ** (threshold_db / 10), frame
+
+
+def best_window(voiced, frame, sr, min_seconds=MIN_REFERENCE_SECONDS, max_seconds=MAX_REFERENCE_SECONDS):
+    """
+    在语音帧序列中找出语音帧最多的窗口，返回 (起始帧, 结束帧)
+    语音总长不足最长时长时返回首尾语音之间的全部范围
+    """
+    import numpy as np
+
+    indices = np.nonzero(voiced)[0]
+    if len(indices) == 0:
+        return 0, len(voiced)
+    first, last = int(indices[0]), int(indices[-1]) + 1
+    max_frames = int(max_seconds * sr / frame)
+    if last - first <= max_frames:
+        return first, last
+
+    # 累积和一次性求出所有窗口内的语音帧数
+    cumsum = np.concatenate(([0], np.cumsum(voiced[first:last], dtype=np.int64)))
+    counts = cumsum[max_frames:] - cumsum[:-max_frames]
+    start = first + int(np.argmax(counts))
+    end = start + max_frames
+
+    # 窗口末端尽量落在停顿处，避免截断半个字
+    min_frames = int(min_seconds * sr / frame)
+    pauses = np.nonzero(~voiced[start + min_frames:end])[0]
+    if len(pauses):
+        end = start + min_frames + int(pauses[-1]) + 1
+    while start < end and not voiced[start]:
+        start += 1
+    return start, end
+
+
+def preprocess_reference(path, crop=True):
+    """
+    预处理参考音频，返回 (单声道样本, 采样率)
+    crop 为 False 时只裁剪首尾静音，不截取窗口（参考文本对应完整音频时使用）
+    """
+    samples, sr = load_mono(path)
+    voiced, frame = voiced_frames(samples, sr)
+    if not voiced.any():
+        return samples, sr
+
+    if crop:
+        start, end = best_window(voiced, frame, sr)
+    else:
+        indices = voiced.nonzero()[0]
+        start, end = int(indices[0]), int(indices[-1]) + 1
+
+    pad = int(EDGE_PADDING_SECONDS * sr)
+    start_sample = max(0, start * frame - pad)
+    end_sample = min(len(samples), end * frame + pad)
+    return samples[start_sample:end_sample], sr
+
+
+class ReferenceAudioCache:
+    """
+    参考音频预处理结果缓存，以原文件内容哈希 + 处理参数为文件名保存处理后的 WAV
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+
+    def _cache_path(self, audio_hash, crop):
+        name = f"{audio_hash}_v{PREPROCESS_VERSION}_{'crop' if crop else 'trim'}.wav"
+        return os.path.join(self.cache_dir, name)
+
+    def _prune(self):
+        files = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith(".wav")]
+        if len(files) <= MAX_CACHED_FILES:
+            return
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - MAX_CACHED_FILES]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def prepare(self, path, crop=True):
+        """
+        返回预处理后的参考音频路径，命中缓存时直接返回
+        """
+        import soundfile as sf
+
+        cache_path = self._cache_path(hash_audio_file(path), crop)
+        if os.path.isfile(cache_path):
+            os.utime(cache_path)
+            return cache_path
+
+        samples, sr = preprocess_reference(path, crop)
+        with self._lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = f"{cache_path}.{threading.get_ident()}.tmp"
+            sf.write(tmp, samples, sr, format="WAV", subtype="PCM_16")
+            os.replace(tmp, cache_path)
+            self._prune()
+        print(f"✓ 参考音频已预处理：{len(samples) / sr:.1f} 秒，{sr} Hz 单声道")
+        return cache_path
@@ -0,0 +1,179 @@
+"""
+字幕/脚本配音模块
+解析 SRT 字幕或逐行编号的脚本，按字幕起始时间排布合成的语音片段，并一次性向量化混音为完整音轨
+"""
+
+import re
+
+
+# 对齐方式
+FIT_STRETCH = "stretch"   # 片段超出字幕时长时加速（保持音高）压缩到字幕时长内
+FIT_PAD = "pad"           # 片段超出时顺延后续片段，保证不重叠
+
+# 加速压缩的最大倍率，超出部分按顺延处理，避免语速过快
+MAX_STRETCH_RATE = 1.5
+
+# 无时间轴脚本中相邻句子之间的停顿（秒）
+SCRIPT_GAP_SECONDS = 0.3
+
+_SRT_TIME_RE = re.compile(
+    r"(\d+):(\d{1,2}):(\d{1,2})[,.](\d{1,3})\s*-->\s*(\d+):(\d{1,2}):(\d{1,2})[,.](\d{1,3})"
+)
+_NUMBERED_LINE_RE = re.compile(r"^\s*\d+\s*[.、)）:：]?\s+(.+)$|^\s*\d+\s*[.、)）:：]\s*(.+)$")
+
+
+def _to_seconds(h, m, s, ms):
+    return int(h) * 3600 + int(m) * 60 + int(s) + int(ms.ljust(3, "0")) / 1000
+
+
+def parse_srt(content):
+    """
+    解析 SRT 字幕，返回 [{"start": 秒, "end": 秒, "text": 文本}, ...]
+    """
+    cues = []
+    current = None
+    for line in content.splitlines():
+        line = line.strip().lstrip("﻿")
+        match = _SRT_TIME_RE.search(line)
+        if match:
+            if current and current["text"]:
+                cues.append(current)
+            groups = match.groups()
+            current = {
+                "start": _to_seconds(*groups[:4]),
+                "end": _to_seconds(*groups[4:]),
+                "text": ""
+            }
+        elif not line:
+            if current and current["text"]:
+                cues.append(current)
+            current = None
+        elif current is not None:
+            # 去除常见的字幕样式标签
+            text = re.sub(r"<[^>]+>|\{[^}]+\}", "", line).strip()
+            current["text"] = f"{current['text']} {text}".strip() if current["text"] else text
+    if current and current["text"]:
+        cues.append(current)
+    return cues
+
+
+def parse_numbered_script(content):
+    """
+    解析逐行脚本（可带 "1." "1、" 等编号），返回无时间信息的句子列表
+    """
+    cues = []
+    for line in content.splitlines():
+        line = line.strip().lstrip("﻿")
+        if not line:
+            continue
+        match = _NUMBERED_LINE_RE.match(line)
+        text = (match.group(1) or match.group(2)).strip() if match else line
+        if text:
+            cues.append({"start": None, "end": None, "text": text})
+    return cues
+
+
+def parse_script(content):
+    """
+    自动识别 SRT 字幕或逐行脚本
+    """
+    if _SRT_TIME_RE.search(content):
+        return parse_srt(content)
+    return parse_numbered_script(content)
+
+
+def time_stretch(samples, rate):
+    """
+    保持音高的时间伸缩，rate > 1 表示加速
+    优先使用 librosa（相位声码器），未安装时使用向量化的重叠相加（OLA）实现
+    """
+    import numpy as np
+
+    if rate <= 1.0 or len(samples) == 0:
+        return samples
+    try:
+        import librosa
+        return librosa.effects.time_stretch(samples.astype(np.float32), rate=rate)
+    except ImportError:
+        pass
+
+    frame = 1024
+    synthesis_hop = frame // 4
+    analysis_hop = synthesis_hop * rate
+    if len(samples) < frame:
+        return samples[:int(len(samples) / rate)]
+
+    num_frames = int((len(samples) - frame) / analysis_hop) + 1
+    starts = (np.arange(num_frames) * analysis_hop).astype(np.int64)
+    window = np.hanning(frame).astype(np.float32)
+    frames = samples[starts[:, None] + np.arange(frame)[None, :]] * window
+
+    out_length = (num_frames - 1) * synthesis_hop + frame
+    out_index = (np.arange(num_frames) * synthesis_hop)[:, None] + np.arange(frame)[None, :]
+    output = np.bincount(out_index.ravel(), weights=frames.ravel(), minlength=out_length)
+    norm = np.bincount(out_index.ravel(), weights=np.tile(window, num_frames), minlength=out_length)
+    # 末帧窗口会超出理论时长，按目标时长裁剪，保证排布计算准确
+    target_length = int(round(len(samples) / rate))
+    return (output / np.maximum(norm, 1e-3))[:target_length].astype(np.float32)
+
+
+def layout_segments(durations, cues, fit_mode=FIT_STRETCH):
+    """
+    计算每个片段在时间轴上的起点（秒）和加速倍率
+    durations: 各片段原始时长（秒）
+    """
+    starts = []
+    rates = []
+    cursor = 0.0
+    for i, (duration, cue) in enumerate(zip(durations, cues)):
+        if cue["start"] is None:
+            start = cursor + (SCRIPT_GAP_SECONDS if i else 0.0)
+            rate = 1.0
+        else:
+            start = cue["start"]
+            # 可用时长：到下一句字幕开始为止，最后一句到自身结束时间
+            next_start = next((c["start"] for c in cues[i + 1:] if c["start"] is not None), None)
+            slot_end = next_start if next_start is not None else max(cue["end"], cue["start"])
+            slot = max(slot_end - start, 0.0)
+            rate = 1.0
+            if fit_mode == FIT_STRETCH and slot > 0 and duration > slot:
+                rate = min(duration / slot, MAX_STRETCH_RATE)
+            # 前一片段仍未结束时顺延，避免重叠
+            start = max(start, cursor)
+        starts.append(start)
+        rates.append(rate)
+        cursor = start + duration / rate
+    return starts, rates
+
+
+def mix_down(segments, starts, sr):
+    """
+    一次性向量化混音：将所有片段按起点（秒）叠加到同一条音轨
+    """
+    import numpy as np
+
+    offsets = [int(round(start * sr)) for start in starts]
+    lengths = [len(seg) for seg in segments]
+    total = max((o + n for o, n in zip(offsets, lengths)), default=0)
+    if total == 0:
+        return np.zeros(0, dtype=np.float32)
+
+    samples = np.concatenate([np.asarray(seg, dtype=np.float32).reshape(-1) for seg in segments])
+    indices = np.concatenate([np.arange(n, dtype=np.int64) + o for o, n in zip(offsets, lengths)])
+    track = np.bincount(indices, weights=samples, minlength=total)
+    return np.clip(track, -1.0, 1.0).astype(np.float32)
+
+
+def assemble_track(segments, sr, cues, fit_mode=FIT_STRETCH):
+    """
+    按字幕时间排布片段并混音，返回 (音轨, 布局信息)
+    """
+    durations = [len(seg) / sr for seg in segments]
+    starts, rates = layout_segments(durations, cues, fit_mode)
+    stretched = [time_stretch(seg, rate) if rate > 1.0 else seg for seg, rate in zip(segments, rates)]
+    track = mix_down(stretched, starts, sr)
+    layout = [
+        {"text": cue["text"], "cue_start": cue["start"], "start": start, "rate": rate, "duration": len(seg) / sr}
+        for cue, start, rate, seg in zip(cues, starts, rates, stretched)
+    ]
+    return track, layout
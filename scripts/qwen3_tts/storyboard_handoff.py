@@ -0,0 +1,236 @@
+"""
+分镜交接模块
+向分镜助手（sd-webui-MultiModal）发送音频时，新分镜先以单行 JSON 追加到日志文件，
+再由延迟合并把日志批量并入 storyboard.json（原子替换），连续发送只重写一次分镜文件；
+读写均持有文件锁，音频以硬链接/reflink 交给分镜目录
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+import contextlib
+import datetime
+
+from scripts.qwen3_tts.audio_cache import link_or_copy
+
+
+# 每页显示的分镜数（与分镜助手一致）
+STORYBOARDS_PER_PAGE = 9
+
+# 最后一次追加后等待多久合并日志（秒），期间的连续发送合并为一次写入
+COMPACT_DELAY = 2.0
+
+# 日志累积到该条数时立即合并
+COMPACT_MAX_PENDING = 50
+
+JOURNAL_NAME = "storyboard.journal"
+LOCK_NAME = "storyboard.lock"
+STORYBOARD_NAME = "storyboard.json"
+
+
+@contextlib.contextmanager
+def file_lock(lock_path):
+    """
+    跨进程文件锁（POSIX 使用 flock，Windows 使用 msvcrt.locking）
+    """
+    with open(lock_path, 'a+b') as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+_storyboard_dir = None
+_storyboard_dir_lock = threading.Lock()
+
+
+def locate_storyboard_dir(extensions_root):
+    """
+    定位分镜助手的数据目录，只在首次调用时探测并打印路径信息，之后直接返回缓存结果
+    找不到分镜助手扩展时抛出 FileNotFoundError（不缓存，安装扩展后无需重启即可重试）
+    """
+    global _storyboard_dir
+
+    with _storyboard_dir_lock:
+        if _storyboard_dir is not None:
+            return _storyboard_dir
+
+        multimodal_dir = os.path.join(extensions_root, "sd-webui-MultiModal")
+        scripts_dir = os.path.join(multimodal_dir, "scripts")
+        if not os.path.isdir(multimodal_dir):
+            raise FileNotFoundError(f"❌ sd-webui-MultiModal 扩展目录不存在：{multimodal_dir}\n请确保已安装该扩展")
+        if not os.path.isdir(scripts_dir):
+            raise FileNotFoundError(f"❌ scripts 目录不存在：{scripts_dir}")
+
+        data_dir = os.path.join(scripts_dir, "storyboard_data")
+        os.makedirs(os.path.join(data_dir, "temp_audios"), exist_ok=True)
+        print(f"✓ 分镜数据目录：{data_dir}")
+        _storyboard_dir = data_dir
+        return data_dir
+
+
+class StoryboardJournal:
+    """
+    分镜追加日志：append 只追加一行日志，compact 将日志并入 storyboard.json
+    """
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.storyboard_file = os.path.join(data_dir, STORYBOARD_NAME)
+        self.journal_file = os.path.join(data_dir, JOURNAL_NAME)
+        self.lock_file = os.path.join(data_dir, LOCK_NAME)
+        self._timer = None
+        self._timer_lock = threading.Lock()
+        # storyboard.json 的 (mtime, size) -> 分镜数，文件未被其他程序修改时无需重新解析
+        self._count_cache = (None, 0)
+
+    def _read_storyboard(self):
+        if not os.path.exists(self.storyboard_file):
+            return []
+        try:
+            with open(self.storyboard_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+            return json.loads(content) if content.strip() else []
+        except Exception as e:
+            print(f"⚠️ 加载分镜数据失败：{e}")
+            return []
+
+    def _storyboard_count(self):
+        try:
+            stat = os.stat(self.storyboard_file)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return 0
+        if self._count_cache[0] != signature:
+            self._count_cache = (signature, len(self._read_storyboard()))
+        return self._count_cache[1]
+
+    def _read_journal(self):
+        if not os.path.exists(self.journal_file):
+            return []
+        entries = []
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # 写入中途崩溃留下的不完整行，丢弃
+                    print(f"⚠️ 跳过损坏的分镜日志记录：{line[:80]}")
+        return entries
+
+    def append(self, entry):
+        """
+        追加一条分镜记录，返回 (预计的分镜索引, 预计的分镜总数)
+        """
+        entry = dict(entry, handoff_id=uuid.uuid4().hex)
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with file_lock(self.lock_file):
+            pending = len(self._read_journal())
+            with open(self.journal_file, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            index = self._storyboard_count() + pending
+
+        if pending + 1 >= COMPACT_MAX_PENDING:
+            self.compact()
+        else:
+            self._schedule_compact()
+        return index, index + 1
+
+    def _schedule_compact(self):
+        with self._timer_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(COMPACT_DELAY, self.compact)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def compact(self):
+        """
+        将日志并入 storyboard.json：写临时文件后原子替换，再清空日志
+        已并入的记录按 handoff_id 去重，替换后、清空日志前崩溃也不会重复添加
+        """
+        with self._timer_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        with file_lock(self.lock_file):
+            entries = self._read_journal()
+            if not entries:
+                return 0
+
+            storyboard = self._read_storyboard()
+            merged = {item.get("handoff_id") for item in storyboard if isinstance(item, dict)}
+            added = 0
+            for entry in entries:
+                if entry.get("handoff_id") in merged:
+                    continue
+                entry["id"] = len(storyboard)
+                storyboard.append(entry)
+                added += 1
+
+            tmp = f"{self.storyboard_file}.{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(storyboard, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.storyboard_file)
+            open(self.journal_file, 'w').close()
+            self._count_cache = (None, len(storyboard))
+
+        print(f"✓ 已将 {added} 条分镜记录合并到 {self.storyboard_file}")
+        return added
+
+
+_journals = {}
+
+
+def get_journal(data_dir):
+    if data_dir not in _journals:
+        _journals[data_dir] = StoryboardJournal(data_dir)
+    return _journals[data_dir]
+
+
+def handoff_audio(data_dir, audio_path):
+    """
+    将音频交给分镜目录（硬链接/reflink，不支持时复制），返回分镜中的音频路径
+    """
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    ext = os.path.splitext(audio_path)[1] or ".wav"
+    output_path = os.path.join(data_dir, "temp_audios", f"storyboard_audio_{timestamp}_{uuid.uuid4().hex[:6]}{ext}")
+    return link_or_copy(audio_path, output_path)
+
+
+def flush_all():
+    """
+    立即合并所有待处理的分镜日志（WebUI 退出时调用）
+    """
+    for journal in list(_journals.values()):
+        try:
+            journal.compact()
+        except Exception as e:
+            print(f"⚠️ 合并分镜日志失败：{e}")
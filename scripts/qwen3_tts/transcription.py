@@ -0,0 +1,81 @@
+"""
+批量语音识别模块
+多个音频先在线程池中并行解码为 16kHz 单声道，再交给 Whisper 管线按 chunk_length_s 分段做长音频解码，
+不同文件的分段合并成批一次前向；本模块只负责解码与批量推理，模型加载和识别缓存由调用方管理
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Whisper 输入采样率
+WHISPER_SAMPLE_RATE = 16000
+
+# 默认识别参数：每批分段数、长音频分段长度（秒）
+DEFAULT_WHISPER_OPTIONS = {
+    "batch_size": 8,
+    "chunk_length_s": 30,
+}
+
+# 批量识别支持的音频格式
+AUDIO_EXTENSIONS = (".wav", ".flac", ".mp3", ".ogg", ".opus", ".m4a")
+
+# 并行解码的线程数
+DECODE_WORKERS = 4
+
+
+def list_audio_files(folder, recursive=False):
+    """
+    列出文件夹中的音频文件（按路径排序）
+    """
+    if recursive:
+        paths = [os.path.join(root, name) for root, _, names in os.walk(folder) for name in names]
+    else:
+        paths = [os.path.join(folder, name) for name in os.listdir(folder)]
+    return sorted(path for path in paths if path.lower().endswith(AUDIO_EXTENSIONS) and os.path.isfile(path))
+
+
+def load_whisper_input(path):
+    """
+    将音频解码为 Whisper 管线可直接使用的输入；soundfile 无法读取的格式返回路径，由管线调用 ffmpeg 解码
+    """
+    from scripts.qwen3_tts.reference_audio import load_mono
+
+    try:
+        samples, sr = load_mono(path, WHISPER_SAMPLE_RATE)
+    except Exception:
+        return path
+    return {"raw": samples, "sampling_rate": sr}
+
+
+def decode_inputs(paths, max_workers=DECODE_WORKERS):
+    """
+    并行解码多个音频，返回与 paths 顺序一致的输入列表
+    """
+    if len(paths) == 1:
+        return [load_whisper_input(paths[0])]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(load_whisper_input, paths))
+
+
+def normalize_options(options=None):
+    """
+    合并默认识别参数并校正取值范围
+    """
+    merged = dict(DEFAULT_WHISPER_OPTIONS, **(options or {}))
+    merged["batch_size"] = max(1, int(merged["batch_size"]))
+    merged["chunk_length_s"] = max(0, int(merged["chunk_length_s"]))
+    return merged
+
+
+def run_whisper(pipe, inputs, options=None):
+    """
+    对一组输入执行批量识别，返回识别文本列表
+    chunk_length_s 为 0 时不分段（超过 30 秒的部分会被截断）
+    """
+    options = normalize_options(options)
+    call_kwargs = {"batch_size": options["batch_size"]}
+    if options["chunk_length_s"]:
+        call_kwargs["chunk_length_s"] = options["chunk_length_s"]
+    results = pipe(list(inputs), **call_kwargs)
+    return [result["text"].strip() for result in results]
@@ -0,0 +1,127 @@
+"""
+Whisper 识别结果缓存模块
+以音频内容哈希和模型 ID 为键，将识别文本持久化到 SQLite，WebUI 重启后依然有效
+"""
+
+import os
+import sqlite3
+import hashlib
+import threading
+import time
+
+
+def hash_audio_file(audio_path, chunk_size=1024 * 1024):
+    """
+    计算音频文件内容的 SHA-256 哈希
+    按块读取，避免一次性将大文件读入内存
+    """
+    digest = hashlib.sha256()
+    with open(audio_path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TranscriptionCache:
+    """
+    基于 SQLite 的语音识别结果缓存
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS transcriptions ("
+                "audio_hash TEXT NOT NULL, "
+                "model_id TEXT NOT NULL, "
+                "text TEXT NOT NULL, "
+                "created_at REAL NOT NULL, "
+                "PRIMARY KEY (audio_hash, model_id))"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get(self, audio_hash, model_id):
+        """
+        查询缓存的识别文本，未命中时返回 None
+        """
+        try:
+            with self._lock:
+                row = self._connect().execute(
+                    "SELECT text FROM transcriptions WHERE audio_hash = ? AND model_id = ?",
+                    (audio_hash, model_id)
+                ).fetchone()
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            print(f"⚠️ 读取识别缓存失败：{e}")
+            return None
+
+    def put(self, audio_hash, model_id, text):
+        """
+        写入识别文本，已存在的记录会被覆盖
+        """
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO transcriptions (audio_hash, model_id, text, created_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (audio_hash, model_id, text, time.time())
+                )
+                conn.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"⚠️ 写入识别缓存失败：{e}")
+            return False
+
+    def get_many(self, audio_hashes, model_id):
+        """
+        批量查询识别文本，返回 {音频哈希: 文本}（只包含命中的记录）
+        """
+        hashes = list(dict.fromkeys(audio_hashes))
+        found = {}
+        try:
+            with self._lock:
+                conn = self._connect()
+                # 分段查询，避免超过 SQLite 的参数数量上限
+                for start in range(0, len(hashes), 500):
+                    part = hashes[start:start + 500]
+                    rows = conn.execute(
+                        f"SELECT audio_hash, text FROM transcriptions WHERE model_id = ? "
+                        f"AND audio_hash IN ({','.join('?' * len(part))})",
+                        (model_id, *part)
+                    ).fetchall()
+                    found.update(rows)
+        except sqlite3.Error as e:
+            print(f"⚠️ 读取识别缓存失败：{e}")
+        return found
+
+    def put_many(self, entries, model_id):
+        """
+        在一个事务中写入多条识别文本，entries 为 {音频哈希: 文本}
+        """
+        if not entries:
+            return True
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO transcriptions (audio_hash, model_id, text, created_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    [(audio_hash, model_id, text, now) for audio_hash, text in entries.items()]
+                )
+                conn.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"⚠️ 写入识别缓存失败：{e}")
+            return False
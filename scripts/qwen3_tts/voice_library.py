@@ -0,0 +1,251 @@
+"""
+克隆音色库模块
+将 Base 模型由参考音频计算出的克隆提示（voice clone prompt）保存为 safetensors，
+参考文本和元数据写入文件头；使用已保存的音色时以内存映射方式加载，跳过语音识别和参考音频编码
+本模块不依赖 WebUI 的 modules 包，可在工作进程中直接导入
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import importlib
+import threading
+import dataclasses
+
+
+VOICE_FILE_EXT = ".safetensors"
+
+# 文件头中的格式标识与版本
+VOICE_FORMAT = "qwen3_tts_voice"
+VOICE_FORMAT_VERSION = "1"
+
+
+def sanitize_voice_name(name):
+    """
+    将音色名转换为安全的文件名（保留中文、字母、数字、下划线和短横线）
+    """
+    name = re.sub(r"[^\w\-]+", "_", (name or "").strip(), flags=re.UNICODE).strip("_")
+    return name[:64]
+
+
+def _item_fields(item):
+    if dataclasses.is_dataclass(item):
+        return {field.name: getattr(item, field.name) for field in dataclasses.fields(item)}
+    if isinstance(item, dict):
+        return dict(item)
+    return dict(vars(item))
+
+
+def serialize_prompt(prompt_items):
+    """
+    将克隆提示列表拆分为 (张量字典, 可 JSON 序列化的结构描述)
+    张量统一复制到 CPU，键名为 "<序号>.<字段名>"
+    """
+    import torch
+
+    tensors = {}
+    items = []
+    for i, item in enumerate(prompt_items):
+        cls = type(item)
+        entry = {"class": f"{cls.__module__}:{cls.__qualname__}", "fields": {}, "tensors": []}
+        for name, value in _item_fields(item).items():
+            if isinstance(value, torch.Tensor):
+                key = f"{i}.{name}"
+                tensors[key] = value.detach().to("cpu").contiguous()
+                entry["tensors"].append(name)
+            else:
+                entry["fields"][name] = value
+        items.append(entry)
+    return tensors, items
+
+
+def _resolve_class(path):
+    module_name, _, qualname = path.partition(":")
+    if module_name in ("builtins", ""):
+        return None
+    try:
+        obj = importlib.import_module(module_name)
+        for part in qualname.split("."):
+            obj = getattr(obj, part)
+        return obj
+    except (ImportError, AttributeError):
+        return None
+
+
+def deserialize_prompt(tensors, items):
+    """
+    由张量字典和结构描述重建克隆提示列表；找不到原始类时返回字典
+    """
+    prompt_items = []
+    for i, entry in enumerate(items):
+        values = dict(entry["fields"])
+        for name in entry["tensors"]:
+            values[name] = tensors[f"{i}.{name}"]
+        cls = _resolve_class(entry["class"])
+        prompt_items.append(cls(**values) if cls is not None else values)
+    return prompt_items
+
+
+def prompt_to_device(prompt_items, device):
+    """
+    将克隆提示中的张量移动到模型所在设备，返回新的列表
+    """
+    import torch
+
+    moved = []
+    for item in prompt_items:
+        values = {name: value.to(device) if isinstance(value, torch.Tensor) else value
+                  for name, value in _item_fields(item).items()}
+        if dataclasses.is_dataclass(item):
+            moved.append(dataclasses.replace(item, **values))
+        elif isinstance(item, dict):
+            moved.append(values)
+        else:
+            moved.append(item)
+    return moved
+
+
+def model_device(model):
+    """
+    返回 Qwen3TTSModel（或其内部 torch 模块）所在设备
+    """
+    import torch
+
+    device = getattr(model, "device", None)
+    if device is not None:
+        return torch.device(device)
+    inner = getattr(model, "model", model)
+    if isinstance(inner, torch.nn.Module):
+        for param in inner.parameters():
+            return param.device
+    return torch.device("cpu")
+
+
+class VoiceLibrary:
+    """
+    克隆音色库，每个音色一个 safetensors 文件；列表按目录修改时间缓存
+    """
+
+    def __init__(self, library_dir):
+        self.library_dir = library_dir
+        self._lock = threading.Lock()
+        self._index = None
+        self._index_mtime = None
+
+    def _path(self, name):
+        return os.path.join(self.library_dir, sanitize_voice_name(name) + VOICE_FILE_EXT)
+
+    def _read_header(self, path):
+        from safetensors import safe_open
+
+        with safe_open(path, framework="pt", device="cpu") as f:
+            metadata = f.metadata() or {}
+        if metadata.get("format") != VOICE_FORMAT:
+            return None
+        info = json.loads(metadata.get("info", "{}"))
+        info["name"] = os.path.splitext(os.path.basename(path))[0]
+        info["path"] = path
+        return info
+
+    def list_voices(self):
+        """
+        返回 {音色名: 元数据} 字典，目录未变化时直接返回缓存
+        """
+        with self._lock:
+            try:
+                mtime = os.stat(self.library_dir).st_mtime_ns
+            except OSError:
+                return {}
+            if self._index is not None and self._index_mtime == mtime:
+                return dict(self._index)
+
+            index = {}
+            for file_name in sorted(os.listdir(self.library_dir)):
+                if not file_name.endswith(VOICE_FILE_EXT):
+                    continue
+                path = os.path.join(self.library_dir, file_name)
+                try:
+                    info = self._read_header(path)
+                except Exception as e:
+                    print(f"⚠️ 读取音色文件失败：{path}，{e}")
+                    continue
+                if info:
+                    index[info["name"]] = info
+            self._index = index
+            self._index_mtime = mtime
+            return dict(index)
+
+    def names(self):
+        return list(self.list_voices().keys())
+
+    def get(self, name):
+        return self.list_voices().get(sanitize_voice_name(name))
+
+    def save(self, name, prompt_items, ref_text="", **metadata):
+        """
+        保存克隆提示，返回保存后的音色名
+        """
+        from safetensors.torch import save_file
+
+        voice_name = sanitize_voice_name(name)
+        if not voice_name:
+            raise ValueError("音色名称不能为空")
+
+        tensors, items = serialize_prompt(prompt_items)
+        info = dict(metadata, ref_text=ref_text, created_at=time.strftime("%Y-%m-%d %H:%M:%S"))
+        header = {
+            "format": VOICE_FORMAT,
+            "version": VOICE_FORMAT_VERSION,
+            "items": json.dumps(items, ensure_ascii=False),
+            "info": json.dumps(info, ensure_ascii=False),
+        }
+
+        os.makedirs(self.library_dir, exist_ok=True)
+        path = self._path(voice_name)
+        tmp = f"{path}.tmp"
+        save_file(tensors, tmp, metadata=header)
+        os.replace(tmp, path)
+        with self._lock:
+            self._index = None
+        return voice_name
+
+    def load(self, name, device="cpu"):
+        """
+        以内存映射方式读取克隆提示并直接放到目标设备，返回 (克隆提示列表, 元数据)
+        """
+        from safetensors import safe_open
+
+        path = self._path(name)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"音色不存在：{name}")
+
+        with safe_open(path, framework="pt", device=str(device)) as f:
+            metadata = f.metadata() or {}
+            if metadata.get("format") != VOICE_FORMAT:
+                raise ValueError(f"不是有效的音色文件：{path}")
+            tensors = {key: f.get_tensor(key) for key in f.keys()}
+        items = json.loads(metadata["items"])
+        info = json.loads(metadata.get("info", "{}"))
+        return deserialize_prompt(tensors, items), info
+
+    def fingerprint(self, name):
+        """
+        音色文件内容的短哈希，用于合成结果缓存键（同名音色被覆盖后缓存自动失效）
+        """
+        path = self._path(name)
+        if not os.path.isfile(path):
+            return None
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()[:16]
+
+    def delete(self, name):
+        path = self._path(name)
+        if os.path.isfile(path):
+            os.remove(path)
+        with self._lock:
+            self._index = None
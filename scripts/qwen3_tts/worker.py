@@ -0,0 +1,327 @@
+"""
+Qwen3-TTS 独立推理工作进程
+模型加载与生成在单独的子进程中执行，请求通过管道发送，生成的波形通过共享内存返回，
+避免经由管道序列化大数组；结束工作进程即可立即回收其占用的全部内存和显存
+
+本文件既是 WebUI 侧的客户端模块，也是工作进程的入口脚本（python worker.py <地址> <密钥>）
+"""
+
+import os
+import sys
+import atexit
+import time
+import uuid
+import tempfile
+import threading
+import subprocess
+from multiprocessing.connection import Client
+
+
+# 工作进程启动后等待其监听管道的超时时间（秒）
+STARTUP_TIMEOUT = 60
+
+
+def _make_address():
+    if sys.platform == "win32":
+        return rf"\\.\pipe\qwen3-tts-worker-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    return os.path.join(tempfile.gettempdir(), f"qwen3-tts-worker-{uuid.uuid4().hex[:8]}.sock")
+
+
+def _attach_shared_memory(name):
+    """
+    附加到工作进程创建的共享内存
+    POSIX 上 Python 3.13 之前附加方也会登记到 resource_tracker，退出时误删或告警，这里取消登记
+    """
+    from multiprocessing import shared_memory
+
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name == "posix":
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+    return shm
+
+
+class TTSWorker:
+    """
+    工作进程客户端：负责启动、请求转发和结束工作进程
+    """
+
+    def __init__(self):
+        self.process = None
+        self.conn = None
+        self._lock = threading.Lock()
+        self._atexit_registered = False
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        if self.alive:
+            return
+        address = _make_address()
+        authkey = os.urandom(16)
+        extension_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        env = dict(os.environ)
+        env["PYTHONPATH"] = extension_root + os.pathsep + env.get("PYTHONPATH", "")
+
+        print(f"正在启动 Qwen3-TTS 工作进程...")
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), address, authkey.hex()],
+            env=env
+        )
+
+        deadline = time.time() + STARTUP_TIMEOUT
+        while True:
+            if not self.alive:
+                raise RuntimeError(f"TTS 工作进程启动失败（退出码：{self.process.returncode}）")
+            try:
+                self.conn = Client(address, authkey=authkey)
+                break
+            except (FileNotFoundError, ConnectionRefusedError, OSError):
+                if time.time() > deadline:
+                    self.kill()
+                    raise RuntimeError("等待 TTS 工作进程启动超时")
+                time.sleep(0.2)
+        if not self._atexit_registered:
+            # 重启工作进程时不重复登记，kill() 总是结束当前的进程
+            atexit.register(self.kill)
+            self._atexit_registered = True
+        print(f"✓ Qwen3-TTS 工作进程已启动（PID：{self.process.pid}）")
+
+    def request(self, op, blocking=True, **payload):
+        """
+        发送请求并等待结果，工作进程返回错误时抛出 RuntimeError（保留原始错误信息，便于识别显存不足）
+        工作进程一次只处理一个请求；blocking 为 False 时若有请求正在进行（如生成中）立即返回 None
+        """
+        if not self._lock.acquire(blocking=blocking):
+            return None
+        try:
+            if not self.alive or self.conn is None:
+                raise RuntimeError("TTS 工作进程未运行")
+            try:
+                self.conn.send(dict(payload, op=op))
+                reply = self.conn.recv()
+            except (EOFError, OSError) as e:
+                self.kill()
+                raise RuntimeError(f"TTS 工作进程已退出：{e}") from e
+        finally:
+            self._lock.release()
+        if not reply.get("ok"):
+            raise RuntimeError(reply.get("error", "TTS 工作进程返回未知错误"))
+        return reply
+
+    def kill(self):
+        """
+        结束工作进程，其占用的内存和显存随进程退出立即释放
+        """
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except OSError:
+                pass
+            self.conn = None
+        if self.process is not None:
+            if self.process.poll() is None:
+                self.process.kill()
+                self.process.wait()
+                print(f"✓ 已结束 Qwen3-TTS 工作进程（PID：{self.process.pid}）")
+            self.process = None
+
+
+class RemoteQwen3TTSModel:
+    """
+    工作进程中 Qwen3TTSModel 的代理，提供与之相同的生成接口
+    """
+
+    def __init__(self, worker):
+        self.worker = worker
+        self.seed = None  # 下一次生成使用的随机种子，None 表示随机
+        self.last_memory_usage = {}  # 工作进程忙时 memory_usage 返回的上一次查询结果
+
+    @classmethod
+    def start(cls, model_path, cpu_options=None, load_options=None):
+        worker = TTSWorker()
+        worker.start()
+        try:
+            worker.request("load", model_path=model_path, cpu_options=cpu_options, load_options=load_options)
+        except Exception:
+            worker.kill()
+            raise
+        return cls(worker)
+
+    @property
+    def alive(self):
+        return self.worker.alive
+
+    def _generate(self, method, kwargs):
+        import numpy as np
+
+        reply = self.worker.request("generate", method=method, kwargs=kwargs, seed=self.seed)
+        shm = _attach_shared_memory(reply["shm"])
+        try:
+            buffer = np.ndarray((sum(reply["lengths"]),), dtype=reply["dtype"], buffer=shm.buf)
+            wavs = []
+            offset = 0
+            for length in reply["lengths"]:
+                # 从共享内存复制出独立数组，随后即可关闭映射
+                wavs.append(buffer[offset:offset + length].copy())
+                offset += length
+            del buffer
+        finally:
+            shm.close()
+        return wavs, reply["sr"]
+
+    def generate_voice_clone(self, **kwargs):
+        return self._generate("generate_voice_clone", kwargs)
+
+    def generate_custom_voice(self, **kwargs):
+        return self._generate("generate_custom_voice", kwargs)
+
+    def generate_voice_design(self, **kwargs):
+        return self._generate("generate_voice_design", kwargs)
+
+    def create_voice_clone_prompt(self, **kwargs):
+        """
+        在工作进程中计算克隆提示，张量以 CPU 副本经管道返回（体积很小）
+        """
+        return self.worker.request("clone_prompt", kwargs=kwargs)["prompt"]
+
+    def memory_usage(self):
+        """
+        查询工作进程的显存与常驻内存占用，返回 {设备: 字节数}
+        由模型驻留管理器在预留显存、生成报告时调用，不等待进行中的生成：工作进程忙时返回上一次的查询结果
+        """
+        try:
+            reply = self.worker.request("memory", blocking=False)
+        except RuntimeError:
+            return {}
+        if reply is not None:
+            self.last_memory_usage = reply["usage"]
+        return self.last_memory_usage
+
+    def shutdown(self):
+        self.worker.kill()
+
+
+# ---------------------------------------------------------------------------
+# 工作进程侧
+# ---------------------------------------------------------------------------
+
+def _process_rss():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class _WorkerState:
+    def __init__(self):
+        self.model = None
+        self.pending_shm = None
+
+    def release_pending(self):
+        # 客户端在收到下一次请求前已完成复制，此时可以关闭并删除上一次的共享内存
+        if self.pending_shm is not None:
+            self.pending_shm.close()
+            self.pending_shm.unlink()
+            self.pending_shm = None
+
+    def handle(self, request):
+        op = request.get("op")
+        if op == "load":
+            from scripts.qwen3_tts.loading import load_qwen_tts_model
+            self.model = None
+            self.model = load_qwen_tts_model(request["model_path"], request.get("cpu_options"), request.get("load_options"))
+            return {"ok": True}
+
+        if op == "generate":
+            return self._generate(request)
+
+        if op == "clone_prompt":
+            import torch
+            from scripts.qwen3_tts.voice_library import prompt_to_device
+            if self.model is None:
+                return {"ok": False, "error": "工作进程中尚未加载模型"}
+            with torch.no_grad():
+                prompt = self.model.create_voice_clone_prompt(**request["kwargs"])
+            return {"ok": True, "prompt": prompt_to_device(prompt, "cpu")}
+
+        if op == "memory":
+            import torch
+            usage = {}
+            if torch.cuda.is_available():
+                usage[f"cuda:{torch.cuda.current_device()}"] = torch.cuda.memory_allocated()
+            rss = _process_rss()
+            if rss is not None:
+                usage["cpu (RSS)"] = rss
+            return {"ok": True, "usage": usage}
+
+        return {"ok": False, "error": f"未知请求：{op}"}
+
+    def _generate(self, request):
+        import numpy as np
+        import torch
+        from multiprocessing import shared_memory
+
+        if self.model is None:
+            return {"ok": False, "error": "工作进程中尚未加载模型"}
+
+        if request.get("seed") is not None:
+            torch.manual_seed(int(request["seed"]))
+
+        kwargs = request["kwargs"]
+        if kwargs.get("voice_clone_prompt") is not None:
+            # 客户端发送的克隆提示位于 CPU，移动到模型所在设备
+            from scripts.qwen3_tts.voice_library import prompt_to_device, model_device
+            kwargs["voice_clone_prompt"] = prompt_to_device(kwargs["voice_clone_prompt"], model_device(self.model))
+
+        with torch.no_grad():
+            wavs, sr = getattr(self.model, request["method"])(**kwargs)
+
+        arrays = [np.asarray(wav, dtype=np.float32).reshape(-1) for wav in wavs]
+        lengths = [int(a.shape[0]) for a in arrays]
+        shm = shared_memory.SharedMemory(create=True, size=max(1, sum(lengths) * 4))
+        buffer = np.ndarray((sum(lengths),), dtype=np.float32, buffer=shm.buf)
+        offset = 0
+        for a in arrays:
+            buffer[offset:offset + a.shape[0]] = a
+            offset += a.shape[0]
+        del buffer
+        self.pending_shm = shm
+        return {"ok": True, "shm": shm.name, "lengths": lengths, "dtype": "float32", "sr": sr}
+
+
+def _worker_main(address, authkey):
+    from multiprocessing.connection import Listener
+
+    state = _WorkerState()
+    with Listener(address, authkey=authkey) as listener:
+        with listener.accept() as conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    break
+                state.release_pending()
+                try:
+                    reply = state.handle(request)
+                except Exception as e:
+                    import traceback
+                    traceback.print_exc()
+                    reply = {"ok": False, "error": str(e)}
+                conn.send(reply)
+    state.release_pending()
+
+
+if __name__ == "__main__":
+    _worker_main(sys.argv[1], bytes.fromhex(sys.argv[2]))
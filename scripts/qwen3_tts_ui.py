@@ -4,10 +4,36 @@ from modules.paths_internal import default_output_dir
 import os
 import json
 import time
+import uuid
 from pathlib import Path
 import warnings
-import shutil
 import datetime
+import threading
+import atexit
+import contextlib
+
+from scripts.qwen3_tts.transcription_cache import TranscriptionCache, hash_audio_file
+from scripts.qwen3_tts.model_registry import ModelRegistry
+from scripts.qwen3_tts.transcription import (
+    DEFAULT_WHISPER_OPTIONS, AUDIO_EXTENSIONS, list_audio_files, decode_inputs, run_whisper,
+    normalize_options as normalize_whisper_options
+)
+from scripts.qwen3_tts.loading import load_qwen_tts_model, load_time_report, find_weight_files, DEFAULT_LOAD_OPTIONS
+from scripts.qwen3_tts.worker import RemoteQwen3TTSModel
+from scripts.qwen3_tts.script_pipeline import parse_script, assemble_track, FIT_STRETCH, FIT_PAD
+from scripts.qwen3_tts.storyboard_handoff import (
+    locate_storyboard_dir, get_journal, handoff_audio, flush_all as flush_storyboard_journals, STORYBOARDS_PER_PAGE
+)
+from scripts.qwen3_tts.preset_store import PresetStore, PRESET_DEFAULTS
+from scripts.qwen3_tts.voice_library import VoiceLibrary, sanitize_voice_name, model_device
+from scripts.qwen3_tts.reference_audio import ReferenceAudioCache
+from scripts.qwen3_tts.encoding import BackgroundEncoder, OUTPUT_FORMATS
+from scripts.qwen3_tts.postprocess import DEFAULT_POSTPROCESS, process_wav, crossfade_concat
+from scripts.qwen3_tts.cpu_optimize import DEFAULT_CPU_OPTIONS, describe_cpu_options, measure_rtf, restore_default_threads
+from scripts.qwen3_tts.audio_cache import AudioResultCache, make_cache_key, reflink_or_copy
+from scripts.gpu_resources.model_manager import get_model_manager, POLICY_FREE, POLICY_CPU, empty_cuda_cache
+from scripts.qwen3_tts.jobs import JobRegistry, new_request_id, is_cancelled, report_progress, progress_scope
+from scripts.qwen3_tts.profiling import profile_span, traced_request, format_histograms, reset_stats as reset_profile_stats
 
 # 忽略所有与音频处理相关的警告
 warnings.filterwarnings("ignore", category=UserWarning)
@@ -17,6 +43,9 @@ qwen_tts_path = os.path.join(shared.models_path, "qwen3-tts")
 model_dir = qwen_tts_path  # 直接使用 models/qwen3-tts 目录，不需要 checkpoints 子目录
 config_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'qwen3_tts')
 
+# 插件设置文件（放在预设目录之外，避免被当作音色预设列出）
+settings_file = os.path.join(os.path.dirname(config_dir), "qwen3_tts_settings.json")
+
 # 默认输出目录
 default_qwen_tts_output = os.path.join(default_output_dir, "qwen3-tts")
 
@@ -26,161 +55,139 @@ os.makedirs(config_dir, exist_ok=True)
 
 # 全局模型实例
 qwen_tts_model = None
+whisper_pipe = None
+whisper_pipe_model_id = None
+
+# 模型驻留管理（与 LatentSync 共用）：空闲超时后自动卸载，加载前按显存预算卸载最久未使用的模型，显存不足时卸载其他模型重试
+QWEN_TTS_SLOT = "qwen_tts"
+WHISPER_SLOT = "whisper"
+model_manager = get_model_manager()
+
+# 本地未找到模型时按规格估算的显存需求（字节）
+QWEN_TTS_ESTIMATED_BYTES = 5 * 1024 ** 3
+WHISPER_ESTIMATED_BYTES = 512 * 1024 ** 2
+
+def _release_qwen_tts_model():
+    global qwen_tts_model
+    # 工作进程模式下直接结束工作进程，立即回收其全部内存
+    if qwen_tts_model is not None and isinstance(qwen_tts_model["model"], RemoteQwen3TTSModel):
+        qwen_tts_model["model"].shutdown()
+    qwen_tts_model = None
+
+def _release_whisper_pipe():
+    global whisper_pipe
+    whisper_pipe = None
+
+# 模型加载锁，避免后台预加载与生成请求同时加载模型
+qwen_tts_load_lock = threading.Lock()
+
+# 后台预加载状态
+preload_state = {
+    "running": False,
+    "status": ""
+}
+
+def load_tts_settings():
+    """
+    加载插件设置（后台预加载开关、上次使用的模型等）
+    """
+    settings = {
+        "preload_on_start": False,
+        "last_model": "Base",
+        "worker_mode": False,
+        "cpu_options": dict(DEFAULT_CPU_OPTIONS),
+        "whisper_options": dict(DEFAULT_WHISPER_OPTIONS),
+        "load_options": dict(DEFAULT_LOAD_OPTIONS),
+        "vram_budget_gb": 0
+    }
+    try:
+        if os.path.exists(settings_file):
+            with open(settings_file, 'r', encoding='utf-8') as f:
+                settings.update(json.load(f))
+    except Exception as e:
+        print(f"⚠️ 加载 Qwen3-TTS 设置失败：{e}")
+    return settings
+
+def save_tts_settings(**updates):
+    """
+    更新并保存插件设置
+    """
+    settings = load_tts_settings()
+    settings.update(updates)
+    try:
+        with open(settings_file, 'w', encoding='utf-8') as f:
+            json.dump(settings, f, ensure_ascii=False, indent=2)
+    except Exception as e:
+        print(f"⚠️ 保存 Qwen3-TTS 设置失败：{e}")
+    return settings
+
+# Whisper 语音识别默认模型 ID（本地未找到模型时从远程加载）
+WHISPER_MODEL_ID = "openai/whisper-tiny"
+
+# 本地模型登记表（扫描结果按目录修改时间缓存）
+model_registry = ModelRegistry(shared.models_path, model_dir)
+
+# 合成结果缓存（固定随机种子时，相同请求直接复用已生成的音频）
+audio_cache = AudioResultCache(os.path.join(os.path.dirname(config_dir), "qwen3_tts_audio_cache"))
+
+# 参考音频预处理缓存（按原文件内容哈希保存重采样、裁剪后的参考音频）
+reference_cache = ReferenceAudioCache(os.path.join(os.path.dirname(config_dir), "qwen3_tts_reference_cache"))
+
+# 克隆音色库（safetensors 保存的克隆提示，使用时跳过语音识别与参考音频编码）
+voice_library = VoiceLibrary(os.path.join(os.path.dirname(config_dir), "qwen3_tts_voices"))
+
+# 压缩格式后台编码（先返回 WAV 预览，FLAC/Opus/MP3 异步写入输出目录）
+output_encoder = BackgroundEncoder(max_workers=2)
+
+# 退出前将尚未合并的分镜日志写入 storyboard.json
+atexit.register(flush_storyboard_journals)
+
+# 音色预设（SQLite 单文件存储，首次打开时迁移 config/qwen3_tts 下的旧版 JSON 预设）
+preset_store = PresetStore(os.path.join(config_dir, "presets.sqlite"), legacy_dir=config_dir)
+
+# 语音识别结果缓存（持久化到 config/qwen3_tts，重启后依然有效）
+transcription_cache = TranscriptionCache(os.path.join(config_dir, "transcriptions.sqlite"))
 
 def send_audio_to_storyboard(audio_path, description=""):
     """
     将生成的音频发送到分镜助手
+    新分镜追加到日志后立即返回，日志在短暂延迟后批量并入 storyboard.json
     
     Args:
         audio_path: 音频文件路径
         description: 分镜描述（可选）
     
     Returns:
-        dict: {
-            'success': bool,  # 成功标志
-            'message': str,   # 消息
-            'index': int,     # 分镜索引（从 0 开始）
-            'total_count': int,  # 总分镜数
-            'target_page': int   # 应该在第几页显示（最后一页）
-        }
+        str: 状态信息
     """
     try:
-        # 获取分镜数据目录 - 使用多种方法确保路径正确
-        current_file = Path(__file__).resolve()
-        
-        # 方法 1: 通过 workspace 根目录构建
-        workspace_root = current_file.parent.parent.parent
-        data_dir = workspace_root / "sd-webui-MultiModal" / "scripts" / "storyboard_data"
-        
-        # 调试信息
-        print(f"\n[调试] 当前文件：{current_file}")
-        print(f"[调试] workspace_root: {workspace_root}")
-        print(f"[调试] workspace_root 存在：{workspace_root.exists()}")
-        print(f"[调试] 目标数据目录 (方法 1): {data_dir}")
-        
-        # 验证关键目录是否存在
-        multimodal_dir = workspace_root / "sd-webui-MultiModal"
-        scripts_dir = multimodal_dir / "scripts"
-        
-        print(f"[调试] MultiModal 目录：{multimodal_dir}, 存在：{multimodal_dir.exists()}")
-        print(f"[调试] scripts 目录：{scripts_dir}, 存在：{scripts_dir.exists()}")
-        
-        if not multimodal_dir.exists():
-            raise FileNotFoundError(f"❌ sd-webui-MultiModal 扩展目录不存在：{multimodal_dir}\n请确保已安装该扩展")
-        
-        if not scripts_dir.exists():
-            raise FileNotFoundError(f"❌ scripts 目录不存在：{scripts_dir}")
-        
-        # 使用 as_posix() 确保路径分隔符统一，然后创建目录
-        data_dir_str = str(data_dir)
-        print(f"[调试] 目标目录字符串：{data_dir_str}")
-        
-        # 确保目录存在（使用 parents=True 递归创建所有父目录）
-        data_dir.mkdir(parents=True, exist_ok=True)
-        print(f"[调试] ✅ 数据目录已准备就绪：{data_dir}\n")
-        
-        storyboard_file = data_dir / "storyboard.json"
-        
-        # 加载分镜数据
-        def load_storyboard_data():
-            if storyboard_file.exists():
-                try:
-                    with open(storyboard_file, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        if not content.strip():
-                            return []
-                        return json.loads(content)
-                except Exception as e:
-                    print(f"⚠️ 加载分镜数据失败：{e}")
-                    return []
-            return []
-        
-        # 保存分镜数据
-        def save_storyboard_data(data):
-            try:
-                with open(storyboard_file, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
-                return True
-            except Exception as e:
-                print(f"❌ 保存分镜数据失败：{e}")
-                return False
-        
-        # 复制音频文件到分镜临时目录
-        def process_audio_for_storyboard(audio_path):
-            """将音频复制到分镜临时目录"""
-            try:
-                if audio_path is None or not os.path.exists(audio_path):
-                    return None
-                
-                # 复制到临时目录
-                output_dir = data_dir / "temp_audios"
-                output_dir.mkdir(exist_ok=True)
-                
-                timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                output_path = output_dir / f"storyboard_audio_{timestamp}.wav"
-                
-                shutil.copy2(audio_path, output_path)
-                return str(output_path)
-            
-            except Exception as e:
-                print(f"⚠️ 处理音频失败：{e}")
-                import traceback
-                traceback.print_exc()
-                return None
-        
-        # 处理音频
-        processed_path = process_audio_for_storyboard(audio_path)
-        if not processed_path:
-            return "❌ 音频处理失败：无法复制音频文件"
-        
-        # 双重验证：确保 processed_path 是有效的文件路径
-        if not isinstance(processed_path, str) or not os.path.isfile(processed_path):
-            print(f"❌ 路径验证失败：processed_path={processed_path}, 类型={type(processed_path)}")
-            return "❌ 音频处理失败：生成的路径无效"
-        
-        # 加载现有数据
-        storyboard_data = load_storyboard_data()
-        
-        # 计算新的分镜索引
-        new_index = len(storyboard_data)
-        
-        # 添加新的分镜记录（包含音频）
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        new_storyboard = {
-            "id": new_index,
+        if audio_path is None or not os.path.exists(audio_path):
+            return "❌ 音频处理失败：音频文件不存在"
+        
+        # 分镜数据目录只探测一次，之后使用缓存
+        extensions_root = str(Path(__file__).resolve().parent.parent.parent)
+        data_dir = locate_storyboard_dir(extensions_root)
+        
+        # 音频以硬链接/reflink 交给分镜目录，不支持时复制
+        processed_path = handoff_audio(data_dir, audio_path)
+        
+        new_index, total_count = get_journal(data_dir).append({
             "image_path": None,  # 没有图片
-            "audio_path": processed_path,  # 新增音频路径
+            "audio_path": processed_path,
             "aspect_ratio": "16:9 (宽屏)",
             "description": description if description else "",
-            "timestamp": timestamp
-        }
-        
-        storyboard_data.append(new_storyboard)
-        
-        # 保存数据
-        success = save_storyboard_data(storyboard_data)
+            "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        })
         
         # 计算分页信息
-        STORYBOARDS_PER_PAGE = 9  # 每页 9 个宫格
-        total_count = len(storyboard_data)
         target_page = max(1, (total_count + STORYBOARDS_PER_PAGE - 1) // STORYBOARDS_PER_PAGE)
-        
-        if success:
-            return f"✅ 音频已添加到分镜 #{new_index + 1}（第 {target_page} 页）"
-        else:
-            return "❌ 添加失败：无法保存分镜数据"
+        return f"✅ 音频已添加到分镜 #{new_index + 1}（第 {target_page} 页）"
     
     except Exception as e:
         print(f"❌ 发送到分镜失败：{e}")
         import traceback
         traceback.print_exc()
-        return {
-            'success': False,
-            'message': f"❌ 错误：{str(e)}",
-            'index': -1,
-            'total_count': 0,
-            'target_page': 1
-        }
+        return f"❌ 错误：{str(e)}"
 
 def open_output_directory(output_dir_path):
     """
@@ -210,48 +217,58 @@ def open_output_directory(output_dir_path):
         print(error_msg)
         return error_msg
 
-def initialize_qwen_tts_model(model_name):
+def initialize_qwen_tts_model(model_name, cpu_options=None):
     """
-    初始化 Qwen3-TTS 模型
+    初始化 Qwen3-TTS 模型（调用方需持有 qwen_tts_load_lock）
+    cpu_options: 无 CUDA 时的 CPU 优化选项，默认读取插件设置；传入空字典表示不做优化
     """
     global qwen_tts_model
     try:
         import torch
         
+        if cpu_options is None:
+            cpu_options = load_tts_settings().get("cpu_options")
+        if torch.cuda.is_available():
+            cpu_options = {}
+        
         # 在导入 qwen_tts 之前抑制 sox（因为 qwen_tts 可能依赖 sox）
         import warnings
         import logging
         warnings.filterwarnings("ignore", category=UserWarning, module="sox")
         logging.getLogger("sox").setLevel(logging.CRITICAL)
         
-        # 首先检查 qwen_tts 库的兼容性
-        try:
-            from qwen_tts import Qwen3TTSModel
-        except TypeError as e:
-            if "check_model_inputs" in str(e):
-                error_msg = (
-                    "❌ qwen_tts 库兼容性问题！\n\n"
-                    f"错误详情：{str(e)}\n\n"
-                    "解决方案：\n"
-                    "1. 升级 qwen-tts 库到最新版本：\n"
-                    "   pip install --upgrade qwen-tts\n\n"
-                    "2. 如果已最新版，尝试重新安装：\n"
-                    "   pip uninstall -y qwen-tts\n"
-                    "   pip install qwen-tts\n\n"
-                    "3. 检查 Python 版本（推荐 3.10-3.12）：\n"
-                    f"   当前 Python 版本：{torch.__version__ if hasattr(torch, '__version__') else '未知'}\n\n"
-                    "4. 重启 WebUI 后重试"
-                )
-                print(error_msg)
-                return error_msg
-            raise
+        # 独立工作进程模式：模型在子进程中加载，WebUI 进程无需导入 qwen_tts
+        use_worker = load_tts_settings().get("worker_mode", False)
         
-        # 模型映射 - 支持多个版本
+        # 快速加载选项（权重预读、精度缓存、CUDA 推理精度）
+        load_options = dict(DEFAULT_LOAD_OPTIONS, **(load_tts_settings().get("load_options") or {}))
+        
+        if not use_worker:
+            # 首先检查 qwen_tts 库的兼容性
+            try:
+                from qwen_tts import Qwen3TTSModel
+            except TypeError as e:
+                if "check_model_inputs" in str(e):
+                    error_msg = (
+                        "❌ qwen_tts 库兼容性问题！\n\n"
+                        f"错误详情：{str(e)}\n\n"
+                        "解决方案：\n"
+                        "1. 升级 qwen-tts 库到最新版本：\n"
+                        "   pip install --upgrade qwen-tts\n\n"
+                        "2. 如果已最新版，尝试重新安装：\n"
+                        "   pip uninstall -y qwen-tts\n"
+                        "   pip install qwen-tts\n\n"
+                        "3. 检查 Python 版本（推荐 3.10-3.12）：\n"
+                        f"   当前 Python 版本：{torch.__version__ if hasattr(torch, '__version__') else '未知'}\n\n"
+                        "4. 重启 WebUI 后重试"
+                    )
+                    print(error_msg)
+                    return error_msg
+                raise
+        
+        # 远程模型映射 - 仅在本地未找到模型时使用
         model_map = {
-            "Base": {
-                "1.7B": "Qwen/Qwen3-TTS-12Hz-1.7B-Base",
-                "0.6B": "Qwen/Qwen3-TTS-12Hz-0.6B-Base"
-            },
+            "Base": "Qwen/Qwen3-TTS-12Hz-1.7B-Base",
             "CustomVoice": "Qwen/Qwen3-TTS-12Hz-1.7B-CustomVoice",
             "VoiceDesign": "Qwen/Qwen3-TTS-12Hz-1.7B-VoiceDesign"
         }
@@ -259,106 +276,47 @@ def initialize_qwen_tts_model(model_name):
         if model_name not in model_map:
             return f"错误：未知的模型类型 {model_name}"
         
-        # 处理 Base模型的多个版本
-        if model_name == "Base":
-            # 优先检查本地存在的版本
-            base_versions = ["0.6B", "1.7B"]
-            found_version = None
-            
-            for version in base_versions:
-                test_path = os.path.join(model_dir, f"Qwen3-TTS-12Hz-{version}-{model_name}")
-                if os.path.exists(test_path):
-                    found_version = version
-                    remote_model_path = model_map[model_name][version]
-                    print(f"✓ 检测到 Base模型版本：{version}")
-                    break
-            
-            if not found_version:
-                # 默认使用 1.7B
-                remote_model_path = model_map["Base"]["1.7B"]
-                print("未找到本地 Base模型，将尝试加载 1.7B 版本")
-        else:
-            remote_model_path = model_map[model_name]
-        
-        # 检查本地是否有模型 - 增强的路径匹配逻辑
-        local_model_path = os.path.join(model_dir, model_name)
-        
-        # 优先使用本地模型，支持多种目录结构
-        possible_local_paths = []
-        
-        # 根据已确定的 remote_model_path 构建可能的本地路径
-        if isinstance(model_map[model_name], dict):
-            # Base模型有多个版本，需要检查所有版本
-            for version in ["0.6B", "1.7B"]:
-                # 完整 HuggingFace 格式（优先级最高）
-                possible_local_paths.append(os.path.join(model_dir, f"Qwen3-TTS-12Hz-{version}-{model_name}"))
-                # HuggingFace 路径格式转换
-                hf_path = model_map[model_name][version]
-                possible_local_paths.append(os.path.join(model_dir, hf_path.replace("/", "_")))
-                possible_local_paths.append(os.path.join(model_dir, hf_path.replace("/", "--")))
-        else:
-            # 其他单一版本模型
-            # 完整 HuggingFace 格式（优先级最高）
-            possible_local_paths.append(os.path.join(model_dir, f"Qwen3-TTS-12Hz-1.7B-{model_name}"))
-            # HuggingFace 路径格式转换
-            possible_local_paths.append(os.path.join(model_dir, remote_model_path.replace("/", "_")))
-            possible_local_paths.append(os.path.join(model_dir, remote_model_path.replace("/", "--")))
-        
-        # 添加简化格式路径
-        possible_local_paths.extend([
-            local_model_path,
-            os.path.join(model_dir, model_name.lower()),
-            os.path.join(model_dir, f"Qwen3-TTS-{model_name}"),
-        ])
-        
-        found_local = False
-        for path in possible_local_paths:
-            if os.path.exists(path):
-                local_model_path = path
-                found_local = True
-                print(f"✓ 找到本地模型路径：{local_model_path}")
-                break
+        # 从模型登记表中查找本地模型（扫描结果已缓存，无需逐个探测路径）
+        with profile_span("resolve"):
+            local_entry = model_registry.resolve_tts(model_name)
+        found_local = local_entry is not None
         
         if found_local:
-            model_path = local_model_path
+            model_path = local_entry["path"]
+            print(f"✓ 找到本地模型路径：{model_path}（规格：{local_entry['version'] or '未知'}）")
             print(f"将使用本地模型加载")
         else:
-            model_path = remote_model_path
+            model_path = model_map[model_name]
             print(f"警告：本地未找到模型，将尝试从远程加载")
-            print(f"搜索的本地路径：{local_model_path}")
-            print(f"远程模型ID: {remote_model_path}")
-            print(f"\n提示：请确保模型文件在以下目录之一:")
-            for path in possible_local_paths:
-                print(f"  - {path}")
-        
-        print(f"\n正在加载 Qwen3-TTS-{model_name} 模型...")
+            print(f"远程模型ID: {model_path}")
+            print(f"\n提示：请将模型文件放到 {model_dir} 下，例如：")
+            print(f"  - {os.path.join(model_dir, model_path.split('/')[-1])}")
+        
+        # 先释放当前已加载的模型，避免新旧模型同时占用显存；
+        # 其他请求仍在用它生成时先等待其结束，否则卸载（工作进程模式下结束进程）会打断这些请求
+        if qwen_tts_model is not None:
+            model_manager.wait_until_unused(QWEN_TTS_SLOT)
+            print(f"正在卸载 Qwen3-TTS-{qwen_tts_model['name']} 模型...")
+            model_manager.unregister(QWEN_TTS_SLOT)
+            _release_qwen_tts_model()
+            empty_cuda_cache()
+        
+        print(f"\n正在加载 Qwen3-TTS-{model_name} 模型{'（独立工作进程）' if use_worker else ''}...")
         print(f"加载路径：{model_path}")
         
-        # 准备加载参数 - 始终使用离线模式
-        load_kwargs = {
-            "device_map": "cuda:0" if torch.cuda.is_available() else "cpu",
-            "local_files_only": True,  # 优先使用本地文件
-            "low_cpu_mem_usage": True,
-            "use_safetensors": True,
-        }
-        
-        # 仅当 CUDA 可用时设置 dtype 和 attention 实现
-        if torch.cuda.is_available():
-            load_kwargs["torch_dtype"] = torch.bfloat16
-            # 检查是否支持 flash attention
-            try:
-                import flash_attn
-                load_kwargs["attn_implementation"] = "flash_attention_2"
-                print("启用 Flash Attention 2 加速")
-            except ImportError:
-                load_kwargs["attn_implementation"] = "sdpa"
-                print("未检测到 Flash Attention，使用 SDPA 注意力机制")
-        else:
-            load_kwargs["torch_dtype"] = torch.float32
+        # 按权重大小预留显存，超出预算时先卸载最久未使用的其他模型
+        if torch.cuda.is_available() and not use_worker:
+            weight_bytes = sum(os.path.getsize(path) for path in find_weight_files(model_path)) if found_local else 0
+            model_manager.reserve(QWEN_TTS_SLOT, weight_bytes or QWEN_TTS_ESTIMATED_BYTES)
         
         # 加载模型
         try:
-            model = Qwen3TTSModel.from_pretrained(model_path, **load_kwargs)
+            with profile_span("load"):
+                model = model_manager.run_with_oom_retry(
+                    lambda: (RemoteQwen3TTSModel.start(model_path, cpu_options, load_options) if use_worker
+                             else load_qwen_tts_model(model_path, cpu_options, load_options)),
+                    keep=QWEN_TTS_SLOT
+                )
         except Exception as local_load_error:
             # 如果本地加载失败，且找到了本地路径，说明是格式问题
             if found_local:
@@ -379,8 +337,20 @@ def initialize_qwen_tts_model(model_name):
         
         qwen_tts_model = {
             "model": model,
-            "name": model_name
+            "name": model_name,
+            "version": (local_entry["version"] if found_local else None) or "1.7B",
+            "path": model_path,
+            "cpu_options": cpu_options
         }
+        model_manager.register(
+            QWEN_TTS_SLOT,
+            f"Qwen3-TTS-{model_name}",
+            module_getter=lambda: qwen_tts_model["model"] if qwen_tts_model else None,
+            release_fn=_release_qwen_tts_model,
+            memory_fn=model.memory_usage if use_worker else None
+        )
+        
+        save_tts_settings(last_model=model_name)
         
         print(f"\n✓ Qwen3-TTS-{model_name} 模型加载完成！")
         return f"成功加载 Qwen3-TTS-{model_name} 模型"
@@ -398,84 +368,291 @@ def initialize_qwen_tts_model(model_name):
         traceback.print_exc()
         return error_msg
 
+def _ensure_qwen_tts_model_locked(model_name):
+    # 调用方需持有 qwen_tts_load_lock
+    # 工作进程意外退出时视为模型未加载
+    if qwen_tts_model is not None and not getattr(qwen_tts_model["model"], "alive", True):
+        print("⚠️ Qwen3-TTS 工作进程已退出，将重新加载模型")
+        model_manager.unregister(QWEN_TTS_SLOT)
+        _release_qwen_tts_model()
+    if qwen_tts_model is None or qwen_tts_model["name"] != model_name:
+        msg = initialize_qwen_tts_model(model_name)
+        if not msg.startswith("成功"):
+            return None, msg
+    return qwen_tts_model["model"], None
+
+def ensure_qwen_tts_model(model_name):
+    """
+    确保指定类型的 Qwen3-TTS 模型已加载
+    返回 (模型, 错误信息)：成功时错误信息为 None，失败时模型为 None
+    返回后模型仍可能被其他请求切换，需要用模型生成时请使用 qwen_tts_lease
+    """
+    with qwen_tts_load_lock:
+        return _ensure_qwen_tts_model_locked(model_name)
+
+@contextlib.contextmanager
+def qwen_tts_lease(model_name):
+    """
+    确保指定类型的模型已加载并在加载锁内获取其共享租约，产出 (模型, 错误信息)
+    切换模型的请求持有加载锁并等待现有租约释放，因此租约期间模型不会被替换或卸载
+    """
+    with contextlib.ExitStack() as stack:
+        with qwen_tts_load_lock:
+            model, error = _ensure_qwen_tts_model_locked(model_name)
+            if model is not None:
+                stack.enter_context(model_manager.use(QWEN_TTS_SLOT))
+        yield model, error
+
+def _warmup_qwen_tts_model(model_name):
+    """
+    执行一次极短的生成，完成 CUDA 内核预热
+    Base 模型需要参考音频，仅加载不预热生成
+    """
+    if model_name == "Base":
+        return False
+    
+    import torch
+    
+    with qwen_tts_lease(model_name) as (model, error):
+        if error:
+            return False
+        with torch.no_grad():
+            if model_name == "CustomVoice":
+                model.generate_custom_voice(text="你好。", language="Chinese", speaker="Vivian", instruct="")
+            elif model_name == "VoiceDesign":
+                model.generate_voice_design(text="你好。", language="Chinese", instruct="语气平和的成年女声")
+    return True
+
+def _preload_worker(model_name):
+    try:
+        start_time = time.time()
+        preload_state["status"] = f"⏳ 正在后台加载 Qwen3-TTS-{model_name} 模型..."
+        _, error = ensure_qwen_tts_model(model_name)
+        if error:
+            preload_state["status"] = f"❌ 后台预加载失败：{error}"
+            return
+        
+        preload_state["status"] = f"⏳ 模型已加载，正在预热 Qwen3-TTS-{model_name}..."
+        warmed = _warmup_qwen_tts_model(model_name)
+        elapsed = time.time() - start_time
+        warmup_note = "" if warmed else "（Base 模型需参考音频，未执行预热生成）"
+        preload_state["status"] = f"✅ Qwen3-TTS-{model_name} 已就绪，预加载耗时 {elapsed:.1f} 秒{warmup_note}"
+        print(preload_state["status"])
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        preload_state["status"] = f"❌ 后台预加载失败：{str(e)}"
+    finally:
+        preload_state["running"] = False
+
+def start_background_preload(model_name=None):
+    """
+    在后台线程中加载上次使用的模型并预热，不阻塞 UI 启动
+    """
+    if preload_state["running"]:
+        return preload_state["status"]
+    
+    model_name = model_name or load_tts_settings().get("last_model", "Base")
+    preload_state["running"] = True
+    preload_state["status"] = f"⏳ 准备后台预加载 Qwen3-TTS-{model_name}..."
+    threading.Thread(
+        target=_preload_worker,
+        args=(model_name,),
+        name="qwen3-tts-preload",
+        daemon=True
+    ).start()
+    return preload_state["status"]
+
+def watch_preload_status():
+    """
+    持续输出后台预加载状态，直到预加载结束
+    """
+    if not preload_state["status"]:
+        yield gr.update()
+        return
+    while preload_state["running"]:
+        yield preload_state["status"]
+        time.sleep(1)
+    yield preload_state["status"]
+
+def run_cpu_benchmark(model_name):
+    """
+    测量 CPU 优化前后的实时率：先以 float32、默认线程加载测量，再按当前 CPU 优化设置重新加载测量
+    """
+    import torch
+    
+    if torch.cuda.is_available():
+        return "当前使用 CUDA 推理，CPU 优化不生效"
+    if model_name == "Base":
+        return "Base 模型需要参考音频，请切换到 CustomVoice 或 VoiceDesign 后测量"
+    
+    cpu_options = load_tts_settings().get("cpu_options") or {}
+    results = []
+    # 先取加载锁再取租约，与 qwen_tts_lease 的顺序一致
+    with qwen_tts_load_lock, model_manager.use(QWEN_TTS_SLOT):
+        for label, options in (("优化前", {}), ("优化后", cpu_options)):
+            if not options:
+                # 线程数对整个进程生效，之前的优化加载（或预加载）设置的线程数会影响基线，先恢复默认值
+                restore_default_threads()
+            msg = initialize_qwen_tts_model(model_name, cpu_options=options)
+            if not msg.startswith("成功"):
+                return f"{label}模型加载失败：{msg}"
+            model = qwen_tts_model["model"]
+            _apply_seed(0)
+            # 第一次生成用于预热（包括 torch.compile 编译），第二次为实测
+            measure_rtf(model, model_name)
+            rtf, elapsed, audio_seconds = measure_rtf(model, model_name)
+            results.append((label, options, rtf, elapsed, audio_seconds))
+    
+    lines = [f"Qwen3-TTS-{model_name} CPU 实时率（生成耗时 / 音频时长，越小越快）："]
+    for label, options, rtf, elapsed, audio_seconds in results:
+        lines.append(f"{label}（{describe_cpu_options(options)}）：RTF {rtf:.2f}，耗时 {elapsed:.1f} 秒，音频 {audio_seconds:.1f} 秒")
+    if len(results) == 2 and results[1][2] > 0:
+        lines.append(f"加速比：{results[0][2] / results[1][2]:.2f}x")
+    return "\n".join(lines)
+
+def _whisper_model_id():
+    """
+    返回 (登记表中的本地 Whisper 模型, 模型 ID)
+    已加载的模型优先，否则按登记表中将要加载的模型确定识别缓存的键
+    """
+    whisper_entry = model_registry.resolve_whisper()
+    if whisper_pipe is not None:
+        return whisper_entry, whisper_pipe_model_id
+    if whisper_entry is not None:
+        return whisper_entry, whisper_entry["model_id"]
+    return whisper_entry, WHISPER_MODEL_ID
+
+def _load_whisper_pipe(whisper_entry, whisper_model_id):
+    """
+    加载 Whisper 语音识别管线（调用方需持有 WHISPER_SLOT）
+    """
+    global whisper_pipe, whisper_pipe_model_id
+    
+    import torch
+    from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
+    
+    print("正在加载 Whisper 模型进行语音识别...")
+    
+    # 从模型登记表中查找本地 Whisper 模型（优先使用轻量级规格）
+    use_local = whisper_entry is not None
+    
+    if use_local:
+        local_model_path = whisper_entry["path"]
+        print(f"✓ 找到本地 Whisper 模型：{local_model_path}")
+        print(f"将使用本地模型加载")
+    else:
+        print(f"警告：本地未找到 Whisper 模型，将尝试从远程下载")
+        print(f"远程模型 ID: {whisper_model_id}")
+        print(f"建议手动下载模型到以下位置之一:")
+        print(f"  - {os.path.join(shared.models_path, 'whisper-tiny')}")
+        print(f"  - {os.path.join(shared.models_path, 'whisper', 'whisper-tiny')}")
+        print(f"\n下载地址：https://huggingface.co/openai/whisper-tiny")
+        local_model_path = whisper_model_id
+    
+    # 按权重大小预留显存，超出预算时先卸载最久未使用的其他模型
+    if torch.cuda.is_available():
+        weight_bytes = sum(os.path.getsize(path) for path in find_weight_files(local_model_path)) if use_local else 0
+        model_manager.reserve(WHISPER_SLOT, weight_bytes // 2 or WHISPER_ESTIMATED_BYTES)
+    
+    # 加载处理器和模型
+    print(f"\n正在加载 Whisper 处理器...")
+    processor = AutoProcessor.from_pretrained(
+        local_model_path,
+        local_files_only=use_local,  # 本地模式
+    )
+    
+    print(f"正在加载 Whisper 模型权重...")
+    model = AutoModelForSpeechSeq2Seq.from_pretrained(
+        local_model_path,
+        torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
+        low_cpu_mem_usage=True,
+        use_safetensors=True,
+        local_files_only=use_local,  # 本地模式
+    )
+    
+    if torch.cuda.is_available():
+        model.to("cuda")
+    
+    whisper_pipe = pipeline(
+        "automatic-speech-recognition",
+        model=model,
+        tokenizer=processor.tokenizer,
+        feature_extractor=processor.feature_extractor,
+        torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
+        device="cuda" if torch.cuda.is_available() else "cpu",
+    )
+    whisper_pipe_model_id = whisper_model_id
+    model_manager.register(
+        WHISPER_SLOT,
+        f"Whisper ({whisper_model_id})",
+        module_getter=lambda: whisper_pipe,
+        release_fn=_release_whisper_pipe
+    )
+    print("Whisper 模型加载完成！\n")
+
+def transcribe_files(audio_paths, options=None, progress=None):
+    """
+    批量识别多个音频，返回与 audio_paths 顺序一致的文本列表
+    先批量查询识别缓存，未命中的文件并行解码后按 batch_size 成批送入 Whisper，
+    长音频按 chunk_length_s 分段解码；每组结果在一个事务中写回识别缓存
+    progress(已完成数, 总数) 用于报告进度
+    """
+    options = normalize_whisper_options(options or load_tts_settings().get("whisper_options"))
+    whisper_entry, whisper_model_id = _whisper_model_id()
+    
+    # 优先查询识别缓存，全部命中时无需加载 Whisper
+    hashes = []
+    for path in audio_paths:
+        try:
+            hashes.append(hash_audio_file(path))
+        except OSError as e:
+            print(f"⚠️ 计算音频哈希失败，跳过识别缓存：{e}")
+            hashes.append(None)
+    cached = transcription_cache.get_many([h for h in hashes if h], whisper_model_id)
+    texts = [cached.get(h) if h else None for h in hashes]
+    pending = [i for i, text in enumerate(texts) if text is None]
+    if len(pending) < len(audio_paths):
+        print(f"✓ 命中语音识别缓存：{len(audio_paths) - len(pending)}/{len(audio_paths)} 个文件")
+    if not pending:
+        return texts
+    
+    with model_manager.use(WHISPER_SLOT):
+        if whisper_pipe is None:
+            with profile_span("whisper_load"):
+                _load_whisper_pipe(whisper_entry, whisper_model_id)
+        
+        # 每组解码若干批，限制同时驻留内存的音频数量
+        group_size = options["batch_size"] * 4
+        done = len(audio_paths) - len(pending)
+        for start in range(0, len(pending), group_size):
+            group = pending[start:start + group_size]
+            inputs = decode_inputs([audio_paths[i] for i in group])
+            with profile_span("transcribe"):
+                results = model_manager.run_with_oom_retry(
+                    lambda: run_whisper(whisper_pipe, inputs, options), keep=WHISPER_SLOT
+                )
+            
+            # 写入识别缓存，相同音频再次识别时直接复用
+            entries = {}
+            for i, text in zip(group, results):
+                texts[i] = text
+                if hashes[i] and text:
+                    entries[hashes[i]] = text
+            transcription_cache.put_many(entries, whisper_model_id)
+            
+            done += len(group)
+            if progress:
+                progress(done, len(audio_paths))
+    return texts
+
 def transcribe_audio(audio_path):
     """
     使用 Whisper 自动识别参考音频中的文本
     返回识别的文本内容
     """
     try:
-        import torch
-        from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
-        
-        # 检查是否已有 Whisper 模型实例
-        global whisper_pipe
-        if 'whisper_pipe' not in globals() or whisper_pipe is None:
-            print("正在加载 Whisper 模型进行语音识别...")
-            
-            model_id = "openai/whisper-tiny"  # 使用轻量级模型
-            
-            # 检查本地是否有 Whisper 模型 - 支持多个可能的位置
-            possible_paths = [
-                os.path.join(shared.models_path, "whisper-tiny"),  # models/whisper-tiny
-                os.path.join(shared.models_path, "whisper", "whisper-tiny"),  # models/whisper/whisper-tiny
-                os.path.join(shared.models_path, "ASR", "whisper-tiny"),  # models/ASR/whisper-tiny (通用 ASR 模型目录)
-            ]
-            
-            # 优先使用本地模型
-            use_local = False
-            local_model_path = None
-            
-            for path in possible_paths:
-                if os.path.exists(path):
-                    local_model_path = path
-                    use_local = True
-                    print(f"✓ 找到本地 Whisper 模型：{local_model_path}")
-                    break
-            
-            if not use_local:
-                print(f"警告：本地未找到 Whisper 模型，将尝试从远程下载")
-                print(f"远程模型 ID: {model_id}")
-                print(f"建议手动下载模型到以下位置之一:")
-                for path in possible_paths:
-                    print(f"  - {path}")
-                print(f"\n下载地址：https://huggingface.co/openai/whisper-tiny")
-                local_model_path = model_id
-            else:
-                print(f"将使用本地模型加载")
-            
-            # 加载处理器和模型
-            print(f"\n正在加载 Whisper 处理器...")
-            processor = AutoProcessor.from_pretrained(
-                local_model_path,
-                local_files_only=use_local,  # 本地模式
-            )
-            
-            print(f"正在加载 Whisper 模型权重...")
-            model = AutoModelForSpeechSeq2Seq.from_pretrained(
-                local_model_path,
-                torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-                low_cpu_mem_usage=True,
-                use_safetensors=True,
-                local_files_only=use_local,  # 本地模式
-            )
-            
-            if torch.cuda.is_available():
-                model.to("cuda")
-            
-            whisper_pipe = pipeline(
-                "automatic-speech-recognition",
-                model=model,
-                tokenizer=processor.tokenizer,
-                feature_extractor=processor.feature_extractor,
-                torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-                device="cuda" if torch.cuda.is_available() else "cpu",
-            )
-            print("Whisper 模型加载完成！\n")
-        
-        # 执行语音识别
-        result = whisper_pipe(audio_path)
-        recognized_text = result["text"].strip()
-        
+        recognized_text = transcribe_files([audio_path])[0]
         print(f"语音识别结果：{recognized_text}")
         return recognized_text
         
@@ -489,188 +666,540 @@ def transcribe_audio(audio_path):
         print("3. 重启 WebUI 后重试")
         return ""
 
-def generate_speech_base(text, language, ref_audio_path, ref_text, output_dir, use_batch_mode=False, auto_transcribe=False):
+def transcribe_folder(folder, recursive=False, batch_size=DEFAULT_WHISPER_OPTIONS["batch_size"],
+                      chunk_length_s=DEFAULT_WHISPER_OPTIONS["chunk_length_s"], progress=gr.Progress()):
     """
-    Base 模型 - 语音克隆功能
-    支持单次和批量推理，支持自动语音识别
+    批量识别文件夹中的音频并写入识别缓存（之后用这些音频克隆或保存音色时无需再次识别）
+    返回识别结果列表文本
     """
-    global qwen_tts_model
-    
-    if qwen_tts_model is None or qwen_tts_model["name"] != "Base":
-        msg = initialize_qwen_tts_model("Base")
-        if not msg.startswith("成功"):
-            return None, msg
+    folder = (folder or "").strip().strip('"')
+    if not folder or not os.path.isdir(folder):
+        return f"错误：文件夹不存在：{folder}"
     
     try:
+        audio_paths = list_audio_files(folder, recursive=recursive)
+        if not audio_paths:
+            return f"文件夹中没有音频文件（支持 {'、'.join(AUDIO_EXTENSIONS)}）"
+        
+        options = {"batch_size": int(batch_size), "chunk_length_s": int(chunk_length_s)}
+        save_tts_settings(whisper_options=options)
+        
+        start_time = time.time()
+        progress(0, desc=f"正在识别 {len(audio_paths)} 个音频...")
+        texts = transcribe_files(
+            audio_paths, options,
+            progress=lambda done, total: progress(done / total, desc=f"已识别 {done}/{total}")
+        )
+        elapsed = time.time() - start_time
+        
+        lines = [f"✓ 已识别 {len(audio_paths)} 个音频，耗时 {elapsed:.1f} 秒，结果已写入识别缓存"]
+        for path, text in zip(audio_paths, texts):
+            lines.append(f"{os.path.relpath(path, folder)}\t{text or '（未识别到文本）'}")
+        return "\n".join(lines)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return f"批量识别失败：{str(e)}"
+
+def _apply_seed(seed):
+    """
+    固定随机种子（seed < 0 表示随机）
+    """
+    seed = int(seed) if seed is not None and seed >= 0 else None
+    model = qwen_tts_model["model"] if qwen_tts_model else None
+    if isinstance(model, RemoteQwen3TTSModel):
+        # 工作进程模式下由工作进程在生成前设置种子
+        model.seed = seed
+    elif seed is not None:
         import torch
-        import soundfile as sf
+        torch.manual_seed(seed)
+
+def _audio_cache_key(model_type, seed, **fields):
+    """
+    计算合成结果缓存键
+    随机种子的请求每次结果不同，不使用缓存；模型规格取自模型登记表，命中缓存时无需加载模型
+    """
+    if seed is None or seed < 0:
+        return None
+    entry = model_registry.resolve_tts(model_type)
+    version = (entry["version"] if entry else None) or "1.7B"
+    return make_cache_key(model_type=model_type, version=version, seed=int(seed), **fields)
+
+def _output_stamp():
+    """
+    输出文件名中的时间戳加随机后缀，同一秒内的多次生成（如连续命中缓存）不会重名
+    """
+    return f"{int(time.time())}_{uuid.uuid4().hex[:8]}"
+
+def _load_cached_audio(cache_key, output_dir, prefix):
+    """
+    命中合成结果缓存时将缓存文件复制（或 reflink）到输出目录，返回 (文件列表, 状态信息)；未命中返回 None
+    """
+    if cache_key is None:
+        return None
+    with profile_span("cache"):
+        cached_files = audio_cache.get(cache_key)
+        if not cached_files:
+            return None
+        
+        os.makedirs(output_dir, exist_ok=True)
+        timestamp = _output_stamp()
+        output_files = []
+        for i, path in enumerate(cached_files):
+            suffix = f"_{i}" if len(cached_files) > 1 else ""
+            output_filename = os.path.join(output_dir, f"{prefix}_{timestamp}{suffix}.wav")
+            output_files.append(reflink_or_copy(path, output_filename))
+    
+    print(f"♻️ 命中语音合成缓存：{cache_key[:12]}")
+    if len(output_files) > 1:
+        return output_files, f"♻️ 已复用缓存结果（相同请求与种子），{len(output_files)} 个文件已保存到：{output_dir}"
+    return output_files, f"♻️ 已复用缓存结果（相同请求与种子），已保存到：{output_files[0]}"
+
+def _store_cached_audio(cache_key, output_files, sr, **metadata):
+    if cache_key is None:
+        return
+    metadata.update({"sample_rate": sr, "created_at": time.strftime("%Y-%m-%d %H:%M:%S")})
+    audio_cache.put(cache_key, output_files, metadata)
+
+def encode_outputs(output_files, output_format="WAV", bitrate=96, keep_wav=False):
+    """
+    将输出文件提交后台编码，返回 (预览文件列表, 状态说明)
+    WAV 格式直接返回原文件
+    """
+    if not output_files or output_format == "WAV":
+        return output_files, ""
+    previews, targets = output_encoder.submit_all(output_files, output_format, int(bitrate), keep_wav)
+    target_dir = os.path.dirname(targets[0])
+    return previews, f"正在后台编码 {len(targets)} 个 {output_format} 文件到：{target_dir}"
+
+def _postprocess_cache_fields(postprocess):
+    """
+    影响单个输出音频的后处理选项（拼接在调用方完成，不影响缓存内容）
+    """
+    if not postprocess:
+        return None
+    fields = {}
+    if postprocess.get("normalize"):
+        fields["target_lufs"] = float(postprocess.get("target_lufs", DEFAULT_POSTPROCESS["target_lufs"]))
+    if postprocess.get("trim_silence"):
+        fields["silence_db"] = float(postprocess.get("silence_db", DEFAULT_POSTPROCESS["silence_db"]))
+    return fields or None
+
+def _postprocess_wavs(wavs, sr, postprocess):
+    """
+    对生成的每个音频执行静音裁剪与响度归一化
+    """
+    if not _postprocess_cache_fields(postprocess):
+        return wavs
+    with profile_span("postprocess"):
+        return [process_wav(wav, sr, postprocess) for wav in wavs]
+
+def concat_output_files(output_files, output_dir, prefix, crossfade_ms=DEFAULT_POSTPROCESS["crossfade_ms"]):
+    """
+    将批量输出按顺序交叉淡化拼接为一个文件，返回拼接文件路径
+    """
+    import soundfile as sf
+    
+    segments = []
+    sr = None
+    for path in output_files:
+        data, file_sr = sf.read(path, dtype="float32")
+        if data.ndim > 1:
+            data = data.mean(axis=1)
+        if sr is not None and file_sr != sr:
+            raise ValueError(f"采样率不一致，无法拼接：{path}")
+        segments.append(data)
+        sr = file_sr
+    
+    joined = crossfade_concat(segments, sr, crossfade_ms)
+    output_filename = os.path.join(output_dir, f"{prefix}_{_output_stamp()}_joined.wav")
+    sf.write(output_filename, joined, sr)
+    return output_filename
+
+# 进行中的界面生成任务（取消与重复请求合并）
+generation_jobs = JobRegistry()
+# 合并到其他页面相同任务中的请求被取消时的提示（任务本身继续为其他页面生成）
+CANCELLED_WAITER_MESSAGE = "⏹️ 已取消本次请求（其他页面的相同任务仍在继续生成）"
+
+# 批量生成时每次前向的最大句数，块之间报告进度并响应取消
+GENERATION_CHUNK_SIZE = 8
+
+def _generate_in_chunks(generate_fn, text, desc, **kwargs):
+    """
+    分块调用模型生成：text 为列表时每块最多 GENERATION_CHUNK_SIZE 句，
+    与 text 等长的列表参数随之切分，其余参数原样传入；每块完成后报告进度，
+    用户取消时在当前块完成后停止
+    返回 (wavs, sr, 是否被取消)
+    """
+    texts = text if isinstance(text, list) else None
+    total = len(texts) if texts else 1
+    wavs = []
+    sr = None
+    for start in range(0, total, GENERATION_CHUNK_SIZE):
+        if is_cancelled():
+            return wavs, sr, True
+        end = min(start + GENERATION_CHUNK_SIZE, total)
+        report_progress(start / total, f"{desc}：第 {start + 1}-{end} / {total} 句" if texts else desc)
+        if texts:
+            chunk_kwargs = {key: value[start:end] if isinstance(value, list) and len(value) == total else value
+                            for key, value in kwargs.items()}
+            chunk_kwargs["text"] = texts[start:end]
+        else:
+            chunk_kwargs = dict(kwargs, text=text)
+        with profile_span("generate"):
+            chunk_wavs, sr = model_manager.run_with_oom_retry(lambda: generate_fn(**chunk_kwargs), keep=QWEN_TTS_SLOT)
+        wavs.extend(chunk_wavs)
+    report_progress(1.0, f"{desc}：完成")
+    return wavs, sr, False
+
+def _cancel_note(cancelled, wavs, text):
+    if not cancelled:
+        return ""
+    total = len(text) if isinstance(text, list) else 1
+    return f"\n⏹️ 已取消：只生成了前 {len(wavs)} / {total} 句"
+
+# 音色库下拉框中表示"不使用音色库"的选项
+NO_LIBRARY_VOICE = "【无】使用参考音频"
+
+def _selected_voice(voice_choice):
+    return voice_choice if voice_choice and voice_choice != NO_LIBRARY_VOICE else None
+
+def _prepare_reference(ref_audio_path, ref_text, auto_transcribe, preprocess_ref):
+    """
+    预处理参考音频并在需要时自动识别参考文本，返回 (参考音频路径, 参考文本)；识别失败时参考文本为空
+    """
+    # 手动输入的参考文本对应完整音频，此时只裁剪首尾静音，不截取窗口
+    if preprocess_ref and ref_audio_path:
+        try:
+            with profile_span("reference"):
+                ref_audio_path = reference_cache.prepare(
+                    ref_audio_path, crop=bool(auto_transcribe and not ref_text.strip())
+                )
+        except Exception as e:
+            print(f"⚠️ 参考音频预处理失败，使用原始音频：{e}")
+    
+    # 如果启用自动识别且未提供参考文本，则自动识别
+    actual_ref_text = ref_text
+    if auto_transcribe and not ref_text.strip():
+        print("正在自动识别参考音频文本...")
+        actual_ref_text = transcribe_audio(ref_audio_path)
+        if actual_ref_text:
+            print(f"✓ 自动识别文本：{actual_ref_text}")
+    return ref_audio_path, actual_ref_text
+
+def _load_voice_prompt(voice_name, model):
+    """
+    从音色库读取克隆提示；进程内模型直接映射到模型所在设备，工作进程模式下读到 CPU 后随请求发送
+    """
+    device = "cpu" if isinstance(model, RemoteQwen3TTSModel) else model_device(model)
+    start_time = time.time()
+    with profile_span("reference"):
+        voice_prompt, voice_info = voice_library.load(voice_name, device=device)
+    print(f"✓ 已加载音色 {voice_name}，耗时 {(time.time() - start_time) * 1000:.0f} 毫秒")
+    return voice_prompt, voice_info
+
+@traced_request
+def save_cloned_voice(voice_name, ref_audio_path, ref_text, auto_transcribe=True, preprocess_ref=True):
+    """
+    由参考音频计算克隆提示并保存到音色库，返回 (状态信息, 音色名)
+    """
+    if not voice_name or not sanitize_voice_name(voice_name):
+        return "错误：请输入音色名称", None
+    if not ref_audio_path:
+        return "错误：请先上传参考音频", None
+    if not auto_transcribe and not ref_text.strip():
+        return "错误：请启用自动识别或手动输入参考音频文本", None
+    
+    with qwen_tts_lease("Base") as (model, error):
+        if error:
+            return error, None
         
-        # 如果启用自动识别且未提供参考文本，则自动识别
-        actual_ref_text = ref_text
-        if auto_transcribe and not ref_text.strip():
-            print("正在自动识别参考音频文本...")
-            actual_ref_text = transcribe_audio(ref_audio_path)
+        try:
+            import torch
             
+            source_hash = hash_audio_file(ref_audio_path)
+            prepared_path, actual_ref_text = _prepare_reference(
+                ref_audio_path, ref_text if not auto_transcribe else "", auto_transcribe, preprocess_ref
+            )
             if not actual_ref_text:
-                return None, "语音识别失败，请手动输入参考音频文本"
+                return "语音识别失败，请手动输入参考音频文本", None
             
-            print(f"✓ 自动识别文本：{actual_ref_text}")
-        
-        model = qwen_tts_model["model"]
-        
-        # 打印调试信息
-        print(f"\n=== Base模型生成参数 ===")
-        print(f"文本：{text[:50]}...")
-        print(f"语言：{language}")
-        print(f"参考音频：{ref_audio_path}")
-        print(f"参考文本：{actual_ref_text[:50] if actual_ref_text else 'None'}...")
-        print(f"========================\n")
-        
-        # 生成语音克隆
-        with torch.no_grad():
-            wavs, sr = model.generate_voice_clone(
-                text=text,
-                language=language,
-                ref_audio=ref_audio_path,
-                ref_text=actual_ref_text,
-            )
+            with torch.no_grad(), profile_span("reference"):
+                voice_prompt = model_manager.run_with_oom_retry(lambda: model.create_voice_clone_prompt(
+                    ref_audio=prepared_path,
+                    ref_text=actual_ref_text,
+                ), keep=QWEN_TTS_SLOT)
             
-            # 保存音频文件
-            os.makedirs(output_dir, exist_ok=True)
-            timestamp = int(time.time())
+            saved_name = voice_library.save(
+                voice_name, voice_prompt, ref_text=actual_ref_text,
+                source_audio=os.path.basename(ref_audio_path), source_hash=source_hash,
+                model_version=qwen_tts_model.get("version") or ""
+            )
+            return f"✓ 音色已保存到音色库：{saved_name}\n参考文本：{actual_ref_text}", saved_name
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            return f"保存音色失败：{str(e)}", None
+
+@traced_request
+def generate_speech_base(text, language, ref_audio_path, ref_text, output_dir, use_batch_mode=False, auto_transcribe=False,
+                         seed=-1, use_cache=True, postprocess=None, preprocess_ref=True, voice_name=None,
+                         return_all_files=False):
+    """
+    Base 模型 - 语音克隆功能
+    支持单次和批量推理，支持自动语音识别
+    preprocess_ref 为 True 时先对参考音频重采样、转单声道并裁剪静音；
+    参考文本由自动识别得到时，还会截取语音最密集的 3-10 秒窗口
+    voice_name 指定音色库中的音色时直接使用保存的克隆提示，忽略参考音频与参考文本
+    postprocess 为后处理选项（响度归一化、静音裁剪，见 postprocess.DEFAULT_POSTPROCESS）
+    return_all_files 为 True 时返回全部输出文件列表（供批量调用方使用）
+    """
+    global qwen_tts_model
+    
+    # 固定种子时优先复用缓存结果，命中则无需加载模型
+    cache_key = None
+    if use_cache:
+        if voice_name:
+            reference = {"voice": voice_library.fingerprint(voice_name)}
+        else:
+            reference = {
+                "ref_audio": hash_audio_file(ref_audio_path) if ref_audio_path and os.path.isfile(ref_audio_path) else None,
+                "ref_text": ref_text, "auto_transcribe": bool(auto_transcribe), "preprocess_ref": bool(preprocess_ref),
+            }
+        cache_key = _audio_cache_key("Base", seed, text=text, language=language, batch=bool(use_batch_mode),
+            postprocess=_postprocess_cache_fields(postprocess), **reference)
+        cached = _load_cached_audio(cache_key, output_dir, "speech_base_clone")
+        if cached:
+            output_files, message = cached
+            return (output_files if return_all_files else output_files[0]), message
+    
+    # 缓存未命中才需要 GPU：此时再获取租约，命中缓存的请求不必等待 LatentSync 等独占租约
+    with qwen_tts_lease("Base") as (model, error):
+        if error:
+            return None, error
+        
+        try:
+            import torch
+            import soundfile as sf
             
-            if use_batch_mode and len(wavs) > 1:
-                # 批量模式：保存多个文件
-                output_files = []
-                for i, wav in enumerate(wavs):
-                    output_filename = os.path.join(output_dir, f"speech_base_clone_{timestamp}_{i}.wav")
-                    sf.write(output_filename, wav, sr)
-                    output_files.append(output_filename)
-                return output_files[0], f"批量语音克隆成功！已保存 {len(wavs)} 个文件到：{output_dir}"
+            if voice_name:
+                # 使用音色库中的克隆提示，跳过语音识别和参考音频编码
+                voice_prompt, voice_info = _load_voice_prompt(voice_name, model)
+                if isinstance(text, list) and len(voice_prompt) == 1:
+                    voice_prompt = voice_prompt * len(text)
+                actual_ref_text = voice_info.get("ref_text", "")
+                clone_kwargs = {"voice_clone_prompt": voice_prompt}
+                ref_description = f"音色库：{voice_name}"
             else:
-                # 单次模式：保存一个文件
-                output_filename = os.path.join(output_dir, f"speech_base_clone_{timestamp}.wav")
-                sf.write(output_filename, wavs[0], sr)
-                return output_filename, f"语音克隆成功！已保存到：{output_filename}"
+                ref_audio_path, actual_ref_text = _prepare_reference(ref_audio_path, ref_text, auto_transcribe, preprocess_ref)
+                if not actual_ref_text:
+                    return None, "语音识别失败，请手动输入参考音频文本"
+                clone_kwargs = {"ref_audio": ref_audio_path, "ref_text": actual_ref_text}
+                ref_description = ref_audio_path
             
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return None, f"语音克隆失败：{str(e)}"
+            # 打印调试信息
+            print(f"\n=== Base模型生成参数 ===")
+            print(f"文本：{text[:50]}...")
+            print(f"语言：{language}")
+            print(f"参考音频：{ref_description}")
+            print(f"参考文本：{actual_ref_text[:50] if actual_ref_text else 'None'}...")
+            print(f"========================\n")
+            
+            # 生成语音克隆
+            _apply_seed(seed)
+            with torch.no_grad():
+                wavs, sr, cancelled = _generate_in_chunks(
+                    model.generate_voice_clone, text, "正在生成语音克隆", language=language, **clone_kwargs
+                )
+                if not wavs:
+                    return None, "⏹️ 已取消生成"
+                wavs = _postprocess_wavs(wavs, sr, postprocess)
+                if cancelled:
+                    # 被取消的部分结果不写入缓存
+                    cache_key = None
+                cancel_note = _cancel_note(cancelled, wavs, text)
+                
+                # 保存音频文件
+                with profile_span("write"):
+                    os.makedirs(output_dir, exist_ok=True)
+                    timestamp = _output_stamp()
+                
+                    if use_batch_mode and len(wavs) > 1:
+                        # 批量模式：保存多个文件
+                        output_files = []
+                        for i, wav in enumerate(wavs):
+                            output_filename = os.path.join(output_dir, f"speech_base_clone_{timestamp}_{i}.wav")
+                            sf.write(output_filename, wav, sr)
+                            output_files.append(output_filename)
+                        _store_cached_audio(cache_key, output_files, sr, model="Base", text=text, language=language, ref_text=actual_ref_text)
+                        return (output_files if return_all_files else output_files[0]), f"批量语音克隆成功！已保存 {len(wavs)} 个文件到：{output_dir}" + cancel_note
+                    else:
+                        # 单次模式：保存一个文件
+                        output_filename = os.path.join(output_dir, f"speech_base_clone_{timestamp}.wav")
+                        sf.write(output_filename, wavs[0], sr)
+                        _store_cached_audio(cache_key, [output_filename], sr, model="Base", text=text, language=language, ref_text=actual_ref_text)
+                        return ([output_filename] if return_all_files else output_filename), f"语音克隆成功！已保存到：{output_filename}" + cancel_note
+                
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            return None, f"语音克隆失败：{str(e)}"
 
-def generate_speech_customvoice(text, language, speaker, instruct, output_dir, use_batch_mode=False):
+@traced_request
+def generate_speech_customvoice(text, language, speaker, instruct, output_dir, use_batch_mode=False,
+                                seed=-1, use_cache=True, postprocess=None, return_all_files=False):
     """
     CustomVoice 模型 - 自定义音色功能
     支持 9 种预设说话人和批量推理
+    postprocess 为后处理选项（响度归一化、静音裁剪，见 postprocess.DEFAULT_POSTPROCESS）
+    return_all_files 为 True 时返回全部输出文件列表（供批量调用方使用）
     """
     global qwen_tts_model
     
-    if qwen_tts_model is None or qwen_tts_model["name"] != "CustomVoice":
-        msg = initialize_qwen_tts_model("CustomVoice")
-        if not msg.startswith("成功"):
-            return None, msg
+    # 固定种子时优先复用缓存结果，命中则无需加载模型
+    cache_key = None
+    if use_cache:
+        cache_key = _audio_cache_key("CustomVoice", seed, text=text, language=language, speaker=speaker,
+            instruct=instruct, batch=bool(use_batch_mode), postprocess=_postprocess_cache_fields(postprocess))
+        cached = _load_cached_audio(cache_key, output_dir, "speech_custom")
+        if cached:
+            output_files, message = cached
+            return (output_files if return_all_files else output_files[0]), message
     
-    try:
-        import torch
-        import soundfile as sf
-        
-        model = qwen_tts_model["model"]
-        
-        # 打印调试信息
-        print(f"\n=== CustomVoice 生成参数 ===")
-        print(f"文本：{text[:50]}...")
-        print(f"语言：{language}")
-        print(f"说话人：{speaker}")
-        print(f"语气指令：{instruct}")
-        print(f"========================\n")
+    # 缓存未命中才需要 GPU：此时再获取租约，命中缓存的请求不必等待 LatentSync 等独占租约
+    with qwen_tts_lease("CustomVoice") as (model, error):
+        if error:
+            return None, error
         
-        # 生成自定义音色
-        with torch.no_grad():
-            wavs, sr = model.generate_custom_voice(
-                text=text,
-                language=language,
-                speaker=speaker,
-                instruct=instruct,
-            )
+        try:
+            import torch
+            import soundfile as sf
             
-            # 保存音频文件
-            os.makedirs(output_dir, exist_ok=True)
-            timestamp = int(time.time())
+            # 打印调试信息
+            print(f"\n=== CustomVoice 生成参数 ===")
+            print(f"文本：{text[:50]}...")
+            print(f"语言：{language}")
+            print(f"说话人：{speaker}")
+            print(f"语气指令：{instruct}")
+            print(f"========================\n")
             
-            if use_batch_mode and len(wavs) > 1:
-                # 批量模式：保存多个文件
-                output_files = []
-                for i, wav in enumerate(wavs):
-                    output_filename = os.path.join(output_dir, f"speech_custom_{timestamp}_{i}.wav")
-                    sf.write(output_filename, wav, sr)
-                    output_files.append(output_filename)
-                return output_files[0], f"批量自定义音色成功！已保存 {len(wavs)} 个文件到：{output_dir}"
-            else:
-                # 单次模式：保存一个文件
-                output_filename = os.path.join(output_dir, f"speech_custom_{timestamp}.wav")
-                sf.write(output_filename, wavs[0], sr)
-                return output_filename, f"自定义音色生成成功！已保存到：{output_filename}"
-            
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return None, f"自定义音色生成失败：{str(e)}"
+            # 生成自定义音色
+            _apply_seed(seed)
+            with torch.no_grad():
+                wavs, sr, cancelled = _generate_in_chunks(
+                    model.generate_custom_voice, text, "正在生成自定义音色",
+                    language=language, speaker=speaker, instruct=instruct
+                )
+                if not wavs:
+                    return None, "⏹️ 已取消生成"
+                wavs = _postprocess_wavs(wavs, sr, postprocess)
+                if cancelled:
+                    # 被取消的部分结果不写入缓存
+                    cache_key = None
+                cancel_note = _cancel_note(cancelled, wavs, text)
+                
+                # 保存音频文件
+                with profile_span("write"):
+                    os.makedirs(output_dir, exist_ok=True)
+                    timestamp = _output_stamp()
+                
+                    if use_batch_mode and len(wavs) > 1:
+                        # 批量模式：保存多个文件
+                        output_files = []
+                        for i, wav in enumerate(wavs):
+                            output_filename = os.path.join(output_dir, f"speech_custom_{timestamp}_{i}.wav")
+                            sf.write(output_filename, wav, sr)
+                            output_files.append(output_filename)
+                        _store_cached_audio(cache_key, output_files, sr, model="CustomVoice", text=text, language=language, speaker=speaker, instruct=instruct)
+                        return (output_files if return_all_files else output_files[0]), f"批量自定义音色成功！已保存 {len(wavs)} 个文件到：{output_dir}" + cancel_note
+                    else:
+                        # 单次模式：保存一个文件
+                        output_filename = os.path.join(output_dir, f"speech_custom_{timestamp}.wav")
+                        sf.write(output_filename, wavs[0], sr)
+                        _store_cached_audio(cache_key, [output_filename], sr, model="CustomVoice", text=text, language=language, speaker=speaker, instruct=instruct)
+                        return ([output_filename] if return_all_files else output_filename), f"自定义音色生成成功！已保存到：{output_filename}" + cancel_note
+                
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            return None, f"自定义音色生成失败：{str(e)}"
 
-def generate_speech_voicedesign(text, language, instruct, output_dir, use_batch_mode=False):
+@traced_request
+def generate_speech_voicedesign(text, language, instruct, output_dir, use_batch_mode=False,
+                                seed=-1, use_cache=True, postprocess=None, return_all_files=False):
     """
     VoiceDesign 模型 - 声音设计功能
     支持基于描述的精细控制和批量推理
+    postprocess 为后处理选项（响度归一化、静音裁剪，见 postprocess.DEFAULT_POSTPROCESS）
+    return_all_files 为 True 时返回全部输出文件列表（供批量调用方使用）
     """
     global qwen_tts_model
     
-    if qwen_tts_model is None or qwen_tts_model["name"] != "VoiceDesign":
-        msg = initialize_qwen_tts_model("VoiceDesign")
-        if not msg.startswith("成功"):
-            return None, msg
+    # 固定种子时优先复用缓存结果，命中则无需加载模型
+    cache_key = None
+    if use_cache:
+        cache_key = _audio_cache_key("VoiceDesign", seed, text=text, language=language, instruct=instruct,
+            batch=bool(use_batch_mode), postprocess=_postprocess_cache_fields(postprocess))
+        cached = _load_cached_audio(cache_key, output_dir, "speech_design")
+        if cached:
+            output_files, message = cached
+            return (output_files if return_all_files else output_files[0]), message
     
-    try:
-        import torch
-        import soundfile as sf
-        
-        model = qwen_tts_model["model"]
+    # 缓存未命中才需要 GPU：此时再获取租约，命中缓存的请求不必等待 LatentSync 等独占租约
+    with qwen_tts_lease("VoiceDesign") as (model, error):
+        if error:
+            return None, error
         
-        # 打印调试信息
-        print(f"\n=== VoiceDesign生成参数 ===")
-        print(f"文本：{text[:50]}...")
-        print(f"语言：{language}")
-        print(f"音色描述：{instruct[:100] if instruct else 'None'}...")
-        print(f"===========================\n")
-        
-        # 生成声音设计
-        with torch.no_grad():
-            wavs, sr = model.generate_voice_design(
-                text=text,
-                language=language,
-                instruct=instruct,
-            )
-            
-            # 保存音频文件
-            os.makedirs(output_dir, exist_ok=True)
-            timestamp = int(time.time())
+        try:
+            import torch
+            import soundfile as sf
             
-            if use_batch_mode and len(wavs) > 1:
-                # 批量模式：保存多个文件
-                output_files = []
-                for i, wav in enumerate(wavs):
-                    output_filename = os.path.join(output_dir, f"speech_design_{timestamp}_{i}.wav")
-                    sf.write(output_filename, wav, sr)
-                    output_files.append(output_filename)
-                return output_files[0], f"批量声音设计成功！已保存 {len(wavs)} 个文件到：{output_dir}"
-            else:
-                # 单次模式：保存一个文件
-                output_filename = os.path.join(output_dir, f"speech_design_{timestamp}.wav")
-                sf.write(output_filename, wavs[0], sr)
-                return output_filename, f"声音设计生成成功！已保存到：{output_filename}"
+            # 打印调试信息
+            print(f"\n=== VoiceDesign生成参数 ===")
+            print(f"文本：{text[:50]}...")
+            print(f"语言：{language}")
+            print(f"音色描述：{instruct[:100] if instruct else 'None'}...")
+            print(f"===========================\n")
             
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return None, f"声音设计生成失败：{str(e)}"
+            # 生成声音设计
+            _apply_seed(seed)
+            with torch.no_grad():
+                wavs, sr, cancelled = _generate_in_chunks(
+                    model.generate_voice_design, text, "正在生成声音设计", language=language, instruct=instruct
+                )
+                if not wavs:
+                    return None, "⏹️ 已取消生成"
+                wavs = _postprocess_wavs(wavs, sr, postprocess)
+                if cancelled:
+                    # 被取消的部分结果不写入缓存
+                    cache_key = None
+                cancel_note = _cancel_note(cancelled, wavs, text)
+                
+                # 保存音频文件
+                with profile_span("write"):
+                    os.makedirs(output_dir, exist_ok=True)
+                    timestamp = _output_stamp()
+                
+                    if use_batch_mode and len(wavs) > 1:
+                        # 批量模式：保存多个文件
+                        output_files = []
+                        for i, wav in enumerate(wavs):
+                            output_filename = os.path.join(output_dir, f"speech_design_{timestamp}_{i}.wav")
+                            sf.write(output_filename, wav, sr)
+                            output_files.append(output_filename)
+                        _store_cached_audio(cache_key, output_files, sr, model="VoiceDesign", text=text, language=language, instruct=instruct)
+                        return (output_files if return_all_files else output_files[0]), f"批量声音设计成功！已保存 {len(wavs)} 个文件到：{output_dir}" + cancel_note
+                    else:
+                        # 单次模式：保存一个文件
+                        output_filename = os.path.join(output_dir, f"speech_design_{timestamp}.wav")
+                        sf.write(output_filename, wavs[0], sr)
+                        _store_cached_audio(cache_key, [output_filename], sr, model="VoiceDesign", text=text, language=language, instruct=instruct)
+                        return ([output_filename] if return_all_files else output_filename), f"声音设计生成成功！已保存到：{output_filename}" + cancel_note
+                
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            return None, f"声音设计生成失败：{str(e)}"
 
 def generate_speech(text, language, voice_style, model_choice, output_dir, use_batch_mode=False):
     """
@@ -688,60 +1217,150 @@ def generate_speech(text, language, voice_style, model_choice, output_dir, use_b
     else:
         return None, f"不支持的模型类型：{model_choice}"
 
-def save_voice_preset(preset_name, voice_style, language, model_choice):
+def _read_script_file(script_file):
+    """
+    读取上传的字幕/脚本文件，兼容 UTF-8（含 BOM）和 GBK 编码
+    """
+    path = getattr(script_file, "name", script_file)
+    with open(path, 'rb') as f:
+        raw = f.read()
+    for encoding in ("utf-8-sig", "gbk"):
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return raw.decode("utf-8", errors="ignore")
+
+@traced_request
+def generate_speech_from_script(script_text, script_file, model_type, language, ref_audio, ref_text, auto_transcribe,
+                                speaker, custom_instruct, design_instruct, output_dir, batch_size=4,
+                                fit_mode=FIT_STRETCH, seed=-1, use_cache=True, postprocess=None,
+                                preprocess_ref=True, voice_name=None, progress=gr.Progress()):
     """
-    保存音色预设
+    字幕/脚本配音
+    解析 SRT 字幕或逐行脚本，分批调用 generate_speech_* 合成每句语音，
+    再按字幕起始时间排布并一次性混音为完整音轨
     """
     try:
-        preset_file = os.path.join(config_dir, f"{preset_name}.json")
-        preset_data = {
-            "name": preset_name,
-            "voice_style": voice_style,
-            "language": language,
-            "model": model_choice,
-            "created_at": time.strftime("%Y-%m-%d %H:%M:%S")
-        }
-        
-        with open(preset_file, 'w', encoding='utf-8') as f:
-            json.dump(preset_data, f, ensure_ascii=False, indent=2)
+        import numpy as np
+        import soundfile as sf
         
-        return f"音色预设 '{preset_name}' 保存成功！"
+        content = _read_script_file(script_file) if script_file else (script_text or "")
+        cues = parse_script(content)
+        if not cues:
+            return None, "错误：未解析到任何字幕或脚本句子"
+        
+        if model_type == "Base" and not ref_audio and not voice_name:
+            return None, "错误：Base 模型需要上传参考音频或选择音色库中的音色"
+        if model_type == "VoiceDesign" and not (design_instruct or "").strip():
+            return None, "错误：VoiceDesign 模型需要输入音色描述"
+        
+        seed = int(seed) if seed is not None else -1
+        timestamp = _output_stamp()
+        segment_dir = os.path.join(output_dir, f"script_{timestamp}")
+        batch_size = max(1, int(batch_size))
+        segments = []
+        sr = None
+        
+        for batch_start in range(0, len(cues), batch_size):
+            if is_cancelled():
+                return None, f"⏹️ 已取消字幕配音：已完成 {len(segments)} / {len(cues)} 句，分句音频保存在：{segment_dir}"
+            batch = cues[batch_start:batch_start + batch_size]
+            batch_end = batch_start + len(batch)
+            progress(batch_start / len(cues), desc=f"正在合成第 {batch_start + 1}-{batch_end} / {len(cues)} 句")
+            
+            texts = [cue["text"] for cue in batch]
+            languages = [language] * len(texts)
+            # 每批写入按句号范围命名的子目录，分句文件与字幕序号一一对应，批次之间不会互相覆盖
+            batch_dir = os.path.join(segment_dir, f"{batch_start + 1:04d}-{batch_end:04d}")
+            common = dict(output_dir=batch_dir, use_batch_mode=True, seed=seed,
+                          use_cache=use_cache, postprocess=postprocess, return_all_files=True)
+            with progress_scope(batch_start / len(cues), batch_end / len(cues)):
+                if model_type == "Base":
+                    files, message = generate_speech_base(
+                        texts, languages, ref_audio, ref_text if not auto_transcribe else "",
+                        auto_transcribe=auto_transcribe, preprocess_ref=preprocess_ref, voice_name=voice_name, **common
+                    )
+                elif model_type == "CustomVoice":
+                    instruct_text = custom_instruct.strip() if custom_instruct else ""
+                    files, message = generate_speech_customvoice(
+                        texts, languages, [speaker] * len(texts), [instruct_text] * len(texts), **common
+                    )
+                elif model_type == "VoiceDesign":
+                    files, message = generate_speech_voicedesign(
+                        texts, languages, [design_instruct.strip()] * len(texts), **common
+                    )
+                else:
+                    return None, f"错误：不支持的模型类型 {model_type}"
+            
+            if is_cancelled():
+                return None, f"⏹️ 已取消字幕配音：已完成 {len(segments)} / {len(cues)} 句，分句音频保存在：{segment_dir}"
+            if not files or len(files) != len(texts):
+                return None, f"第 {batch_start + 1}-{batch_end} 句合成失败：{message}"
+            
+            for path in files:
+                data, file_sr = sf.read(path, dtype="float32")
+                if data.ndim > 1:
+                    data = data.mean(axis=1)
+                segments.append(data)
+                sr = file_sr
+        
+        progress(1.0, desc="正在排布时间轴并混音")
+        track, layout = assemble_track(segments, sr, cues, fit_mode)
+        
+        os.makedirs(output_dir, exist_ok=True)
+        output_filename = os.path.join(output_dir, f"speech_script_{timestamp}.wav")
+        sf.write(output_filename, track, sr)
+        
+        stretched = sum(1 for item in layout if item["rate"] > 1.0)
+        delayed = sum(1 for item in layout if item["cue_start"] is not None and item["start"] - item["cue_start"] > 0.05)
+        message = (
+            f"字幕配音完成！共 {len(cues)} 句，音轨时长 {len(track) / sr:.1f} 秒\n"
+            f"加速压缩 {stretched} 句，顺延 {delayed} 句；分句音频保存在：{segment_dir}\n"
+            f"完整音轨已保存到：{output_filename}"
+        )
+        return output_filename, message
+    
     except Exception as e:
-        return f"保存失败：{str(e)}"
+        import traceback
+        traceback.print_exc()
+        return None, f"字幕配音失败：{str(e)}"
 
-def load_voice_presets():
+def save_voice_preset(preset_name, model_choice, language, speaker, instruct, design_instruct):
     """
-    加载已保存的音色预设列表
+    保存音色预设（同名预设会被覆盖）
     """
+    preset_name = (preset_name or "").strip()
+    if not preset_name:
+        return "错误：请输入预设名称"
     try:
-        presets = []
-        if os.path.exists(config_dir):
-            for file in os.listdir(config_dir):
-                if file.endswith('.json'):
-                    preset_name = file[:-5]  # 去掉 .json 后缀
-                    presets.append(preset_name)
-        return presets
+        preset_store.save(
+            preset_name,
+            model=model_choice,
+            language=language,
+            speaker=speaker,
+            instruct=instruct or "",
+            design_instruct=design_instruct or ""
+        )
+        return f"音色预设 '{preset_name}' 保存成功！"
     except Exception as e:
-        return []
+        return f"保存失败：{str(e)}"
+
+def load_voice_presets(query=""):
+    """
+    加载已保存的音色预设名称列表，最近使用的在前，query 非空时按关键词过滤
+    """
+    return preset_store.names(query)
 
 def load_preset_data(preset_name):
     """
-    加载指定音色预设的数据
+    加载指定音色预设的数据，并记录一次使用
     """
-    try:
-        preset_file = os.path.join(config_dir, f"{preset_name}.json")
-        if os.path.exists(preset_file):
-            with open(preset_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            return {
-                "speaker": data.get("speaker", "Vivian"),
-                "instruct": data.get("instruct", ""),
-                "language": data.get("language", "Chinese"),
-                "model": data.get("model", "CustomVoice")
-            }
-        return {"speaker": "Vivian", "instruct": "", "language": "Chinese", "model": "CustomVoice"}
-    except Exception as e:
-        return {"speaker": "Vivian", "instruct": "", "language": "Chinese", "model": "CustomVoice"}
+    data = preset_store.get(preset_name)
+    if data is None:
+        return dict(PRESET_DEFAULTS)
+    preset_store.mark_used(preset_name)
+    return data
 
 def create_qwen3_tts_ui():
     """
@@ -749,6 +1368,15 @@ def create_qwen3_tts_ui():
     """
     import time
     
+    # 启用后台预加载时，在创建标签页时于后台线程加载上次使用的模型
+    tts_settings = load_tts_settings()
+    last_model = tts_settings.get("last_model", "Base")
+    model_manager.configure(budget_bytes=int(float(tts_settings.get("vram_budget_gb", 0)) * 1024 ** 3))
+    if last_model not in ("Base", "CustomVoice", "VoiceDesign"):
+        last_model = "Base"
+    if tts_settings.get("preload_on_start"):
+        start_background_preload(last_model)
+    
     with gr.Blocks(analytics_enabled=False) as ui:
         # 模型选择
         with gr.Row():
@@ -759,12 +1387,22 @@ def create_qwen3_tts_ui():
                     ("CustomVoice - 自定义音色（9 种预设）", "CustomVoice"),
                     ("VoiceDesign - 声音设计（精细控制）", "VoiceDesign")
                 ],
-                value="Base",
+                value=last_model,
                 info="Base: 基础通用 | CustomVoice: 9 种预设音色 | VoiceDesign: 描述生成"
             )
         
+        # 已安装模型（来自模型登记表的缓存扫描结果）
+        with gr.Accordion("📦 已安装模型", open=False):
+            installed_models_info = gr.Textbox(
+                label="本地模型",
+                value=model_registry.describe,
+                lines=3,
+                interactive=False
+            )
+            rescan_models_btn = gr.Button("🔄 重新扫描模型目录", variant="secondary", size="sm")
+        
         # Base 模型专用组件
-        with gr.Group(visible=True) as base_group:
+        with gr.Group(visible=last_model == "Base") as base_group:
             gr.Markdown("### 📢 语音克隆模式（Base）")
             ref_audio_input = gr.Audio(
                 label="参考音频（3 秒左右）", 
@@ -778,15 +1416,39 @@ def create_qwen3_tts_ui():
                     info="启用后将使用 AI 自动识别参考音频中的文字，无需手动输入"
                 )
             
+            preprocess_ref_checkbox = gr.Checkbox(
+                label="✂️ 预处理参考音频",
+                value=True,
+                info="统一采样率与单声道并裁剪静音；自动识别文本时截取语音最清晰的 3-10 秒"
+            )
+            
             ref_text_input = gr.Textbox(
                 label="参考音频文本（可选）",
                 placeholder="如果不启用自动识别，请手动输入参考音频对应的文本内容...",
                 lines=2,
                 info="参考音频中说的内容，用于帮助模型学习音色。启用自动识别后可留空"
             )
+            
+            with gr.Accordion("🗂️ 克隆音色库", open=False):
+                with gr.Row():
+                    voice_library_dropdown = gr.Dropdown(
+                        label="使用已保存的音色",
+                        choices=[NO_LIBRARY_VOICE] + voice_library.names(),
+                        value=NO_LIBRARY_VOICE,
+                        info="选择后直接使用保存的克隆提示，无需参考音频和语音识别"
+                    )
+                    refresh_voices_btn = gr.Button("🔄 刷新", variant="secondary", size="sm")
+                with gr.Row():
+                    voice_name_input = gr.Textbox(
+                        label="音色名称",
+                        placeholder="为当前参考音频的音色命名，例如：旁白_男声"
+                    )
+                    save_voice_btn = gr.Button("💾 保存当前参考音色", variant="secondary")
+                    delete_voice_btn = gr.Button("🗑️ 删除所选音色", variant="stop", size="sm")
+                voice_library_status = gr.Textbox(label="音色库状态", lines=2, interactive=False)
         
         # CustomVoice 模型专用组件
-        with gr.Group(visible=False) as customvoice_group:
+        with gr.Group(visible=last_model == "CustomVoice") as customvoice_group:
             gr.Markdown("### 🎤 自定义音色模式（CustomVoice）")
             speaker_dropdown = gr.Dropdown(
                 label="选择说话人",
@@ -812,7 +1474,7 @@ def create_qwen3_tts_ui():
             )
         
         # VoiceDesign 模型专用组件
-        with gr.Group(visible=False) as voicedesign_group:
+        with gr.Group(visible=last_model == "VoiceDesign") as voicedesign_group:
             gr.Markdown("### 🎨 声音设计模式（VoiceDesign）")
             design_instruct = gr.Textbox(
                 label="音色描述",
@@ -870,9 +1532,71 @@ def create_qwen3_tts_ui():
                     value=False,
                     info="启用后可一次性生成多个音频文件"
                 )
+                
+                with gr.Row():
+                    seed_input = gr.Number(
+                        label="随机种子",
+                        value=-1,
+                        precision=0,
+                        info="-1 为随机；固定种子可复现结果"
+                    )
+                    use_cache_checkbox = gr.Checkbox(
+                        label="♻️ 复用相同请求的结果",
+                        value=True,
+                        info="固定种子时，相同文本与音色直接返回已生成的音频"
+                    )
+                
+                with gr.Row():
+                    output_format = gr.Dropdown(
+                        label="💿 输出格式",
+                        choices=list(OUTPUT_FORMATS.keys()),
+                        value="WAV",
+                        info="压缩格式在后台编码，界面先播放 WAV 预览"
+                    )
+                    output_bitrate = gr.Slider(
+                        label="码率（kbps，Opus/MP3）",
+                        minimum=32, maximum=320, step=16,
+                        value=96
+                    )
+                    keep_wav_checkbox = gr.Checkbox(
+                        label="同时保留 WAV",
+                        value=False
+                    )
+                
+                with gr.Accordion("🎚️ 音频后处理", open=False):
+                    with gr.Row():
+                        pp_normalize = gr.Checkbox(label="响度归一化", value=DEFAULT_POSTPROCESS["normalize"])
+                        pp_target_lufs = gr.Slider(
+                            label="目标响度（LUFS）",
+                            minimum=-30, maximum=-10, step=1,
+                            value=DEFAULT_POSTPROCESS["target_lufs"],
+                            info="EBU R128 广播标准为 -23，网络视频/播客常用 -16"
+                        )
+                    with gr.Row():
+                        pp_trim = gr.Checkbox(label="裁剪首尾静音", value=DEFAULT_POSTPROCESS["trim_silence"])
+                        pp_silence_db = gr.Slider(
+                            label="静音阈值（dBFS）",
+                            minimum=-70, maximum=-20, step=1,
+                            value=DEFAULT_POSTPROCESS["silence_db"]
+                        )
+                    with gr.Row():
+                        pp_concat = gr.Checkbox(
+                            label="批量输出拼接为一个文件",
+                            value=DEFAULT_POSTPROCESS["concat"],
+                            info="仅批量模式生效，按顺序交叉淡化拼接"
+                        )
+                        pp_crossfade = gr.Slider(
+                            label="交叉淡化（毫秒）",
+                            minimum=0, maximum=300, step=10,
+                            value=DEFAULT_POSTPROCESS["crossfade_ms"]
+                        )
         
         # 生成按钮
-        generate_btn = gr.Button("🎵 生成语音", variant="primary", size="lg")
+        with gr.Row():
+            generate_btn = gr.Button("🎵 生成语音", variant="primary", size="lg", scale=4)
+            cancel_btn = gr.Button("⏹️ 取消", variant="secondary", size="lg", scale=1)
+        # 本页面最近一次生成请求的 ID，取消按钮只取消该请求
+        generate_request = gr.State(None)
         
         # 结果展示
         with gr.Row():
@@ -892,6 +1616,76 @@ def create_qwen3_tts_ui():
                     visible=True
                 )
         
+        # 字幕/脚本配音
+        with gr.Accordion("📜 字幕/脚本配音", open=False):
+            gr.Markdown("上传 SRT 字幕或逐行脚本，使用上方选择的模型与音色逐句合成，并按字幕时间拼接为完整音轨")
+            with gr.Row():
+                with gr.Column():
+                    script_file_input = gr.File(
+                        label="字幕/脚本文件（.srt / .txt）",
+                        file_types=[".srt", ".txt"]
+                    )
+                    script_text_input = gr.Textbox(
+                        label="或直接粘贴脚本",
+                        placeholder="1. 第一句台词\n2. 第二句台词\n……（也可直接粘贴 SRT 字幕内容）",
+                        lines=6
+                    )
+                    with gr.Row():
+                        script_batch_size = gr.Slider(
+                            label="每批合成句数",
+                            minimum=1,
+                            maximum=16,
+                            value=4,
+                            step=1,
+                            info="一次推理合成多句，显存不足时调小"
+                        )
+                        script_fit_mode = gr.Radio(
+                            label="超出字幕时长时",
+                            choices=[
+                                ("加速压缩（保持音高）", FIT_STRETCH),
+                                ("顺延后续句子", FIT_PAD)
+                            ],
+                            value=FIT_STRETCH
+                        )
+                    with gr.Row():
+                        script_generate_btn = gr.Button("🎬 生成配音音轨", variant="primary", scale=4)
+                        script_cancel_btn = gr.Button("⏹️ 取消", variant="secondary", scale=1)
+                    script_request = gr.State(None)
+                with gr.Column():
+                    script_audio_output = gr.Audio(label="配音音轨", type="filepath")
+                    script_status = gr.Textbox(label="配音状态", lines=3, interactive=False)
+        
+        # 批量语音识别
+        whisper_options = normalize_whisper_options(tts_settings.get("whisper_options"))
+        with gr.Accordion("📝 批量语音识别", open=False):
+            gr.Markdown("批量识别文件夹中的参考音频并写入识别缓存，之后用这些音频克隆或保存到音色库时无需再次识别")
+            with gr.Row():
+                transcribe_folder_input = gr.Textbox(
+                    label="音频文件夹",
+                    placeholder="例如：D:\\voices\\samples",
+                    scale=3
+                )
+                transcribe_recursive_checkbox = gr.Checkbox(label="包含子文件夹", value=False, scale=1)
+            with gr.Row():
+                whisper_batch_size = gr.Slider(
+                    label="每批分段数",
+                    minimum=1,
+                    maximum=32,
+                    value=whisper_options["batch_size"],
+                    step=1,
+                    info="多个音频（及长音频的分段）合并为一批前向，显存不足时调小"
+                )
+                whisper_chunk_length = gr.Slider(
+                    label="长音频分段长度（秒）",
+                    minimum=0,
+                    maximum=30,
+                    value=whisper_options["chunk_length_s"],
+                    step=1,
+                    info="超过该长度的音频分段识别后拼接；0 表示不分段（超过 30 秒的部分会被截断）"
+                )
+            transcribe_folder_btn = gr.Button("📝 识别文件夹", variant="secondary")
+            transcribe_folder_output = gr.Textbox(label="识别结果", lines=8, interactive=False)
+        
         # 音色预设
         with gr.Accordion("💾 音色预设管理", open=False):
             preset_name_input = gr.Textbox(
@@ -902,13 +1696,133 @@ def create_qwen3_tts_ui():
             
             with gr.Row():
                 save_preset_btn = gr.Button("保存当前配置为预设", variant="secondary")
+                delete_preset_btn = gr.Button("🗑️ 删除所选预设", variant="stop")
             
-            preset_list = gr.Dropdown(
-                label="加载已有预设",
-                choices=[],
-                value=None,
-                info="选择预设将自动填充下方配置"
+            with gr.Row():
+                preset_search = gr.Textbox(
+                    label="搜索预设",
+                    placeholder="按名称、说话人或描述搜索...",
+                    lines=1
+                )
+                preset_list = gr.Dropdown(
+                    label="加载已有预设",
+                    choices=[],
+                    value=None,
+                    info="最近使用的预设排在前面，选择后自动填充模型、语言和音色配置"
+                )
+        
+        # 显存管理
+        with gr.Accordion("🧠 显存管理", open=False):
+            preload_checkbox = gr.Checkbox(
+                label="🚀 启动时后台预加载上次使用的模型",
+                value=tts_settings.get("preload_on_start", False),
+                info="WebUI 启动后在后台加载并预热模型，首次生成无需等待；会提前占用显存"
             )
+            
+            with gr.Row():
+                idle_timeout_slider = gr.Slider(
+                    label="空闲自动卸载（分钟）",
+                    minimum=0,
+                    maximum=120,
+                    value=model_manager.idle_timeout // 60,
+                    step=1,
+                    info="模型空闲超过该时间后自动卸载，为 Stable Diffusion 腾出显存；0 表示不自动卸载"
+                )
+                idle_policy_radio = gr.Radio(
+                    label="空闲处理方式",
+                    choices=[
+                        ("释放模型（下次使用时重新加载）", POLICY_FREE),
+                        ("移至 CPU 内存（下次使用时移回显卡）", POLICY_CPU)
+                    ],
+                    value=model_manager.policy
+                )
+                vram_budget_slider = gr.Slider(
+                    label="显存预算（GB）",
+                    minimum=0,
+                    maximum=80,
+                    value=tts_settings.get("vram_budget_gb", 0),
+                    step=0.5,
+                    info="语音合成、语音识别与 LatentSync 共用；加载模型前超出预算时先卸载最久未使用的模型，0 表示按显卡总显存"
+                )
+            
+            worker_mode_checkbox = gr.Checkbox(
+                label="🧩 在独立工作进程中运行 Qwen3-TTS",
+                value=tts_settings.get("worker_mode", False),
+                info="模型在子进程中加载和生成，显存碎片不影响 Stable Diffusion，崩溃也不会影响 WebUI；卸载时结束进程立即回收全部内存"
+            )
+            
+            load_options = dict(DEFAULT_LOAD_OPTIONS, **(tts_settings.get("load_options") or {}))
+            with gr.Row():
+                load_prefetch_checkbox = gr.Checkbox(
+                    label="⚡ 加载前并行预读权重",
+                    value=load_options["prefetch"],
+                    info="权重文件以内存映射方式加载，预读到页缓存后冷启动更快"
+                )
+                load_shard_cache_checkbox = gr.Checkbox(
+                    label="💽 保留目标精度的权重副本",
+                    value=load_options["shard_cache"],
+                    info="首次加载时将 float32 权重转换为推理精度并缓存，之后直接按目标精度加载；占用额外磁盘空间"
+                )
+                load_dtype_dropdown = gr.Dropdown(
+                    label="CUDA 推理精度",
+                    choices=[("bfloat16", "bfloat16"), ("float16（不支持 bf16 的显卡）", "float16")],
+                    value=load_options["cuda_dtype"]
+                )
+            
+            memory_info = gr.Textbox(
+                label="模型驻留内存",
+                lines=4,
+                interactive=False
+            )
+            
+            with gr.Row():
+                refresh_memory_btn = gr.Button("🔄 刷新占用", variant="secondary")
+                unload_models_btn = gr.Button("🧹 立即卸载全部模型", variant="secondary")
+                clear_audio_cache_btn = gr.Button("🗑️ 清空语音合成缓存", variant="secondary")
+                load_times_btn = gr.Button("📈 加载耗时记录", variant="secondary")
+        
+        # CPU 推理优化（仅在无 CUDA 时生效）
+        cpu_options = dict(DEFAULT_CPU_OPTIONS, **(tts_settings.get("cpu_options") or {}))
+        with gr.Accordion("🖥️ CPU 推理优化", open=False):
+            gr.Markdown("仅在没有可用 CUDA 显卡时生效，修改后下次加载模型时应用")
+            with gr.Row():
+                cpu_int8_checkbox = gr.Checkbox(
+                    label="线性层 int8 动态量化",
+                    value=cpu_options["quantize_int8"],
+                    info="显著降低内存占用并提升速度，音质略有损失"
+                )
+                cpu_compile_checkbox = gr.Checkbox(
+                    label="torch.compile 编译",
+                    value=cpu_options["torch_compile"],
+                    info="首次生成需要编译，编译结果缓存到磁盘供后续复用"
+                )
+                cpu_threads_slider = gr.Slider(
+                    label="推理线程数",
+                    minimum=0,
+                    maximum=max(os.cpu_count() or 1, 1),
+                    value=cpu_options["num_threads"],
+                    step=1,
+                    info="0 表示按物理核心数自动设置"
+                )
+            
+            cpu_benchmark_btn = gr.Button("📊 测量优化前后实时率", variant="secondary")
+            cpu_report = gr.Textbox(
+                label="CPU 优化报告",
+                lines=4,
+                interactive=False
+            )
+        
+        # 分阶段性能统计
+        with gr.Accordion("⏱️ 性能统计", open=False):
+            gr.Markdown("每次生成的各阶段耗时显示在状态信息末尾；这里汇总所有请求的分阶段耗时分布，用于定位慢请求的瓶颈")
+            profile_report = gr.Textbox(
+                label="分阶段耗时直方图",
+                lines=12,
+                interactive=False
+            )
+            with gr.Row():
+                refresh_profile_btn = gr.Button("🔄 刷新统计", variant="secondary")
+                reset_profile_btn = gr.Button("🗑️ 清空统计", variant="secondary")
         
         # 使用说明
         with gr.Accordion("📖 使用说明", open=False):
@@ -925,6 +1839,16 @@ def create_qwen3_tts_ui():
             - 🔍 AI 精准识别，准确率高
             - 🌍 支持多语言自动检测
             - ⚡ 使用轻量级 Whisper-tiny 模型，速度快
+            - 💾 识别结果按音频内容缓存，重复使用同一参考音频时无需再次识别
+            
+            **参考音频预处理**（默认开启）：
+            - 任意采样率、声道数的参考音频统一转换为 24kHz 单声道，并裁剪首尾静音
+            - 自动识别文本时截取语音最密集的 3-10 秒片段；手动输入文本时保留完整内容，避免文本与音频不一致
+            - 处理结果按音频内容缓存，同一参考音频只处理一次
+            
+            **克隆音色库**：
+            - 上传参考音频后输入名称并点击"保存当前参考音色"，音色会保存为 safetensors 文件
+            - 之后在"使用已保存的音色"中选择即可直接生成，无需再上传参考音频，也不再进行语音识别和参考音频编码
             
             ### CustomVoice 模型 - 自定义音色
             1. 从 9 种预设说话人中选择
@@ -944,6 +1868,37 @@ def create_qwen3_tts_ui():
             - 启用"批量模式"复选框
             - 生成的多个音频文件会分别保存
             
+            ### 进度与取消
+            - 生成时进度条按分块（批量模式每 8 句一块、字幕配音每批一块）显示进度
+            - 点击"⏹️ 取消"后在当前分块完成后停止，已完成的部分仍会保存
+            - 生成进行中再次点击相同参数的生成不会重复排队，而是等待并共享同一次生成的结果
+            
+            ### 输出格式
+            - WAV 为无压缩原始音频；FLAC 无损压缩约为 WAV 的一半；Opus/MP3 为有损压缩，体积最小
+            - 选择压缩格式时，生成完成后立即返回 WAV 预览，压缩文件在后台写入输出目录
+            - Opus/MP3 优先使用 ffmpeg 按设定码率编码，未安装 ffmpeg 时使用 libsndfile 编码
+            
+            ### 音频后处理
+            - 响度归一化：按 EBU R128 门限积分响度调整到目标 LUFS，峰值限制在 -1 dBFS
+            - 裁剪首尾静音：去除每段音频开头和结尾低于阈值的静音
+            - 批量拼接：批量模式下将各段按顺序交叉淡化拼接为一个文件，分段文件仍会保留
+            
+            ### 字幕/脚本配音
+            - 上传 SRT 字幕或每行一句的脚本（可带 "1." 编号），使用当前模型与音色逐句合成
+            - 多句合并为一次推理，按字幕起始时间排布；超出字幕时长的句子可加速压缩或顺延
+            
+            ### 批量语音识别
+            - 在"批量语音识别"中选择参考音频文件夹，多个音频合并成批识别，长音频自动分段
+            - 识别结果写入识别缓存，之后使用这些音频时直接复用识别文本
+            
+            ### 结果缓存
+            - 设置固定随机种子后，相同模型、文本、语言与音色的请求会直接复用已生成的音频
+            - 缓存容量超过上限时自动淘汰最久未使用的结果，可在"显存管理"中手动清空
+            
+            ### 性能统计
+            - 状态信息末尾显示本次请求各阶段（模型加载、语音识别、参考音频编码、生成、写文件等）的耗时与显存变化
+            - "性能统计"中查看所有请求的分阶段耗时直方图，找出拖慢请求的阶段
+            
             **提示**：首次生成需要下载模型（约 3-4GB），请耐心等待。
             """)
         
@@ -968,60 +1923,256 @@ def create_qwen3_tts_ui():
         # 生成逻辑
         def on_generate(text, language, model_type, ref_audio, ref_text, 
                        speaker, custom_instruct, design_instruct, 
-                       output_dir, batch_mode, auto_transcribe):
+                       output_dir, batch_mode, auto_transcribe, preprocess_ref, voice_choice, seed, use_cache,
+                       normalize, target_lufs, trim, silence_db, concat, crossfade_ms,
+                       output_format, bitrate, keep_wav, request_id, progress=gr.Progress()):
+            postprocess = build_postprocess(normalize, target_lufs, trim, silence_db, concat, crossfade_ms)
+            concat = bool(batch_mode and concat)
+            
+            def run_job():
+                output_files, message = generate_for_model(text, language, model_type, ref_audio, ref_text,
+                                                           speaker, custom_instruct, design_instruct,
+                                                           output_dir, batch_mode, auto_transcribe, preprocess_ref,
+                                                           voice_choice, seed, use_cache, postprocess,
+                                                           return_all_files=True)
+                if not output_files:
+                    return None, message
+                
+                if concat and len(output_files) > 1:
+                    try:
+                        joined = concat_output_files(output_files, output_dir, f"speech_{model_type.lower()}", crossfade_ms)
+                        output_files = [joined] + output_files
+                        message = f"{message}\n已拼接 {len(output_files) - 1} 段音频：{joined}"
+                    except Exception as e:
+                        message = f"{message}\n拼接失败：{e}"
+                
+                previews, encode_note = encode_outputs(output_files, output_format, bitrate, keep_wav)
+                if encode_note:
+                    message = f"{message}\n{encode_note}"
+                return previews[0], message
+            
+            # 参数完全相同的请求在进行中时合并为同一个任务，不重复占用 GPU
+            job_key = make_cache_key(
+                kind="generate", text=text, language=language, model_type=model_type, ref_audio=ref_audio,
+                ref_text=ref_text, speaker=speaker, custom_instruct=custom_instruct, design_instruct=design_instruct,
+                output_dir=output_dir, batch_mode=bool(batch_mode), auto_transcribe=bool(auto_transcribe),
+                preprocess_ref=bool(preprocess_ref), voice_choice=voice_choice, seed=seed, use_cache=bool(use_cache),
+                postprocess=postprocess, output_format=output_format, bitrate=bitrate, keep_wav=bool(keep_wav)
+            )
+            result, shared_job = generation_jobs.run(job_key, run_job, progress, request_id=request_id)
+            if result is None:
+                return None, CANCELLED_WAITER_MESSAGE
+            preview, message = result
+            if shared_job:
+                message = f"♻️ 相同的生成任务正在进行，已合并为同一次生成\n{message}"
+            return preview, message
+        
+        def on_cancel_generation(request_id):
+            if not request_id or not generation_jobs.cancel(request_id):
+                return "当前没有进行中的生成任务"
+            return "⏹️ 已请求取消本次生成，将在当前分块完成后停止"
+        
+        def build_postprocess(normalize, target_lufs, trim, silence_db, concat, crossfade_ms):
+            return {
+                "normalize": bool(normalize),
+                "target_lufs": float(target_lufs),
+                "trim_silence": bool(trim),
+                "silence_db": float(silence_db),
+                "concat": bool(concat),
+                "crossfade_ms": int(crossfade_ms),
+            }
+        
+        def generate_for_model(text, language, model_type, ref_audio, ref_text,
+                               speaker, custom_instruct, design_instruct,
+                               output_dir, batch_mode, auto_transcribe, preprocess_ref, voice_choice, seed, use_cache,
+                               postprocess, return_all_files=False):
+            seed = int(seed) if seed is not None else -1
             if not text.strip():
                 return None, "错误：请输入要合成的文本"
             
+            # 批量模式：每行作为一句，语言等参数按句展开
+            def per_line(value):
+                return [value] * len(text) if batch_mode else value
+            
+            if batch_mode:
+                text = [line.strip() for line in text.splitlines() if line.strip()]
+            
             if model_type == "Base":
-                if not ref_audio:
-                    return None, "错误：Base 模型需要上传参考音频"
+                voice_name = _selected_voice(voice_choice)
+                if not ref_audio and not voice_name:
+                    return None, "错误：Base 模型需要上传参考音频或选择音色库中的音色"
                 
                 # 如果未启用自动识别且没有手动输入文本，则报错
-                if not auto_transcribe and not ref_text.strip():
+                if not voice_name and not auto_transcribe and not ref_text.strip():
                     return None, "错误：请启用自动识别或手动输入参考音频文本"
                 
                 return generate_speech_base(
                     text=text,
-                    language=language,
+                    language=per_line(language),
                     ref_audio_path=ref_audio,
                     ref_text=ref_text if not auto_transcribe else "",
                     output_dir=output_dir,
                     use_batch_mode=batch_mode,
-                    auto_transcribe=auto_transcribe
+                    auto_transcribe=auto_transcribe,
+                    seed=seed,
+                    use_cache=use_cache,
+                    postprocess=postprocess,
+                    preprocess_ref=preprocess_ref,
+                    voice_name=voice_name,
+                    return_all_files=return_all_files
                 )
             elif model_type == "CustomVoice":
                 instruct_text = custom_instruct.strip() if custom_instruct else ""
                 return generate_speech_customvoice(
                     text=text,
-                    language=language,
-                    speaker=speaker,
-                    instruct=instruct_text,
+                    language=per_line(language),
+                    speaker=per_line(speaker),
+                    instruct=per_line(instruct_text),
                     output_dir=output_dir,
-                    use_batch_mode=batch_mode
+                    use_batch_mode=batch_mode,
+                    seed=seed,
+                    use_cache=use_cache,
+                    postprocess=postprocess,
+                    return_all_files=return_all_files
                 )
             elif model_type == "VoiceDesign":
                 if not design_instruct.strip():
                     return None, "错误：VoiceDesign 模型需要输入音色描述"
                 return generate_speech_voicedesign(
                     text=text,
-                    language=language,
-                    instruct=design_instruct.strip(),
+                    language=per_line(language),
+                    instruct=per_line(design_instruct.strip()),
                     output_dir=output_dir,
-                    use_batch_mode=batch_mode
+                    use_batch_mode=batch_mode,
+                    seed=seed,
+                    use_cache=use_cache,
+                    postprocess=postprocess,
+                    return_all_files=return_all_files
                 )
             else:
                 return None, f"错误：不支持的模型类型 {model_type}"
         
         generate_btn.click(
+            fn=new_request_id, outputs=[generate_request], queue=False
+        ).then(
             fn=on_generate,
             inputs=[
                 text_input, language, model_choice, 
                 ref_audio_input, ref_text_input,
                 speaker_dropdown, custom_instruct, design_instruct,
-                output_dir_display, batch_mode, auto_transcribe_checkbox
+                output_dir_display, batch_mode, auto_transcribe_checkbox, preprocess_ref_checkbox,
+                voice_library_dropdown, seed_input, use_cache_checkbox,
+                pp_normalize, pp_target_lufs, pp_trim, pp_silence_db, pp_concat, pp_crossfade,
+                output_format, output_bitrate, keep_wav_checkbox, generate_request
             ],
             outputs=[audio_output, status_info]
         )
+        cancel_btn.click(fn=on_cancel_generation, inputs=[generate_request], outputs=[status_info], queue=False)
+        
+        def on_script_generate(script_text, script_file, model_type, language, ref_audio, ref_text, auto_transcribe,
+                               speaker, custom_instruct, design_instruct, output_dir, batch_size, fit_mode,
+                               seed, use_cache, normalize, target_lufs, trim, silence_db,
+                               output_format, bitrate, keep_wav, preprocess_ref, voice_choice, request_id,
+                               progress=gr.Progress()):
+            # 字幕配音只对分句做裁剪与归一化，拼接由时间轴排布完成
+            postprocess = build_postprocess(normalize, target_lufs, trim, silence_db, False, 0)
+            
+            def run_job():
+                track_file, message = generate_speech_from_script(
+                    script_text, script_file, model_type, language, ref_audio, ref_text, auto_transcribe,
+                    speaker, custom_instruct, design_instruct, output_dir, batch_size, fit_mode,
+                    seed, use_cache, postprocess, preprocess_ref, _selected_voice(voice_choice),
+                    progress=report_progress
+                )
+                if not track_file:
+                    return None, message
+                # 分句音频仅作中间结果保留为 WAV，只编码完整音轨
+                previews, encode_note = encode_outputs([track_file], output_format, bitrate, keep_wav)
+                return previews[0], f"{message}\n{encode_note}" if encode_note else message
+            
+            job_key = make_cache_key(
+                kind="script", script_text=script_text, script_file=str(script_file) if script_file else None,
+                model_type=model_type, language=language, ref_audio=ref_audio, ref_text=ref_text,
+                auto_transcribe=bool(auto_transcribe), speaker=speaker, custom_instruct=custom_instruct,
+                design_instruct=design_instruct, output_dir=output_dir, batch_size=batch_size, fit_mode=fit_mode,
+                seed=seed, use_cache=bool(use_cache), postprocess=postprocess, output_format=output_format,
+                bitrate=bitrate, keep_wav=bool(keep_wav), preprocess_ref=bool(preprocess_ref), voice_choice=voice_choice
+            )
+            result, shared_job = generation_jobs.run(job_key, run_job, progress, request_id=request_id)
+            if result is None:
+                return None, CANCELLED_WAITER_MESSAGE
+            preview, message = result
+            if shared_job:
+                message = f"♻️ 相同的配音任务正在进行，已合并为同一次生成\n{message}"
+            return preview, message
+        
+        script_generate_btn.click(
+            fn=new_request_id, outputs=[script_request], queue=False
+        ).then(
+            fn=on_script_generate,
+            inputs=[
+                script_text_input, script_file_input, model_choice, language,
+                ref_audio_input, ref_text_input, auto_transcribe_checkbox,
+                speaker_dropdown, custom_instruct, design_instruct,
+                output_dir_display, script_batch_size, script_fit_mode,
+                seed_input, use_cache_checkbox,
+                pp_normalize, pp_target_lufs, pp_trim, pp_silence_db,
+                output_format, output_bitrate, keep_wav_checkbox, preprocess_ref_checkbox, voice_library_dropdown,
+                script_request
+            ],
+            outputs=[script_audio_output, script_status]
+        )
+        script_cancel_btn.click(fn=on_cancel_generation, inputs=[script_request], outputs=[script_status], queue=False)
+        
+        transcribe_folder_btn.click(
+            fn=transcribe_folder,
+            inputs=[transcribe_folder_input, transcribe_recursive_checkbox, whisper_batch_size, whisper_chunk_length],
+            outputs=[transcribe_folder_output]
+        )
+        
+        # 克隆音色库
+        def refresh_voice_choices(selected=None):
+            choices = [NO_LIBRARY_VOICE] + voice_library.names()
+            return gr.update(choices=choices, value=selected if selected in choices else NO_LIBRARY_VOICE)
+        
+        def on_save_voice(voice_name, ref_audio, ref_text, auto_transcribe, preprocess_ref):
+            message, saved_name = save_cloned_voice(voice_name, ref_audio, ref_text, auto_transcribe, preprocess_ref)
+            return message, refresh_voice_choices(saved_name)
+        
+        def on_delete_voice(voice_choice):
+            voice_name = _selected_voice(voice_choice)
+            if not voice_name:
+                return "请先选择要删除的音色", refresh_voice_choices()
+            voice_library.delete(voice_name)
+            return f"✓ 已删除音色：{voice_name}", refresh_voice_choices()
+        
+        def on_voice_selected(voice_choice):
+            voice_name = _selected_voice(voice_choice)
+            if not voice_name:
+                return ""
+            info = voice_library.get(voice_name) or {}
+            return f"音色：{voice_name}（保存于 {info.get('created_at', '未知')}）\n参考文本：{info.get('ref_text', '')}"
+        
+        refresh_voices_btn.click(
+            fn=lambda selected: refresh_voice_choices(selected),
+            inputs=[voice_library_dropdown],
+            outputs=[voice_library_dropdown]
+        )
+        save_voice_btn.click(
+            fn=on_save_voice,
+            inputs=[voice_name_input, ref_audio_input, ref_text_input, auto_transcribe_checkbox, preprocess_ref_checkbox],
+            outputs=[voice_library_status, voice_library_dropdown]
+        )
+        delete_voice_btn.click(
+            fn=on_delete_voice,
+            inputs=[voice_library_dropdown],
+            outputs=[voice_library_status, voice_library_dropdown]
+        )
+        voice_library_dropdown.change(
+            fn=on_voice_selected,
+            inputs=[voice_library_dropdown],
+            outputs=[voice_library_status]
+        )
         
         # 打开输出目录按钮事件
         open_dir_btn.click(
@@ -1041,8 +2192,8 @@ def create_qwen3_tts_ui():
         )
         
         # 预设功能
-        def update_preset_list():
-            presets = load_voice_presets()
+        def update_preset_list(query=""):
+            presets = load_voice_presets(query)
             # 添加"无"选项，用于清空当前选择
             presets_with_none = ["【无】清空选择"] + presets
             return gr.update(choices=presets_with_none, value=None)
@@ -1050,34 +2201,157 @@ def create_qwen3_tts_ui():
         def on_preset_selected(preset_name):
             # 如果选择了"无"或空值，清空所有配置
             if not preset_name or preset_name == "【无】清空选择":
-                return "Vivian", "", "Chinese", "✅ 已清空预设选择"
+                return (gr.update(), PRESET_DEFAULTS["speaker"], "", "", PRESET_DEFAULTS["language"],
+                        "✅ 已清空预设选择")
             
             # 否则加载预设数据
             data = load_preset_data(preset_name)
             return (
-                data.get("speaker", "Vivian"),
-                data.get("instruct", ""),
-                data.get("language", "Chinese"),
+                data["model"],
+                data["speaker"],
+                data["instruct"],
+                data["design_instruct"],
+                data["language"],
                 f"已加载预设：{preset_name}"
             )
         
-        ui.load(fn=update_preset_list, outputs=[preset_list])
+        def on_delete_preset(preset_name, query):
+            if not preset_name or preset_name == "【无】清空选择":
+                return "请先选择要删除的预设", update_preset_list(query)
+            preset_store.delete(preset_name)
+            return f"已删除预设：{preset_name}", update_preset_list(query)
+        
+        ui.load(fn=lambda: update_preset_list(), outputs=[preset_list])
+        
+        # 重新扫描模型目录
+        def on_rescan_models():
+            model_registry.invalidate()
+            return model_registry.describe()
+        
+        rescan_models_btn.click(fn=on_rescan_models, outputs=[installed_models_info])
+        
+        # 显存管理功能
+        def on_idle_settings_change(idle_minutes, policy):
+            model_manager.configure(idle_timeout=int(idle_minutes) * 60, policy=policy)
+            return model_manager.memory_report()
+        
+        def on_unload_models():
+            count = model_manager.evict_all(policy=POLICY_FREE)
+            return f"已卸载 {count} 个模型\n" + model_manager.memory_report()
+        
+        idle_timeout_slider.change(
+            fn=on_idle_settings_change,
+            inputs=[idle_timeout_slider, idle_policy_radio],
+            outputs=[memory_info]
+        )
+        idle_policy_radio.change(
+            fn=on_idle_settings_change,
+            inputs=[idle_timeout_slider, idle_policy_radio],
+            outputs=[memory_info]
+        )
+        
+        def on_vram_budget_change(budget_gb):
+            save_tts_settings(vram_budget_gb=float(budget_gb))
+            model_manager.configure(budget_bytes=int(float(budget_gb) * 1024 ** 3))
+            return model_manager.memory_report()
+        
+        vram_budget_slider.change(fn=on_vram_budget_change, inputs=[vram_budget_slider], outputs=[memory_info])
+        ui.load(fn=model_manager.memory_report, outputs=[memory_info])
+        refresh_memory_btn.click(fn=model_manager.memory_report, outputs=[memory_info])
+        
+        # 后台预加载
+        def on_preload_toggle(enabled):
+            save_tts_settings(preload_on_start=enabled)
+            if enabled:
+                return "已启用后台预加载，下次启动 WebUI 时生效"
+            return "已关闭后台预加载"
+        
+        # 工作进程模式切换：卸载当前模型，下次生成时按新模式加载
+        def on_worker_mode_toggle(enabled):
+            save_tts_settings(worker_mode=enabled)
+            model_manager.evict(QWEN_TTS_SLOT, policy=POLICY_FREE)
+            mode_text = "独立工作进程" if enabled else "WebUI 进程内"
+            return f"已切换为{mode_text}运行，下次生成时重新加载模型\n" + model_manager.memory_report()
+        
+        # CPU 推理优化设置
+        def on_cpu_options_change(quantize_int8, torch_compile, num_threads):
+            options = {
+                "quantize_int8": bool(quantize_int8),
+                "torch_compile": bool(torch_compile),
+                "num_threads": int(num_threads)
+            }
+            save_tts_settings(cpu_options=options)
+            return f"CPU 优化设置已保存：{describe_cpu_options(options)}，下次加载模型时生效"
+        
+        for component in (cpu_int8_checkbox, cpu_compile_checkbox, cpu_threads_slider):
+            component.change(
+                fn=on_cpu_options_change,
+                inputs=[cpu_int8_checkbox, cpu_compile_checkbox, cpu_threads_slider],
+                outputs=[cpu_report]
+            )
+        
+        cpu_benchmark_btn.click(fn=run_cpu_benchmark, inputs=[model_choice], outputs=[cpu_report])
+        
+        def on_reset_profile():
+            reset_profile_stats()
+            return format_histograms()
+        
+        refresh_profile_btn.click(fn=format_histograms, outputs=[profile_report])
+        reset_profile_btn.click(fn=on_reset_profile, outputs=[profile_report])
+        
+        worker_mode_checkbox.change(fn=on_worker_mode_toggle, inputs=[worker_mode_checkbox], outputs=[memory_info])
+        
+        # 快速加载设置
+        def on_load_options_change(prefetch, shard_cache, cuda_dtype):
+            options = {"prefetch": bool(prefetch), "shard_cache": bool(shard_cache), "cuda_dtype": cuda_dtype}
+            save_tts_settings(load_options=options)
+            return "快速加载设置已保存，下次加载模型时生效\n" + load_time_report()
+        
+        for component in (load_prefetch_checkbox, load_shard_cache_checkbox, load_dtype_dropdown):
+            component.change(
+                fn=on_load_options_change,
+                inputs=[load_prefetch_checkbox, load_shard_cache_checkbox, load_dtype_dropdown],
+                outputs=[memory_info]
+            )
+        load_times_btn.click(fn=load_time_report, outputs=[memory_info])
+        
+        preload_checkbox.change(fn=on_preload_toggle, inputs=[preload_checkbox], outputs=[status_info])
+        ui.load(fn=watch_preload_status, outputs=[status_info])
+        unload_models_btn.click(fn=on_unload_models, outputs=[memory_info])
+        
+        def on_clear_audio_cache():
+            count, size = audio_cache.stats()
+            audio_cache.clear()
+            return f"已清空语音合成缓存：{count} 条，{size / 1024 ** 2:.1f} MB"
+        
+        clear_audio_cache_btn.click(fn=on_clear_audio_cache, outputs=[memory_info])
         
         save_preset_btn.click(
-            fn=lambda name, speaker, instruct, lang, model: save_voice_preset(
-                name, speaker, lang, model
-            ),
-            inputs=[preset_name_input, speaker_dropdown, custom_instruct, language, model_choice],
+            fn=save_voice_preset,
+            inputs=[preset_name_input, model_choice, language, speaker_dropdown, custom_instruct, design_instruct],
             outputs=[status_info]
         ).then(
             fn=update_preset_list,
+            inputs=[preset_search],
+            outputs=[preset_list]
+        )
+        
+        delete_preset_btn.click(
+            fn=on_delete_preset,
+            inputs=[preset_list, preset_search],
+            outputs=[status_info, preset_list]
+        )
+        
+        preset_search.change(
+            fn=update_preset_list,
+            inputs=[preset_search],
             outputs=[preset_list]
         )
         
         preset_list.change(
             fn=on_preset_selected,
             inputs=[preset_list],
-            outputs=[speaker_dropdown, custom_instruct, language, status_info]
+            outputs=[model_choice, speaker_dropdown, custom_instruct, design_instruct, language, status_info]
         )
     
     return ui